@@ -1,9 +1,22 @@
-import re
-import requests
+import json
+import math
+import time
+import uuid
+# 가장 먼저 import해서 앱 시작 시각을 잡는다 (시작 시간 보고서)
+import startup
 import streamlit as st
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
-from planner import generate_plan, get_feedback
+import metrics
+from plan_store import plan_store
+from quiz_analytics import attempt_log
+from result_store import result_store
+from thumbnails import prefetch_thumbnails, resolve_thumbnail
+from planner import get_feedback, prefetch_feedback, start_background
+from jobs import JOB_POLL_SEC, QUEUED, JobQueueFull, job_service, quiz_from_bank, submit_order, submit_quiz, submit_study_plan
+
+startup.mark("imports")
+
+# 스크립트 1회 실행(rerun) 시간 측정 시작
+_rerun_t0 = time.perf_counter()
 
 # -------------------------------
 # 페이지 설정 (타이틀/파비콘)
@@ -52,24 +65,118 @@ st.markdown(
     unsafe_allow_html=True
 )
 
+# -------------------------------
+# 공유 자원 (프로세스당 한 번만 준비, 모든 세션/리런이 같이 사용)
+# -------------------------------
+@st.cache_resource(show_spinner=False)
+def shared_resources() -> dict:
+    """LLM 백그라운드 루프(클라이언트 생성/TLS 연결 미리 시작), 플랜 저장소, 생성 작업 서비스, 결과 저장소"""
+    return {"planner_loop": start_background(), "plan_store": plan_store, "jobs": job_service,
+            "results": result_store}
+
+shared_resources()
+
 # -------------------------------
 # 세션 상태 초기화
 # -------------------------------
-if "result" not in st.session_state:
-    st.session_state.result = {}
+# 생성 결과 본문은 공유 결과 저장소에 두고 세션에는 {섹션: 키}만 보관
+if "result_keys" not in st.session_state:
+    st.session_state.result_keys = {}
 if "quiz_started" not in st.session_state:
     st.session_state.quiz_started = False
 if "quiz_submitted" not in st.session_state:
     st.session_state.quiz_submitted = False
-if "quiz_data" not in st.session_state:
-    st.session_state.quiz_data = []
 if "quiz_answers" not in st.session_state:
     st.session_state.quiz_answers = {}
 if "quiz_score" not in st.session_state:
     st.session_state.quiz_score = 0
+if "feedback" not in st.session_state:
+    st.session_state.feedback = None
+if "plan_id" not in st.session_state:
+    st.session_state.plan_id = None
+# 저장된(또는 작업이 끝난) 결과를 그대로 보여줄지
+if "show_result" not in st.session_state:
+    st.session_state.show_result = False
+# 진행 중인 생성 작업 {"order"|"plan"|"quiz": {"key", "urls", ...}}
+if "pending" not in st.session_state:
+    st.session_state.pending = {}
+# 실패한 생성 작업 {"order"|"plan"|"quiz": 오류 메시지}, 닫거나 다시 시도할 때까지 보여준다
+if "job_errors" not in st.session_state:
+    st.session_state.job_errors = {}
+# 새 퀴즈마다 답안 위젯 key를 바꿔 이전 퀴즈의 선택이 남지 않게 한다
+if "quiz_round" not in st.session_state:
+    st.session_state.quiz_round = 0
+
+# -------------------------------
+# 사용자 토큰 (URL의 ?u= 값, 같은 링크로 다시 오면 기록이 이어짐)
+# -------------------------------
+if "u" not in st.query_params:
+    st.query_params["u"] = uuid.uuid4().hex
+user_token = st.query_params["u"]
+
+# -------------------------------
+# 사이드바 - 지난 학습 기록 (LLM 호출 없이 저장된 결과를 바로 다시 열기)
+# -------------------------------
+def current_result() -> dict:
+    """세션의 결과 키로 공유 저장소에서 결과 dict를 꺼낸다 (밀려났으면 플랜 저장소에서 다시 불러와 넣음)"""
+    result = result_store.get_sections(st.session_state.result_keys)
+    if result is None:
+        saved = plan_store.load_plan(st.session_state.plan_id, user_token) if st.session_state.plan_id else None
+        result = saved["result"] if saved else {}
+        st.session_state.result_keys = result_store.put_sections(result)
+        metrics.incr("app_result_reload_total", found="yes" if saved else "no")
+    return result
+
+def set_result(result: dict) -> None:
+    st.session_state.result_keys = result_store.put_sections(result)
+
+def open_saved_plan(plan_id: int) -> None:
+    saved = plan_store.load_plan(plan_id, user_token)
+    if not saved:
+        return
+    quiz = saved["result"].get("quiz", [])
+    st.session_state.urls = "\n".join(saved["urls"])
+    set_result(saved["result"])
+    st.session_state.plan_id = plan_id
+    st.session_state.show_result = True
+    st.session_state.pending = {}
+    st.session_state.job_errors = {}
+    st.session_state.quiz_started = bool(quiz)
+    st.session_state.quiz_submitted = False
+    st.session_state.quiz_answers = {}
+    st.session_state.quiz_score = 0
+    st.session_state.quiz_round += 1
+    st.session_state.feedback = None
 
+def save_result(url_list: list, result: dict) -> None:
+    """현재 결과를 저장소에 반영 (같은 URL 묶음이면 기존 플랜을 갱신)"""
+    st.session_state.plan_id = plan_store.save_plan(
+        user_token, url_list, result, plan_id=st.session_state.plan_id
+    )
+
+with st.sidebar:
+    st.markdown("### 📚 지난 학습 기록")
+    saved_plans = plan_store.list_plans(user_token)
+    if not saved_plans:
+        st.caption("아직 저장된 플랜이 없어요.")
+    for p in saved_plans:
+        when = time.strftime("%m/%d %H:%M", time.localtime(p["updated_at"]))
+        score = f" · 최고 {p['best_ratio']:.0%}" if p["best_ratio"] is not None else ""
+        st.button(
+            f"{when} · {p['title']}{score}",
+            key=f"open_plan_{p['id']}",
+            on_click=open_saved_plan,
+            args=(p["id"],),
+            use_container_width=True,
+        )
 
-urls = st.text_area("📥 동영상 URL 입력 (줄바꿈으로 구분)", height=150)
+
+urls = st.text_area(
+    "📥 동영상 URL 입력 (줄바꿈으로 구분)",
+    height=150,
+    key="urls",
+    help="URL 뒤에 공백과 함께 영상 길이(분)를 적으면 그 길이로 일정을 짭니다. 예) https://youtu.be/abc 25",
+)
 
 # 버튼 + 옵션
 col1, col2, col3 = st.columns([1, 1, 2])
@@ -89,150 +196,262 @@ with col3:
 
 st.markdown("</div>", unsafe_allow_html=True)
 
-url_list = [u.strip() for u in urls.splitlines() if u.strip()] if urls.strip() else []
+# 같은 URL 목록은 캐시된 결과를 재사용하므로, 새 결과가 필요할 때만 체크
+regenerate = st.checkbox("🔄 캐시 무시하고 새로 생성", value=False, key="regenerate")
+
+# "URL [길이(분)]" 형식 → URL 목록 + 사용자가 적은 영상 길이
+url_list, durations = [], {}
+for line in urls.splitlines():
+    parts = line.split()
+    if not parts:
+        continue
+    url_list.append(parts[0])
+    if len(parts) > 1:
+        try:
+            minutes = float(parts[1].rstrip("분"))
+        except ValueError:
+            continue
+        # 0분은 "이미 본 영상"(시간 배정 안 함), 음수/무한대는 무시
+        if math.isfinite(minutes) and minutes >= 0:
+            durations[parts[0]] = minutes
 if (btn_order or btn_plan or btn_quiz) and not url_list:
     st.warning("먼저 동영상 URL을 입력해 주세요!")
 
 # -------------------------------
-# 유틸 - 썸네일 가져오기
+# 유틸 - 항목 렌더링
 # -------------------------------
-def get_youtube_id(url: str) -> str | None:
-    m = re.search(r"youtu\.be/([^\?&]+)", url)
-    if m: return m.group(1)
-    m = re.search(r"[?&]v=([^\?&]+)", url)
-    if m: return m.group(1)
-    return None
+def render_video(item: dict) -> None:
+    thumb_url = resolve_thumbnail(item["url"])
+    c_img, c_txt = st.columns([1, 3])
+    with c_img:
+        st.markdown(
+            f'<a href="{item["url"]}" target="_blank">'
+            f'<img src="{thumb_url}" width="300" loading="lazy" style="border-radius:12px;"/></a>',
+            unsafe_allow_html=True,
+        )
+    with c_txt:
+        st.markdown(f"### [{item['title_guess']}]({item['url']})")
+        st.write(f"📝 이유: {item['reason']}")
+    st.markdown("---")
 
-def resolve_thumbnail(url: str) -> str:
-    vid = get_youtube_id(url)
-    if vid:
-        return f"https://img.youtube.com/vi/{vid}/0.jpg"
-    try:
-        headers = {"User-Agent": "Mozilla/5.0"}
-        r = requests.get(url, headers=headers, timeout=8)
-        if r.status_code >= 400:
-            return "https://placehold.co/300x200?text=No+Thumbnail"
-        soup = BeautifulSoup(r.text, "html.parser")
-        for key in [
-            {"property": "og:image"},
-            {"name": "og:image"},
-            {"name": "twitter:image"},
-            {"property": "twitter:image"},
-        ]:
-            tag = soup.find("meta", key)
-            if tag and tag.get("content"):
-                return urljoin(r.url, tag["content"])
-        link_tag = soup.find("link", rel="image_src")
-        if link_tag and link_tag.get("href"):
-            return urljoin(r.url, link_tag["href"])
-    except Exception:
-        return "https://placehold.co/300x200?text=No+Thumbnail"
-    return "https://placehold.co/300x200?text=No+Thumbnail"
+def render_day(day: dict) -> None:
+    with st.expander(f"Day {day['day']}"):
+        st.markdown(f"🎯 **목표**: {', '.join(day['goals'])}")
+        for sess in day.get("sessions", []):
+            st.markdown(f"🕑 **{sess['time_of_day'].capitalize()} 세션**")
+            st.write(f"- 📌 Focus: {sess['focus']}")
+            st.write(f"- 📝 Tasks: {', '.join(sess['tasks'])}")
+            st.write(f"- ⏱️ 예상 시간: {sess['est_time_min']}분")
+            if sess.get("videos"):
+                st.write("- 🎬 영상: " + ", ".join(
+                    f"{v['title']}" + (f" ({v['part']}부)" if v.get("part") else "") + f" · {v['minutes']}분"
+                    for v in sess["videos"]
+                ))
+        st.markdown(f"🔄 **복습**: {', '.join(day['review'])}")
 
 # -------------------------------
-# 메인 로직
+# 퀴즈 / 피드백 (프래그먼트: 상호작용 시 이 부분만 rerun)
 # -------------------------------
-if url_list:
-    # 학습 순서 추천
-    if btn_order:
-        with st.spinner("🧠 학습 순서를 계산 중이에요... 잠시만 기다려주세요! ✨"):
-            st.session_state.result = generate_plan(url_list, num_questions=quiz_num)
-
-        st.subheader("📜 추천 학습 순서")
-        for item in st.session_state.result.get("ordered_videos", []):
-            thumb_url = resolve_thumbnail(item["url"])
-            c_img, c_txt = st.columns([1, 3])
-            with c_img:
-                st.markdown(
-                    f'<a href="{item["url"]}" target="_blank">'
-                    f'<img src="{thumb_url}" width="300" style="border-radius:12px;"/></a>',
-                    unsafe_allow_html=True,
-                )
-            with c_txt:
-                st.markdown(f"### [{item['title_guess']}]({item['url']})")
-                st.write(f"📝 이유: {item['reason']}")
-            st.markdown("---")
+@st.fragment
+def feedback_section() -> None:
+    # 제출 후 rerun마다 다시 호출하지 않도록 세션에 한 번만 저장
+    if st.session_state.feedback is None:
+        with st.spinner("맞춤 피드백을 생성하는 중... 🧭"):
+            result = current_result()
+            quiz = result.get("quiz", [])
+            st.session_state.feedback = get_feedback(
+                st.session_state.quiz_score,
+                len(quiz),
+                result.get("ordered_videos", []),
+                quiz=quiz,
+                answers=[st.session_state.quiz_answers.get(i) for i in range(1, len(quiz) + 1)],
+            )
+    feedback = st.session_state.feedback
 
-    # 학습 플랜
-    if btn_plan:
-        with st.spinner("📅 학습 플랜을 만드는 중이에요... 곧 완성돼요! ⏳"):
-            st.session_state.result = generate_plan(url_list, num_questions=quiz_num)
-
-        st.subheader("🗓️ 학습 플랜")
-        for day in st.session_state.result.get("study_plan", []):
-            with st.expander(f"Day {day['day']}"):
-                st.markdown(f"🎯 **목표**: {', '.join(day['goals'])}")
-                for sess in day.get("sessions", []):
-                    st.markdown(f"🕑 **{sess['time_of_day'].capitalize()} 세션**")
-                    st.write(f"- 📌 Focus: {sess['focus']}")
-                    st.write(f"- 📝 Tasks: {', '.join(sess['tasks'])}")
-                    st.write(f"- ⏱️ 예상 시간: {sess['est_time_min']}분")
-                st.markdown(f"🔄 **복습**: {', '.join(day['review'])}")
-
-    # 퀴즈 생성 시작
-    if btn_quiz:
-        with st.spinner("🧩 퀴즈를 출제하는 중이에요... 두근두근! 🎉"):
-            st.session_state.result = generate_plan(url_list, num_questions=quiz_num)
-            st.session_state.quiz_started = True
-            st.session_state.quiz_submitted = False
-            st.session_state.quiz_data = st.session_state.result.get("quiz", [])
-            st.session_state.quiz_answers = {}
-            st.session_state.quiz_score = 0
-
-    # 퀴즈 화면
-    if st.session_state.quiz_started:
-        st.subheader(f"🧩 학습 퀴즈 ({len(st.session_state.quiz_data)}문항)")
+    st.info(feedback["message"])
+
+    st.markdown("### 📺 추천 영상")
+    for rec in feedback.get("recommendations", []):
+        st.markdown(f"- [{rec['title']}]({rec['url']})")
+
+def grade_quiz() -> None:
+    """폼 제출 시 한 번만 채점하고 응시 기록 저장"""
+    quiz = current_result().get("quiz", [])
+    answers = {i: st.session_state.get(f"quiz_{st.session_state.quiz_round}_{i}") for i in range(1, len(quiz) + 1)}
+    score = sum(1 for i, q in enumerate(quiz, 1) if answers[i] == q["answer"])
+    st.session_state.quiz_answers = answers
+    st.session_state.quiz_score = score
+    st.session_state.quiz_submitted = True
+    # 문항별 정오답은 응답 기록에 남겨 문항 난이도/변별도 통계와 다음 피드백에 쓴다
+    attempt_log.record(user_token, quiz, [answers[i] for i in sorted(answers)])
+    if st.session_state.plan_id is not None:
+        plan_store.record_attempt(st.session_state.plan_id, score, len(quiz), [answers[i] for i in sorted(answers)])
+
+@st.fragment
+def quiz_section() -> None:
+    t0 = time.perf_counter()
+    quiz = current_result().get("quiz", [])
+    st.subheader(f"🧩 학습 퀴즈 ({len(quiz)}문항)")
 
-        for i, q in enumerate(st.session_state.quiz_data, 1):
+    if not st.session_state.quiz_submitted:
+        # 제출 전 → 폼 안의 라디오는 선택해도 rerun되지 않고, 제출할 때 한 번에 전송
+        with st.form(f"quiz_form_{st.session_state.quiz_round}"):
+            for i, q in enumerate(quiz, 1):
+                st.markdown(f"**Q{i}. {q['question']}**")
+                st.radio(f"답변 선택 (Q{i})", q["choices"], key=f"quiz_{st.session_state.quiz_round}_{i}")
+                st.markdown("---")
+            st.form_submit_button("제출하기", on_click=grade_quiz)
+    else:
+        # 제출 후 → 읽기 전용 + 정답/해설 (위젯 대신 텍스트로 그려 세션에 위젯 상태를 남기지 않음)
+        for i, q in enumerate(quiz, 1):
+            answer = st.session_state.quiz_answers.get(i)
             st.markdown(f"**Q{i}. {q['question']}**")
+            st.markdown("\n".join(
+                f"- {'🔘' if c == answer else '⚪'} {'**' + c + '**' if c == q['answer'] else c}" for c in q["choices"]
+            ))
+            st.write(f"👉 당신의 답변: **{answer}**")
+            st.write(f"✅ 정답: **{q['answer']}**")
+            st.caption(f"해설: {q['explanation']}")
+            st.markdown("---")
+
+        st.success(f"총 {len(quiz)}문항 중 {st.session_state.quiz_score}점!")
+        feedback_section()
+    metrics.observe("app_fragment_seconds", time.perf_counter() - t0, fragment="quiz")
 
-            if not st.session_state.quiz_submitted:
-                # 제출 전 → 라디오 선택 가능
-                st.session_state.quiz_answers[i] = st.radio(
-                    f"답변 선택 (Q{i})",
-                    q["choices"],
-                    key=f"quiz_{i}"
-                )
+# -------------------------------
+# 생성 작업 진행 상황 (프래그먼트: 작업이 끝날 때까지 이 부분만 주기적으로 rerun)
+# -------------------------------
+def apply_job_result(section: str, entry: dict, result: dict) -> None:
+    """끝난 작업의 결과를 세션에 반영하고 저장"""
+    merged = {**current_result(), **result}
+    set_result(merged)
+    save_result(entry["urls"], merged)
+    if section == "quiz":
+        st.session_state.quiz_started = True
+        st.session_state.quiz_submitted = False
+        st.session_state.quiz_answers = {}
+        st.session_state.quiz_score = 0
+        st.session_state.quiz_round += 1
+        st.session_state.feedback = None
+        # 퀴즈를 푸는 동안 가능한 피드백 추천을 백그라운드에서 미리 생성
+        prefetch_feedback(result["ordered_videos"])
+
+JOB_LABELS = {"order": "학습 순서", "plan": "학습 플랜", "quiz": "퀴즈"}
+
+def dismiss_job_error(section: str) -> None:
+    st.session_state.job_errors.pop(section, None)
+
+def job_progress() -> None:
+    finished = False
+    for section, entry in list(st.session_state.pending.items()):
+        job = job_service.get(entry["key"])
+        if job is None:
+            # 서버 재시작 등으로 작업이 사라진 경우
+            st.session_state.pending.pop(section)
+            finished = True
+            continue
+        if job.done:
+            st.session_state.pending.pop(section)
+            if job.status == "failed":
+                # 다음 rerun부터는 폴링이 멈추므로 오류는 세션에 남겨 프래그먼트 밖에서 보여준다
+                st.session_state.job_errors[section] = str(job.error)
             else:
-                # 제출 후 → 읽기 전용 + 정답/해설
-                st.radio(
-                    f"답변 선택 (Q{i})",
-                    q["choices"],
-                    index=q["choices"].index(st.session_state.quiz_answers.get(i))
-                    if st.session_state.quiz_answers.get(i) in q["choices"] else 0,
-                    key=f"quiz_{i}_disabled",
-                    disabled=True
-                )
-                st.write(f"👉 당신의 답변: **{st.session_state.quiz_answers.get(i)}**")
-                st.write(f"✅ 정답: **{q['answer']}**")
-                st.caption(f"해설: {q['explanation']}")
+                apply_job_result(section, entry, job.result)
+            finished = True
+            continue
 
-            st.markdown("---")
+        items = job.items()
+        status = job_service.status(entry["key"]) or job.snapshot()
+        if status["status"] == QUEUED:
+            st.caption(f"⏳ 차례를 기다리는 중이에요 (대기 {job_service.stats()[QUEUED]}건 · {status['age_sec']:.0f}초 경과)")
+        if status["subscribers"] > 1:
+            st.caption(f"👥 같은 요청을 {status['subscribers']}명이 함께 기다리고 있어요 (한 번만 생성합니다)")
+        if section == "order":
+            st.subheader("📜 추천 학습 순서")
+            st.caption("🧠 학습 순서를 계산 중이에요... 잠시만 기다려주세요! ✨")
+            for item in items:
+                render_video(item)
+        elif section == "plan":
+            st.subheader("🗓️ 학습 플랜")
+            st.caption("📅 학습 플랜을 만드는 중이에요... 곧 완성돼요! ⏳")
+            for day in items:
+                render_day(day)
+        else:
+            st.progress(
+                min(len(items) / entry["num_questions"], 1.0),
+                text=f"🧩 {len(items)}/{entry['num_questions']} 문항 출제 완료" if items
+                else "🧩 퀴즈를 출제하는 중이에요... 두근두근! 🎉",
+            )
+    if finished and not st.session_state.pending:
+        st.session_state.show_result = True
+        st.rerun()
+
+# -------------------------------
+# 메인 로직
+# -------------------------------
+if (btn_order or btn_plan or btn_quiz) and url_list:
+    st.session_state.show_result = False
+    # 다시 시도하는 작업의 이전 오류는 지운다
+    for section, clicked in (("order", btn_order), ("plan", btn_plan), ("quiz", btn_quiz)):
+        if clicked:
+            st.session_state.job_errors.pop(section, None)
+    try:
+        # 생성은 프로세스 공용 워커 풀에서 실행 (다른 세션의 같은 요청은 한 번만 생성)
+        if btn_order:
+            # LLM 응답을 기다리는 동안 썸네일을 워커 풀에서 미리 조회
+            prefetch_thumbnails(url_list)
+            job = submit_order(url_list, regenerate=regenerate)
+            st.session_state.pending["order"] = {"key": job.key, "urls": url_list}
+        if btn_plan:
+            job = submit_study_plan(url_list, regenerate=regenerate, durations=durations)
+            st.session_state.pending["plan"] = {"key": job.key, "urls": url_list}
+        if btn_quiz:
+            # 이미 문제 은행이 있는 영상이면 작업 없이 바로 뽑는다 (사용자마다 안 푼 문항 위주)
+            banked = None if regenerate else quiz_from_bank(user_token, url_list, quiz_num)
+            if banked:
+                apply_job_result("quiz", {"urls": url_list}, banked)
+                st.session_state.show_result = not st.session_state.pending
+            else:
+                job = submit_quiz(url_list, quiz_num, regenerate=regenerate, user=user_token)
+                st.session_state.pending["quiz"] = {"key": job.key, "urls": url_list, "num_questions": quiz_num}
+    except JobQueueFull:
+        st.warning("지금 요청이 많아요. 잠시 후 다시 시도해 주세요!")
+
+if url_list:
+    # 다시 연 플랜 / 끝난 작업의 결과를 그대로 표시
+    if st.session_state.show_result:
+        saved = current_result()
+        if saved.get("ordered_videos"):
+            prefetch_thumbnails([v["url"] for v in saved["ordered_videos"]])
+            st.subheader("📜 추천 학습 순서")
+            for item in saved["ordered_videos"]:
+                render_video(item)
+        if saved.get("study_plan"):
+            st.subheader("🗓️ 학습 플랜")
+            for day in saved["study_plan"]:
+                render_day(day)
 
-        if not st.session_state.quiz_submitted:
-            if st.button("제출하기"):
-                with st.spinner("채점 중이에요... ✍️"):
-                    score = 0
-                    for i, q in enumerate(st.session_state.quiz_data, 1):
-                        if st.session_state.quiz_answers.get(i) == q["answer"]:
-                            score += 1
-                    st.session_state.quiz_score = score
-                    st.session_state.quiz_submitted = True
-                st.rerun()
-
-        if st.session_state.quiz_submitted:
-            score = st.session_state.quiz_score
-            st.success(f"총 {len(st.session_state.quiz_data)}문항 중 {score}점!")
-
-            with st.spinner("맞춤 피드백을 생성하는 중... 🧭"):
-                feedback = get_feedback(
-                    score,
-                    len(st.session_state.quiz_data),
-                    st.session_state.result.get("ordered_videos", [])
-                )
-
-            st.info(feedback["message"])
-
-            st.markdown("### 📺 추천 영상")
-            for rec in feedback.get("recommendations", []):
-                st.markdown(f"- [{rec['title']}]({rec['url']})")
+    # 실패한 작업은 닫거나 다시 시도할 때까지 오류를 남겨 둔다
+    for section, error in list(st.session_state.job_errors.items()):
+        col_msg, col_close = st.columns([9, 1])
+        col_msg.error(f"{JOB_LABELS.get(section, section)} 생성에 실패했어요. 다시 시도해 주세요. ({error})")
+        col_close.button("닫기", key=f"dismiss_{section}", on_click=dismiss_job_error, args=(section,))
+
+    # 진행 중인 작업은 주기적으로 상태를 확인하며 도착한 항목부터 렌더링
+    if st.session_state.pending:
+        st.fragment(run_every=JOB_POLL_SEC)(job_progress)()
+
+    # 퀴즈 화면 (답안 선택/제출/피드백은 프래그먼트 안에서만 다시 실행)
+    if st.session_state.quiz_started:
+        quiz_section()
+
+# -------------------------------
+# 실행 시간 기록 (어떤 버튼으로 rerun 됐는지 라벨링)
+# -------------------------------
+_trigger = "order" if btn_order else "plan" if btn_plan else "quiz" if btn_quiz else "other"
+metrics.observe("app_rerun_seconds", time.perf_counter() - _rerun_t0, button=_trigger)
+# 세션 하나가 들고 있는 상태 크기(직렬화 기준 추정치) / 공유 결과 저장소 사용량은 result_store_bytes 게이지
+metrics.observe("app_session_state_bytes",
+                len(json.dumps({k: v for k, v in st.session_state.items()}, ensure_ascii=False, default=str)))
+# 프로세스의 첫 화면 렌더링이면 시작 시간 보고 (이후 rerun에서는 아무 일도 하지 않음)
+startup.report_first_render()
@@ -0,0 +1,232 @@
+"""
+플레이리스트 일괄 학습 플랜/퀴즈 생성 CLI
+
+입력 (JSONL 또는 CSV)
+  JSONL: {"id": "course-1", "urls": ["https://...", ...], "days": 2, "num_questions": 5}
+  CSV  : id,urls,days,num_questions  (urls는 공백 또는 | 로 구분)
+
+예시
+  python batch_plans.py playlists.jsonl -o plans.jsonl --workers 8 --rpm 120 --tpm 200000
+  python batch_plans.py playlists.csv -o plans.parquet
+
+출력이 .parquet이면 같은 이름의 폴더에 part 파일을 나눠 쓴다.
+성공한 항목만 출력에 기록하고, 완료된 id는 <출력>.ckpt 에 기록되므로, 중단 후 같은 명령을 다시 실행하면 남은 항목만 처리한다.
+"""
+import os
+import csv
+import sys
+import json
+import time
+import asyncio
+import argparse
+from collections import Counter
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+
+from plan_cache import make_key
+
+# -------------------------------
+# 입력 읽기
+# -------------------------------
+def _normalize(row: Dict[str, Any], defaults: Dict[str, int]) -> Dict[str, Any]:
+    urls = row.get("urls") or []
+    if isinstance(urls, str):
+        urls = urls.replace("|", " ").split()
+    item = {
+        "urls": [u.strip() for u in urls if u.strip()],
+        "days": int(row.get("days") or defaults["days"]),
+        "num_questions": int(row.get("num_questions") or defaults["num_questions"]),
+    }
+    item["id"] = str(row.get("id") or make_key(item["urls"], item["days"], item["num_questions"])[:16])
+    return item
+
+
+def read_playlists(path: str, defaults: Dict[str, int]) -> Iterator[Dict[str, Any]]:
+    """JSONL/CSV 입력을 {id, urls, days, num_questions} 형태로 읽는다"""
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        if path.lower().endswith(".csv"):
+            for row in csv.DictReader(f):
+                yield _normalize(row, defaults)
+        else:
+            for line in f:
+                if line.strip():
+                    yield _normalize(json.loads(line), defaults)
+
+# -------------------------------
+# 체크포인트 / 출력
+# -------------------------------
+class Checkpoint:
+    """완료된 id를 한 줄씩 추가 기록 (재실행 시 건너뛰기용)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done: Set[str] = set()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.done = {line.strip() for line in f if line.strip()}
+        self._f = open(path, "a", encoding="utf-8")
+
+    def mark(self, item_id: str) -> None:
+        self.done.add(item_id)
+        self._f.write(item_id + "\n")
+        self._f.flush()
+
+    def close(self) -> None:
+        self._f.close()
+
+
+class JsonlSink:
+    """레코드를 한 줄씩 바로 기록하고, 기록이 끝난 id를 on_persist로 알린다"""
+
+    def __init__(self, path: str, on_persist: Callable[[str], None]):
+        self._f = open(path, "a", encoding="utf-8")
+        self._on_persist = on_persist
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self._f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._f.flush()
+        self._on_persist(record["id"])
+
+    def close(self) -> None:
+        self._f.close()
+
+
+class ParquetSink:
+    """
+    레코드를 모아 두었다가 part 파일로 나눠 쓴다 (기존 part는 건드리지 않으므로 재개해도 안전)
+    part 파일이 써진 뒤에야 on_persist를 호출하므로, 중간에 끊겨도 버퍼의 항목은 다시 처리된다
+    """
+
+    def __init__(self, path: str, on_persist: Callable[[str], None], batch_size: int = 50):
+        import pyarrow  # noqa: F401  (없으면 시작할 때 바로 실패하도록)
+
+        self.dir = path
+        self.batch_size = batch_size
+        self._on_persist = on_persist
+        self._rows: List[Dict[str, Any]] = []
+        os.makedirs(path, exist_ok=True)
+
+    def write(self, record: Dict[str, Any]) -> None:
+        row = {k: v for k, v in record.items() if k not in ("result", "error")}
+        row["urls"] = json.dumps(record["urls"], ensure_ascii=False)
+        row["result_json"] = json.dumps(record.get("result"), ensure_ascii=False)
+        self._rows.append(row)
+        if len(self._rows) >= self.batch_size:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self._rows:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        name = f"part-{time.strftime('%Y%m%d-%H%M%S')}-{time.perf_counter_ns() % 10**9:09d}.parquet"
+        pq.write_table(pa.Table.from_pylist(self._rows), os.path.join(self.dir, name))
+        for row in self._rows:
+            self._on_persist(row["id"])
+        self._rows = []
+
+    def close(self) -> None:
+        self._flush()
+
+# -------------------------------
+# 실행
+# -------------------------------
+async def run_batch(
+    items: List[Dict[str, Any]],
+    sink,
+    workers: int,
+) -> Dict[str, Any]:
+    """
+    작업 큐를 workers개 코루틴이 나눠 처리하고 요약 통계를 반환
+    분당 요청/토큰 한도는 호출마다 call_scheduler의 공용 버킷이 지킨다 (실제 사용량으로 정산)
+    """
+    from planner import agenerate_plan
+
+    queue: "asyncio.Queue" = asyncio.Queue()
+    for item in items:
+        queue.put_nowait(item)
+    stats = {"ok": 0, "failed": 0, "errors": Counter(), "failed_ids": []}
+    total = len(items)
+
+    async def worker() -> None:
+        while True:
+            try:
+                item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            t0 = time.perf_counter()
+            record = {"id": item["id"], "urls": item["urls"], "days": item["days"],
+                      "num_questions": item["num_questions"]}
+            try:
+                result = await agenerate_plan(item["urls"], item["days"], item["num_questions"])
+                if not result:
+                    raise ValueError("empty result")
+                record.update(status="ok", error=None, result=result)
+            except Exception as e:
+                record.update(status="failed", error=f"{type(e).__name__}: {e}", result=None)
+            record["elapsed_sec"] = round(time.perf_counter() - t0, 3)
+
+            # 성공한 항목만 출력(→ 체크포인트)에 기록 → 실패한 항목은 재실행 시 다시 시도
+            if record["status"] == "ok":
+                sink.write(record)
+                stats["ok"] += 1
+            else:
+                stats["failed"] += 1
+                stats["errors"][record["error"].split(":")[0]] += 1
+                stats["failed_ids"].append(item["id"])
+            done = stats["ok"] + stats["failed"]
+            print(f"[{done}/{total}] {item['id']} {record['status']} ({record['elapsed_sec']}s)", file=sys.stderr)
+
+    await asyncio.gather(*(worker() for _ in range(max(1, workers))))
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("input", help="JSONL 또는 CSV 파일")
+    ap.add_argument("-o", "--output", required=True, help="결과 파일 (.jsonl 또는 .parquet)")
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--rpm", type=int, default=None, help="분당 API 요청 한도 (기본 AZURE_OPENAI_RPM, 0이면 무제한)")
+    ap.add_argument("--tpm", type=int, default=None, help="분당 토큰 한도 (기본 AZURE_OPENAI_TPM, 0이면 무제한)")
+    ap.add_argument("--days", type=int, default=2, help="입력에 없을 때 기본 학습 일수")
+    ap.add_argument("--num-questions", type=int, default=4, help="입력에 없을 때 기본 문항 수")
+    args = ap.parse_args(argv)
+
+    # call_scheduler가 처음 import될 때 읽으므로 planner를 불러오기 전에 넘긴다
+    if args.rpm is not None:
+        os.environ["AZURE_OPENAI_RPM"] = str(args.rpm)
+    if args.tpm is not None:
+        os.environ["AZURE_OPENAI_TPM"] = str(args.tpm)
+
+    defaults = {"days": args.days, "num_questions": args.num_questions}
+    checkpoint = Checkpoint(args.output.rstrip("/\\") + ".ckpt")
+    rows = list(read_playlists(args.input, defaults))
+    items = [it for it in rows if it["id"] not in checkpoint.done]
+    # 체크포인트에는 다른 입력 파일의 id도 있을 수 있으므로 이 입력에서 걸러진 행만 센다
+    skipped = len(rows) - len(items)
+    print(f"처리할 항목 {len(items)}개 (이미 완료 {skipped}개 건너뜀)", file=sys.stderr)
+
+    sink_cls = ParquetSink if args.output.lower().endswith(".parquet") else JsonlSink
+    sink = sink_cls(args.output, on_persist=checkpoint.mark)
+    t0 = time.perf_counter()
+    try:
+        stats = asyncio.run(run_batch(items, sink, args.workers))
+    finally:
+        sink.close()
+        checkpoint.close()
+    elapsed = time.perf_counter() - t0
+
+    done = stats["ok"] + stats["failed"]
+    print("\n===== 요약 =====")
+    print(f"성공 {stats['ok']} / 실패 {stats['failed']} / 건너뜀 {skipped}")
+    print(f"소요 {elapsed:.1f}s, 처리량 {done / elapsed * 60 if elapsed else 0:.1f} 항목/분")
+    if stats["failed"]:
+        print("실패 유형:")
+        for err, cnt in stats["errors"].most_common():
+            print(f"  {err}: {cnt}")
+        print("실패 id (다시 실행하면 재시도):", ", ".join(stats["failed_ids"][:20]))
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""
+퀴즈 응답 기록 통계 벤치마크 (합성 데이터)
+
+응시 기록을 Parquet 조각 파일로 만든 뒤 AttemptLog의 전체 통계 계산(읽기 + 문항 난이도/변별도 + 영상 오답률),
+점수 기준선(score_cutoffs), 다시 볼 영상 선택(weak_video) 시간을 잰다.
+
+예시
+  python bench/bench_analytics.py --rows 3000000 --parts 30
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+from typing import List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+import pyarrow as pa  # noqa: E402
+import pyarrow.parquet as pq  # noqa: E402
+
+from quiz_analytics import AttemptLog, weak_video  # noqa: E402
+
+
+def write_parts(path: str, rows: int, parts: int, items: int, videos: int, per_attempt: int, seed: int) -> None:
+    """문항마다 정답률이 다르고, 실력이 다른 사용자가 응시한 것처럼 합성"""
+    rng = np.random.default_rng(seed)
+    difficulty = rng.uniform(-1.5, 1.5, items)
+    n = rows // parts // per_attempt * per_attempt
+    for p in range(parts):
+        attempts = n // per_attempt
+        ability = np.repeat(rng.normal(0, 1, attempts), per_attempt)
+        item = rng.integers(0, items, n)
+        correct = rng.random(n) < 1 / (1 + np.exp(-(ability - difficulty[item])))
+        table = pa.table({
+            "ts": np.full(n, time.time()),
+            "user": pa.array((np.repeat(rng.integers(0, 50000, attempts), per_attempt)).astype(str)).dictionary_encode(),
+            "attempt": np.repeat(np.arange(attempts, dtype=np.int64) + p * attempts, per_attempt),
+            "item": item.astype(np.int64) + 1,
+            "video_id": pa.array(np.char.add("youtube:v", (item % videos).astype(str))).dictionary_encode(),
+            "topic": pa.array(np.full(n, "핵심 개념 이해")).dictionary_encode(),
+            "correct": correct,
+        })
+        pq.write_table(table, os.path.join(path, f"part-{p:06d}-0.parquet"))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rows", type=int, default=2_000_000, help="전체 응답 행 수")
+    ap.add_argument("--parts", type=int, default=20, help="조각 파일 수")
+    ap.add_argument("--items", type=int, default=20000, help="문항 수")
+    ap.add_argument("--videos", type=int, default=800, help="영상 수")
+    ap.add_argument("--per-attempt", type=int, default=5, help="응시당 문항 수")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as path:
+        write_parts(path, args.rows, args.parts, args.items, args.videos, args.per_attempt, args.seed)
+        log = AttemptLog(path=path, max_parts=args.parts + 1)
+
+        t0 = time.perf_counter()
+        stats = log.stats(refresh=True)
+        cold = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        log.stats(refresh=True)
+        warm = time.perf_counter() - t0
+
+        ordered = [{"video_id": f"youtube:v{i}", "title_guess": f"v{i}"} for i in range(5)]
+        quiz = [{"qid": i + 1, "video_id": f"youtube:v{i % 5}", "answer": "A"} for i in range(10)]
+        answers = ["A" if i % 3 else "B" for i in range(10)]
+        t0 = time.perf_counter()
+        cutoffs = stats.score_cutoffs([v["video_id"] for v in ordered])
+        weak = weak_video(ordered, quiz, answers, stats)
+        feedback = time.perf_counter() - t0
+
+        discs = np.array([d for n, _, d in stats.items.values() if n >= 20])
+        report = {
+            "rows": stats.rows,
+            "items": len(stats.items),
+            "videos": len(stats.videos),
+            "stats_cold_sec": round(cold, 3),
+            "stats_warm_sec": round(warm, 3),
+            "feedback_sec": round(feedback, 4),
+            "cutoffs": [round(c, 3) for c in cutoffs],
+            "weak_video": weak,
+            "discrimination_median": round(float(np.median(discs)), 3) if len(discs) else None,
+        }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+"""
+부하 테스트 / 성능 회귀 벤치마크 (로컬 가짜 Azure OpenAI + 픽스처 HTTP 서버)
+
+시나리오
+- plan      : generate_plan (영상 분석 → 순서 → 플랜/퀴즈), --stream이면 첫 항목까지 시간도 기록
+- feedback  : get_feedback (추천 영상 생성)
+- extract   : _extract_json (정상/코드펜스/깨진 응답 텍스트)
+- thumbnail : resolve_thumbnail (로컬 픽스처 페이지의 og:image)
+
+캐시는 메모리 전용으로 두고 요청마다 URL/주제를 바꿔 실제 호출 경로를 측정한다.
+결과(처리량, p50/p95/p99 지연)는 JSON으로 출력되므로 커밋 간 비교에 쓸 수 있다.
+
+예시
+  python bench/bench_load.py --requests 50 --concurrency 8 --latency-ms 300 --rate-429 0.05 --rate-malformed 0.05
+  python bench/bench_load.py --scenarios plan --stream --out bench_result.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import subprocess
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_azure import FakeConfig, canned_payload, start_server  # noqa: E402
+from fixture_server import start_fixture_server  # noqa: E402
+
+SCENARIOS = ("plan", "feedback", "extract", "thumbnail")
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
+
+
+def summarize(samples_ms: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples_ms)
+    return {
+        "p50": round(percentile(ordered, 0.50), 3),
+        "p95": round(percentile(ordered, 0.95), 3),
+        "p99": round(percentile(ordered, 0.99), 3),
+        "mean": round(sum(ordered) / len(ordered), 3) if ordered else 0.0,
+        "max": round(ordered[-1], 3) if ordered else 0.0,
+    }
+
+
+def run_load(fn: Callable[[int], Optional[float]], requests: int, concurrency: int) -> Dict[str, Any]:
+    """fn(i)를 requests번, concurrency개 스레드로 실행 (fn이 값을 돌려주면 첫 항목까지 시간(ms)으로 기록)"""
+    latencies: List[float] = []
+    firsts: List[float] = []
+    errors: Counter = Counter()
+
+    def one(i: int) -> None:
+        t0 = time.perf_counter()
+        try:
+            first = fn(i)
+        except Exception as e:
+            errors[type(e).__name__] += 1
+            return
+        latencies.append((time.perf_counter() - t0) * 1000)
+        if first is not None:
+            firsts.append(first)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - t0
+    result = {
+        "requests": requests,
+        "ok": len(latencies),
+        "errors": sum(errors.values()),
+        "error_types": dict(errors),
+        "wall_sec": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 3) if wall else 0.0,
+        "latency_ms": summarize(latencies),
+    }
+    if firsts:
+        result["first_item_ms"] = summarize(firsts)
+    return result
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"쉼표로 구분 ({', '.join(SCENARIOS)})")
+    ap.add_argument("--requests", type=int, default=30, help="시나리오별 요청 수")
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--videos", type=int, default=5, help="plan 요청당 영상 수")
+    ap.add_argument("--days", type=int, default=3)
+    ap.add_argument("--num-questions", type=int, default=5)
+    ap.add_argument("--stream", action="store_true", help="plan을 스트리밍으로 받아 첫 항목까지 시간도 기록")
+    ap.add_argument("--latency-ms", type=float, default=200, help="가짜 서버 응답 지연")
+    ap.add_argument("--chunk-delay-ms", type=float, default=5, help="스트리밍 조각 사이 지연")
+    ap.add_argument("--rate-429", type=float, default=0.0, help="429 응답 비율")
+    ap.add_argument("--rate-malformed", type=float, default=0.0, help="깨진 JSON 응답 비율")
+    ap.add_argument("--pad-kb", type=int, default=256, help="픽스처 페이지에 덧붙일 본문 크기(KB)")
+    ap.add_argument("--extract-repeat", type=int, default=2000, help="extract 시나리오 반복 횟수")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", help="결과 JSON을 저장할 파일 (없으면 표준 출력)")
+    args = ap.parse_args(argv)
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+
+    config = FakeConfig(latency_ms=args.latency_ms, chunk_delay_ms=args.chunk_delay_ms, rate_429=args.rate_429,
+                        rate_malformed=args.rate_malformed, seed=args.seed)
+    _, fake_stats, endpoint = start_server(config)
+    _, fixture_url, pages = start_fixture_server(args.pad_kb)
+
+    # planner는 import 시점에 환경 변수를 읽으므로 서버를 띄운 뒤에 import
+    os.environ.update({
+        "AZURE_OPENAI_ENDPOINT": endpoint,
+        "AZURE_OPENAI_API_KEY": "bench",
+        "AZURE_OPENAI_DEPLOYMENT": "bench",
+        "PLAN_CACHE_PATH": "",
+        # 픽스처의 og:image는 가짜 호스트라 받을 수 없으므로 페이지 조회만 잰다 (축소/캐시는 bench_thumbnails.py)
+        "THUMB_PROXY": "0",
+    })
+    import planner
+    import call_scheduler
+    import metrics
+    from deployment_router import router
+    from thumbnails import resolve_thumbnail
+
+    run_id = f"{int(time.time())}-{random.Random(args.seed).randint(0, 10**6)}"
+
+    def video_urls(i: int) -> List[str]:
+        return [f"{fixture_url}/page/{pages[j % len(pages)]}?id={run_id}-{i}-{j}" for j in range(args.videos)]
+
+    def do_plan(i: int) -> Optional[float]:
+        urls = video_urls(i)
+        durations = {u: 10 + 5 * j for j, u in enumerate(urls)}
+        if not args.stream:
+            result = planner.generate_plan(urls, args.days, args.num_questions, regenerate=True, durations=durations)
+            if not result:
+                raise ValueError("empty result")
+            return None
+        t0 = time.perf_counter()
+        first = None
+        for _ in planner.generate_plan(urls, args.days, args.num_questions, regenerate=True,
+                                       stream=True, durations=durations):
+            if first is None:
+                first = (time.perf_counter() - t0) * 1000
+        if first is None:
+            raise ValueError("empty result")
+        return first
+
+    def do_feedback(i: int) -> None:
+        ordered = [{"title_guess": f"bench-topic-{run_id}-{i}-{j}", "url": u} for j, u in enumerate(video_urls(i))]
+        feedback = planner.get_feedback(i % 5, 4, ordered)
+        if not feedback.get("recommendations"):
+            raise ValueError("no recommendations")
+
+    rng = random.Random(args.seed)
+    sample = json.dumps(canned_payload([{"content": ""}, {"content": '{"quiz": [] 퀴즈 10문항'}], rng), ensure_ascii=False)
+    texts = [sample, f"```json\n{sample}\n```", "결과입니다:\n" + sample + "\n감사합니다.", sample[: len(sample) // 2]]
+
+    def do_extract(i: int) -> None:
+        planner._extract_json(texts[i % len(texts)])
+
+    def do_thumbnail(i: int) -> None:
+        resolve_thumbnail(f"{fixture_url}/page/{pages[i % len(pages)]}?id={run_id}-thumb-{i}")
+
+    runners = {"plan": do_plan, "feedback": do_feedback, "extract": do_extract, "thumbnail": do_thumbnail}
+    report: Dict[str, Any] = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "args": vars(args),
+        },
+        "scenarios": {},
+    }
+    for name in scenarios:
+        if name not in runners:
+            ap.error(f"알 수 없는 시나리오: {name}")
+        if name == "extract":
+            # CPU만 쓰는 함수라 한 스레드에서 반복 측정
+            report["scenarios"][name] = run_load(runners[name], args.extract_repeat, 1)
+        else:
+            report["scenarios"][name] = run_load(runners[name], args.requests, args.concurrency)
+        print(f"[{name}] {json.dumps(report['scenarios'][name]['latency_ms'])}", file=sys.stderr)
+
+    report["fake_server"] = dict(fake_stats.counts)
+    report["scheduler"] = {k: v for k, v in call_scheduler.stats().items() if k != "concurrency"}
+    report["router"] = router.stats()
+    report["prompt_cache"] = metrics.prompt_cache_report()
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 1 if any(r["errors"] for r in report["scenarios"].values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
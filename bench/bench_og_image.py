@@ -0,0 +1,99 @@
+"""
+og:image 추출 마이크로 벤치마크
+
+저장된 HTML 픽스처로 두 경로를 비교한다.
+- full: 전체 본문 디코딩 + BeautifulSoup 파싱 (기존 방식)
+- head: <head>까지만 청크로 읽기 + 경량 토크나이저 (실패 시 BeautifulSoup)
+
+실행: python bench/bench_og_image.py --pad-kb 512 --repeat 200
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from thumbnails import CHUNK_SIZE, read_head, scan_image_meta, soup_image_meta  # noqa: E402
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def load_fixtures(pad_kb: int) -> dict:
+    """픽스처를 읽고, 무거운 페이지를 흉내 내도록 </body> 앞에 본문을 pad_kb만큼 덧붙인다"""
+    filler = ("<p>" + "강의 본문 내용 " * 20 + "</p>\n").encode("utf-8")
+    pad = filler * max(1, (pad_kb * 1024) // len(filler)) if pad_kb else b""
+    docs = {}
+    for name in sorted(os.listdir(FIXTURE_DIR)):
+        if not name.endswith(".html"):
+            continue
+        with open(os.path.join(FIXTURE_DIR, name), "rb") as f:
+            raw = f.read()
+        idx = raw.lower().rfind(b"</body>")
+        docs[name] = raw[:idx] + pad + raw[idx:] if idx != -1 else raw + pad
+    return docs
+
+
+def full_path(raw: bytes):
+    doc = raw.decode("utf-8", errors="replace")
+    return soup_image_meta(doc), len(raw)
+
+
+def head_path(raw: bytes):
+    chunks = (raw[i:i + CHUNK_SIZE] for i in range(0, len(raw), CHUNK_SIZE))
+    head = read_head(chunks)
+    doc = head.decode("utf-8", errors="replace")
+    return scan_image_meta(doc) or soup_image_meta(doc), len(head)
+
+
+def bench(fn, raw: bytes, repeat: int) -> dict:
+    samples = []
+    result, nbytes = None, 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result, nbytes = fn(raw)
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    return {
+        "result": result,
+        "bytes_read": nbytes,
+        "p50_ms": round(statistics.median(samples), 4),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1], 4),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--pad-kb", type=int, default=512, help="본문에 덧붙일 크기(KB)")
+    ap.add_argument("--repeat", type=int, default=100)
+    ap.add_argument("--json", action="store_true", help="결과를 JSON으로 출력")
+    args = ap.parse_args()
+
+    report = {}
+    for name, raw in load_fixtures(args.pad_kb).items():
+        full = bench(full_path, raw, args.repeat)
+        head = bench(head_path, raw, args.repeat)
+        report[name] = {
+            "size_bytes": len(raw),
+            "full": full,
+            "head": head,
+            "speedup": round(full["p50_ms"] / head["p50_ms"], 1) if head["p50_ms"] else None,
+            "same_result": full["result"] == head["result"],
+        }
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+    print(f"{'fixture':<18}{'size':>10}{'full p50':>11}{'head p50':>11}{'read':>9}{'speedup':>9}  same")
+    for name, r in report.items():
+        print(
+            f"{name:<18}{r['size_bytes']:>10}{r['full']['p50_ms']:>9.2f}ms{r['head']['p50_ms']:>9.2f}ms"
+            f"{r['head']['bytes_read']:>9}{r['speedup']:>8}x  {r['same_result']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+썸네일 프록시 벤치마크 (로컬 이미지 서버 + 합성 대표 이미지)
+
+큰 JPEG/PNG 대표 이미지를 로컬 HTTP 서버로 내보내고 ThumbnailStore로
+- 처음 받아 줄여 저장하는 시간 (cold)
+- 이미 만든 썸네일을 찾는 시간 (warm)
+- 원본 대비 브라우저가 받을 바이트 (페이지 무게)
+- 디스크 한도를 작게 줬을 때 정리 후 크기
+를 잰다. 결과는 JSON으로 출력된다.
+
+예시
+  python bench/bench_thumbnails.py --images 40 --width 1920
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from PIL import Image, ImageDraw  # noqa: E402
+
+from bench_load import summarize  # noqa: E402
+from thumb_proxy import ThumbnailStore  # noqa: E402
+
+
+def make_images(count: int, width: int, seed: int) -> Dict[str, bytes]:
+    """사진처럼 압축이 덜 되는 대표 이미지 (3장 중 1장은 투명 PNG)"""
+    rng = random.Random(seed)
+    height = width * 9 // 16
+    images = {}
+    for i in range(count):
+        img = Image.effect_noise((width, height), 40).convert("RGB")
+        draw = ImageDraw.Draw(img)
+        for _ in range(30):
+            x, y = rng.randrange(width), rng.randrange(height)
+            draw.ellipse((x, y, x + rng.randrange(50, 400), y + rng.randrange(50, 300)),
+                         fill=tuple(rng.randrange(256) for _ in range(3)))
+        out = io.BytesIO()
+        if i % 3 == 2:
+            img.convert("RGBA").save(out, "PNG")
+            images[f"hero-{i}.png"] = out.getvalue()
+        else:
+            img.save(out, "JPEG", quality=90)
+            images[f"hero-{i}.jpg"] = out.getvalue()
+    return images
+
+
+def start_image_server(images: Dict[str, bytes]) -> str:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            body = images.get(self.path.rsplit("/", 1)[-1])
+            if body is None:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png" if self.path.endswith(".png") else "image/jpeg")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="image-http", daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--images", type=int, default=30)
+    ap.add_argument("--width", type=int, default=1920, help="원본 이미지 너비(px)")
+    ap.add_argument("--thumb-width", type=int, default=300)
+    ap.add_argument("--quality", type=int, default=70)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    images = make_images(args.images, args.width, args.seed)
+    base = start_image_server(images)
+    sources = [f"{base}/{name}" for name in images]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ThumbnailStore(folder=os.path.join(tmp, "thumbs"), index_path=os.path.join(tmp, "thumbs.sqlite3"),
+                               width=args.thumb_width, quality=args.quality)
+        cold, warm = [], []
+        for url in sources:
+            t0 = time.perf_counter()
+            if store.proxy(url) is None:
+                raise SystemExit(f"proxy failed: {url}")
+            cold.append((time.perf_counter() - t0) * 1000)
+        for url in sources:
+            t0 = time.perf_counter()
+            store.proxy(url)
+            warm.append((time.perf_counter() - t0) * 1000)
+        stats = store.stats()
+
+        # 한도를 절반으로 줄이고 하나 더 넣으면 오래된 파일부터 지워져야 한다
+        store.max_bytes = stats["bytes"] // 2
+        store.store(f"{base}/extra", next(iter(images.values())))
+        after = store.stats()
+
+    source_bytes = sum(len(b) for b in images.values())
+    report = {
+        "images": len(images),
+        "cold_ms": summarize(cold),
+        "warm_ms": summarize(warm),
+        "source_bytes": source_bytes,
+        "stored_bytes": stats["bytes"],
+        "page_weight_ratio": round(stats["bytes"] / source_bytes, 4),
+        "eviction": {"max_bytes": store.max_bytes, "files": after["files"], "bytes": after["bytes"]},
+    }
+    print(json.dumps(report, indent=2))
+    return 0 if after["bytes"] <= store.max_bytes else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+"""
+로컬 가짜 Azure OpenAI 서버 (chat completions, 스트리밍 포함)
+
+프롬프트의 JSON 스키마를 보고 영상 분석/순서/플랜 문구/퀴즈/추천 형식의 더미 응답을 만든다.
+지연 시간, 429 비율, 깨진 JSON 비율을 조절할 수 있다.
+
+단독 실행: python bench/fake_azure.py --port 8011 --latency-ms 300 --rate-429 0.05
+  → AZURE_OPENAI_ENDPOINT=http://127.0.0.1:8011 로 앱/스크립트를 실행
+"""
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Tuple
+
+_PATH_RE = re.compile(r"^/openai/deployments/[^/]+/chat/completions")
+_WORDS = ["변수", "함수", "반복문", "조건문", "리스트", "딕셔너리", "클래스", "모듈", "예외", "파일",
+          "정렬", "탐색", "재귀", "스택", "큐", "그래프", "트리", "해시", "집합", "문자열"]
+
+
+@dataclass
+class FakeConfig:
+    latency_ms: float = 200.0      # 응답(스트리밍이면 첫 조각)까지 평균 지연
+    jitter: float = 0.3            # 지연의 ± 비율
+    chunk_delay_ms: float = 5.0    # 스트리밍 조각 사이 지연
+    chunk_chars: int = 24          # 스트리밍 조각 크기(글자)
+    rate_429: float = 0.0          # 429 응답 비율
+    retry_after_ms: int = 200      # 429에 붙일 retry-after-ms
+    rate_malformed: float = 0.0    # 깨진 JSON 응답 비율
+    seed: int = 0
+
+
+class FakeStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts: Dict[str, int] = {"requests": 0, "stream": 0, "throttled": 0, "malformed": 0, "models": 0}
+
+    def bump(self, key: str) -> None:
+        with self.lock:
+            self.counts[key] += 1
+
+# -------------------------------
+# 더미 응답 본문
+# -------------------------------
+def _listing_refs(text: str) -> List[int]:
+    return [int(n) for n in re.findall(r"^(\d+)\. ", text, re.M)]
+
+
+def _sentence(rng: random.Random, n: int = 4) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(n))
+
+
+def canned_payload(messages: List[Dict[str, str]], rng: random.Random) -> Any:
+    """프롬프트(system 고정 앞부분 + user)에 들어 있는 스키마 이름으로 응답 형식을 고른다"""
+    system = messages[0]["content"] if messages else ""
+    user = messages[-1]["content"] if messages else ""
+    prompt = system + "\n" + user
+    if "JSON 배열" in system:
+        return [{"title": f"추천 강의 {i}", "url": f"https://example.com/rec/{i}"} for i in range(1, 5)]
+    if '"videos"' in prompt:
+        return {"videos": [
+            {"ref": r, "title": f"{_sentence(rng, 2)} 강의", "summary": _sentence(rng, 8),
+             "difficulty": rng.randint(1, 5), "prerequisites": [rng.choice(_WORDS)]}
+            for r in _listing_refs(user.split("동영상:")[-1])
+        ]}
+    if '"ordered_videos"' in prompt:
+        refs = _listing_refs(user.split("JSON 스키마")[0])
+        rng.shuffle(refs)
+        return {"ordered_videos": [{"ref": r, "reason": _sentence(rng, 10)} for r in refs]}
+    if '"day_texts"' in prompt:
+        days = [int(d) for d in re.findall(r"^Day (\d+)", user, re.M)]
+        return {"day_texts": [
+            {"day": d, "goals": [_sentence(rng)], "sessions": [{"focus": _sentence(rng), "tasks": [_sentence(rng, 6)]}] * 3,
+             "review": [_sentence(rng)]}
+            for d in days
+        ]}
+    if '"quiz"' in prompt:
+        m = re.search(r"퀴즈 (\d+)문항", user)
+        refs = _listing_refs(user.split("퀴즈")[0]) or [1]
+        quiz = []
+        for _ in range(int(m.group(1)) if m else 4):
+            choices = [_sentence(rng, 2) for _ in range(4)]
+            quiz.append({"ref": rng.choice(refs), "type": "mc", "question": f"{_sentence(rng, 6)} {rng.randint(0, 10**6)} 에 대한 설명으로 옳은 것은?",
+                         "choices": choices, "answer": rng.choice(choices), "explanation": _sentence(rng, 8)})
+        return {"quiz": quiz}
+    return {}
+
+
+def _maybe_break(text: str, rng: random.Random) -> str:
+    """깨진 JSON: 중간에서 잘리거나 설명문이 붙은 형태"""
+    if rng.random() < 0.5:
+        return text[: max(1, int(len(text) * rng.uniform(0.3, 0.9)))]
+    return "물론이죠! 아래는 결과입니다.\n```json\n" + text.replace('",', '"', 1) + "\n```"
+
+# -------------------------------
+# HTTP 핸들러
+# -------------------------------
+def make_handler(config: FakeConfig, stats: FakeStats):
+    rng = random.Random(config.seed)
+    rng_lock = threading.Lock()
+
+    # 프롬프트 캐시 흉내: 이전에 본 system 메시지(고정 앞부분)면 그 토큰을 128 단위로 캐시 적중 처리
+    seen_prefixes: set = set()
+
+    def cached_tokens(messages: List[Dict[str, str]]) -> int:
+        system = messages[0].get("content", "") if messages else ""
+        with rng_lock:
+            hit = system in seen_prefixes
+            seen_prefixes.add(system)
+        return (len(system) // 2) // 128 * 128 if hit else 0
+
+    def draw() -> Tuple[float, float, float, random.Random]:
+        with rng_lock:
+            return rng.random(), rng.random(), rng.uniform(-config.jitter, config.jitter), random.Random(rng.random())
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _json(self, status: int, body: Any, headers: Dict[str, str] = None) -> None:
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            # 앱 시작 시 연결 예열(models.list) 요청
+            if self.path.startswith("/openai/models"):
+                stats.bump("models")
+                self._json(200, {"object": "list", "data": []})
+                return
+            self._json(404, {"error": {"message": "not found"}})
+
+        def do_POST(self):
+            if not _PATH_RE.match(self.path):
+                self._json(404, {"error": {"message": "not found"}})
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            stats.bump("requests")
+            p429, pbad, jitter, req_rng = draw()
+            if p429 < config.rate_429:
+                stats.bump("throttled")
+                time.sleep(config.latency_ms / 1000 * 0.1)
+                self._json(429, {"error": {"code": "429", "message": "Rate limit is exceeded."}},
+                           {"retry-after-ms": str(config.retry_after_ms)})
+                return
+
+            text = json.dumps(canned_payload(body.get("messages", []), req_rng), ensure_ascii=False)
+            if pbad < config.rate_malformed:
+                stats.bump("malformed")
+                text = _maybe_break(text, req_rng)
+            time.sleep(max(0.0, config.latency_ms * (1 + jitter)) / 1000)
+
+            usage = {"prompt_tokens": sum(len(m.get("content", "")) for m in body.get("messages", [])) // 2,
+                     "completion_tokens": len(text) // 2}
+            usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+            usage["prompt_tokens_details"] = {"cached_tokens": cached_tokens(body.get("messages", []))}
+            if body.get("stream"):
+                stats.bump("stream")
+                include_usage = (body.get("stream_options") or {}).get("include_usage")
+                self._stream(text, usage if include_usage else None)
+                return
+            self._json(200, {
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()), "model": "fake",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+
+        def _stream(self, text: str, usage: Dict[str, Any] = None) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            def send(event: str) -> None:
+                data = f"data: {event}\n\n".encode("utf-8")
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            for i in range(0, len(text), config.chunk_chars):
+                send(json.dumps({
+                    "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()), "model": "fake",
+                    "choices": [{"index": 0, "delta": {"content": text[i:i + config.chunk_chars]}, "finish_reason": None}],
+                }, ensure_ascii=False))
+                if config.chunk_delay_ms:
+                    time.sleep(config.chunk_delay_ms / 1000)
+            if usage:
+                send(json.dumps({"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                                 "model": "fake", "choices": [], "usage": usage}))
+            send("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+
+    return Handler
+
+
+def start_server(config: FakeConfig, port: int = 0) -> Tuple[ThreadingHTTPServer, FakeStats, str]:
+    """데몬 스레드로 서버를 띄우고 (서버, 통계, 엔드포인트 URL) 반환"""
+    stats = FakeStats()
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(config, stats))
+    server.daemon_threads = True
+    # 클라이언트가 먼저 끊는 연결(ConnectionResetError)은 로그로 남기지 않는다
+    server.handle_error = lambda request, client_address: None
+    threading.Thread(target=server.serve_forever, name="fake-azure", daemon=True).start()
+    return server, stats, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--port", type=int, default=8011)
+    ap.add_argument("--latency-ms", type=float, default=200)
+    ap.add_argument("--chunk-delay-ms", type=float, default=5)
+    ap.add_argument("--rate-429", type=float, default=0.0)
+    ap.add_argument("--rate-malformed", type=float, default=0.0)
+    args = ap.parse_args()
+    config = FakeConfig(latency_ms=args.latency_ms, chunk_delay_ms=args.chunk_delay_ms,
+                        rate_429=args.rate_429, rate_malformed=args.rate_malformed)
+    server, _, url = start_server(config, args.port)
+    print(f"fake Azure OpenAI: {url}  (Ctrl+C로 종료)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+썸네일 조회용 로컬 HTML 픽스처 서버
+
+/page/<픽스처 이름>?id=<아무 값> 으로 bench/fixtures/*.html을 돌려준다
+(id를 바꾸면 URL이 달라지므로 썸네일 캐시를 피해 매번 실제로 조회하게 된다).
+본문 뒤에 pad_kb만큼 내용을 덧붙여 무거운 페이지를 흉내 낼 수 있다.
+"""
+import os
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+from urllib.parse import urlparse
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def load_pages(pad_kb: int = 256) -> Dict[str, bytes]:
+    filler = ("<p>" + "강의 본문 내용 " * 20 + "</p>\n").encode("utf-8")
+    pad = filler * max(1, (pad_kb * 1024) // len(filler)) if pad_kb else b""
+    pages = {}
+    for name in sorted(os.listdir(FIXTURE_DIR)):
+        if name.endswith(".html"):
+            with open(os.path.join(FIXTURE_DIR, name), "rb") as f:
+                raw = f.read()
+            idx = raw.lower().rfind(b"</body>")
+            pages[name[:-5]] = raw[:idx] + pad + raw[idx:] if idx != -1 else raw + pad
+    return pages
+
+
+def start_fixture_server(pad_kb: int = 256, latency_ms: float = 20.0) -> Tuple[ThreadingHTTPServer, str, List[str]]:
+    """데몬 스레드로 서버를 띄우고 (서버, 기본 URL, 픽스처 이름 목록) 반환"""
+    pages = load_pages(pad_kb)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            name = urlparse(self.path).path.rsplit("/", 1)[-1]
+            body = pages.get(name)
+            if body is None:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            time.sleep(latency_ms / 1000)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            try:
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                # <head>만 읽고 끊는 클라이언트
+                pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    # 클라이언트가 먼저 끊는 연결(ConnectionResetError)은 로그로 남기지 않는다
+    server.handle_error = lambda request, client_address: None
+    threading.Thread(target=server.serve_forever, name="fixture-http", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}", list(pages)
@@ -0,0 +1,305 @@
+import os
+import time
+import random
+import asyncio
+import threading
+import weakref
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Optional, Set, TypeVar
+
+from tenacity import (
+    AsyncRetrying,
+    RetryCallState,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_random_exponential,
+)
+
+import metrics
+
+if TYPE_CHECKING:
+    from deployment_router import Router, Target
+
+T = TypeVar("T")
+
+# -------------------------------
+# 설정 (배포의 분당 한도에 맞춰 지정, 0이면 제한 없음)
+# -------------------------------
+RPM_LIMIT = int(os.getenv("AZURE_OPENAI_RPM", "0"))
+TPM_LIMIT = int(os.getenv("AZURE_OPENAI_TPM", "0"))
+MAX_RETRIES = int(os.getenv("PLANNER_MAX_RETRIES", "4"))
+BACKOFF_MAX_SEC = float(os.getenv("PLANNER_BACKOFF_MAX_SEC", "30"))
+# 응답 토큰은 미리 알 수 없으므로 예상치로 예약했다가 실제 usage로 정산
+COMPLETION_TOKENS_EST = int(os.getenv("PLANNER_COMPLETION_TOKENS_EST", "1500"))
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, float] = {
+    "calls": 0,
+    "retries": 0,
+    "throttled": 0,
+    "failed": 0,
+    "queued": 0,
+    "queued_peak": 0,
+    "wait_sec_total": 0.0,
+}
+
+
+def _bump(key: str, value: float = 1) -> None:
+    with _stats_lock:
+        _stats[key] += value
+        if key == "queued":
+            _stats["queued_peak"] = max(_stats["queued_peak"], _stats["queued"])
+
+
+def stats() -> Dict[str, Any]:
+    """호출/재시도/스로틀/대기 통계와 현재 동시 실행 한도"""
+    with _stats_lock:
+        out = dict(_stats)
+    out["rpm_limit"] = RPM_LIMIT
+    out["tpm_limit"] = TPM_LIMIT
+    out["concurrency"] = [
+        {"limit": lim.limit, "max": lim.max_limit, "in_flight": lim.in_flight} for lim in list(_limiters)
+    ]
+    return out
+
+# -------------------------------
+# 토큰 버킷 (요청 수 / 토큰 수, 프로세스 전체 공유)
+# -------------------------------
+class RateBuckets:
+    """
+    분당 요청/토큰 한도를 초당 보충되는 버킷 두 개로 관리한다.
+    잔량이 모자라면 미리 예약(음수 잔량)하고 필요한 시간만큼 기다리게 하므로
+    이벤트 루프/스레드에 관계없이 공유할 수 있다.
+    """
+
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._req = float(rpm)
+        self._tok = float(tpm)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._updated = now
+        if self.rpm:
+            self._req = min(self.rpm, self._req + elapsed * self.rpm / 60)
+        if self.tpm:
+            self._tok = min(self.tpm, self._tok + elapsed * self.tpm / 60)
+
+    def reserve(self, tokens: int) -> float:
+        """요청 1건 + tokens를 예약하고, 보내기 전까지 기다려야 할 시간(초)을 반환"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = max(0.0, self._paused_until - now)
+            if self.rpm:
+                self._req -= 1
+                if self._req < 0:
+                    wait = max(wait, -self._req * 60 / self.rpm)
+            if self.tpm:
+                tokens = min(tokens, self.tpm)
+                self._tok -= tokens
+                if self._tok < 0:
+                    wait = max(wait, -self._tok * 60 / self.tpm)
+            return wait
+
+    def settle(self, estimated: int, actual: Optional[int]) -> None:
+        """예상 토큰과 실제 사용량의 차이를 버킷에 반영"""
+        if not self.tpm or actual is None:
+            return
+        with self._lock:
+            self._tok = min(self.tpm, self._tok + estimated - actual)
+
+    def pause(self, seconds: float) -> None:
+        """Retry-After를 받으면 모든 호출을 그 시각까지 멈춘다"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def paused_for(self) -> float:
+        """Retry-After로 멈춘 시간이 얼마나 남았는지(초)"""
+        with self._lock:
+            return max(0.0, self._paused_until - time.monotonic())
+
+
+buckets = RateBuckets(RPM_LIMIT, TPM_LIMIT)
+
+# -------------------------------
+# 적응형 동시 실행 한도 (AIMD)
+# -------------------------------
+_limiters: "weakref.WeakSet" = weakref.WeakSet()
+
+
+class AdaptiveLimiter:
+    """
+    429를 받으면 동시 실행 한도를 절반으로 줄이고,
+    한도만큼 연속 성공하면 1씩 늘린다 (최대 max_limit).
+    asyncio 객체를 쓰므로 이벤트 루프마다 하나씩 만든다.
+    """
+
+    def __init__(self, max_limit: int):
+        self.max_limit = max(1, max_limit)
+        self.limit = self.max_limit
+        self.in_flight = 0
+        self._successes = 0
+        self._cond = asyncio.Condition()
+        _limiters.add(self)
+
+    @asynccontextmanager
+    async def slot(self):
+        _bump("queued")
+        t0 = time.perf_counter()
+        try:
+            async with self._cond:
+                await self._cond.wait_for(lambda: self.in_flight < self.limit)
+                self.in_flight += 1
+        finally:
+            _bump("queued", -1)
+        _bump("wait_sec_total", time.perf_counter() - t0)
+        try:
+            yield
+        finally:
+            async with self._cond:
+                self.in_flight -= 1
+                self._cond.notify_all()
+
+    def on_success(self) -> None:
+        self._successes += 1
+        if self._successes >= self.limit and self.limit < self.max_limit:
+            self.limit += 1
+            self._successes = 0
+            metrics.log_event("scheduler_limit", limit=self.limit, reason="recover")
+
+    def on_throttle(self) -> None:
+        self._successes = 0
+        new_limit = max(1, self.limit // 2)
+        if new_limit != self.limit:
+            self.limit = new_limit
+            metrics.log_event("scheduler_limit", limit=self.limit, reason="throttled")
+
+# -------------------------------
+# 재시도 정책
+# -------------------------------
+def _is_retryable(exc: BaseException) -> bool:
+    import openai  # 무거운 모듈이라 첫 호출 때 불러온다 (이후에는 sys.modules에서 바로 반환)
+
+    if isinstance(exc, (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError,
+                        openai.InternalServerError, asyncio.TimeoutError)):
+        return True
+    return isinstance(exc, openai.APIStatusError) and exc.status_code >= 500
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """응답 헤더의 retry-after-ms / retry-after 값을 초 단위로 반환"""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        return None
+    return None
+
+
+_backoff = wait_random_exponential(multiplier=1, max=BACKOFF_MAX_SEC)
+
+
+def _wait(state: RetryCallState) -> float:
+    """Retry-After가 있으면 그 값(+약간의 지터), 없으면 지수 백오프 + 지터"""
+    exc = state.outcome.exception() if state.outcome else None
+    hinted = retry_after_seconds(exc) if exc else None
+    if hinted is not None:
+        return min(BACKOFF_MAX_SEC, hinted) + random.uniform(0, 0.5)
+    return _backoff(state)
+
+
+def _before_sleep(state: RetryCallState) -> None:
+    exc = state.outcome.exception()
+    _bump("retries")
+    metrics.incr("llm_retries_total", error=type(exc).__name__)
+    metrics.log_event("llm_retry", attempt=state.attempt_number, error=type(exc).__name__,
+                      sleep_sec=round(state.next_action.sleep, 2) if state.next_action else None)
+
+
+async def call_with_retry(
+    limiter: AdaptiveLimiter,
+    router: "Router",
+    make_call: Callable[["Target"], Awaitable[T]],
+    tokens: int,
+    usage_of: Callable[[T], Optional[int]] = lambda _: None,
+) -> T:
+    """
+    대상 선택 → 버킷 예약 → 호출 → 429/5xx/타임아웃이면 재시도.
+    실패한 대상 말고 보낼 곳이 있으면 기다리지 않고 그쪽으로 바로 넘기고(failover),
+    없으면 Retry-After/지수 백오프만큼 기다린다.
+    동시 실행 슬롯은 호출하는 쪽이 limiter.slot()으로 잡고 있어야 한다.
+    """
+    import openai
+
+    _bump("calls")
+    failed: Set[str] = set()
+
+    def wait(state: RetryCallState) -> float:
+        if router.has_alternative(failed):
+            return 0.0
+        return _wait(state)
+
+    retrying = AsyncRetrying(
+        retry=retry_if_exception(_is_retryable),
+        stop=stop_after_attempt(MAX_RETRIES + 1),
+        wait=wait,
+        before_sleep=_before_sleep,
+        reraise=True,
+    )
+    previous: Optional[str] = None
+    try:
+        async for attempt in retrying:
+            with attempt:
+                target = router.pick(exclude=failed)
+                if previous is not None and target.name != previous:
+                    metrics.incr("llm_failover_total", source=previous, target=target.name)
+                previous = target.name
+                t0 = time.perf_counter()
+                outcome = "rejected"
+                try:
+                    wait_sec = target.buckets.reserve(tokens)
+                    if wait_sec > 0:
+                        _bump("wait_sec_total", wait_sec)
+                        await asyncio.sleep(wait_sec)
+                        t0 = time.perf_counter()
+                    result = await make_call(target)
+                    outcome = "ok"
+                except openai.RateLimitError as e:
+                    outcome = "throttled"
+                    failed.add(target.name)
+                    _bump("throttled")
+                    metrics.incr("llm_throttled_total", target=target.name)
+                    hinted = retry_after_seconds(e)
+                    if hinted:
+                        target.buckets.pause(hinted)
+                    # 다른 배포로 넘길 수 있으면 전체 동시 실행 한도는 줄이지 않는다
+                    if not router.has_alternative(failed):
+                        limiter.on_throttle()
+                    raise
+                except BaseException as e:
+                    if _is_retryable(e):
+                        outcome = "error"
+                        failed.add(target.name)
+                    raise
+                finally:
+                    router.finish(target, time.perf_counter() - t0, outcome)
+                limiter.on_success()
+                target.buckets.settle(tokens, usage_of(result))
+                return result
+    except BaseException:
+        _bump("failed")
+        raise
+
+
+def estimate_tokens(*texts: str) -> int:
+    """프롬프트 토큰 대략치 (한국어 기준 2글자 ≈ 1토큰) + 예상 응답 토큰"""
+    return sum(len(t) for t in texts) // 2 + COMPLETION_TOKENS_EST
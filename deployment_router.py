@@ -0,0 +1,195 @@
+import os
+import json
+import time
+import random
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+from dotenv import load_dotenv
+
+import metrics
+from call_scheduler import RPM_LIMIT, TPM_LIMIT, RateBuckets, buckets
+
+# planner보다 먼저 import되어 대상 목록을 만들므로 여기서도 .env를 읽는다 (이미 설정된 값은 덮어쓰지 않음)
+load_dotenv()
+
+# -------------------------------
+# 설정 (환경 변수로 조정 가능)
+# -------------------------------
+# 여러 배포/리전을 쓸 때: JSON 배열
+#   [{"name": "krc", "endpoint": "https://...", "deployment": "gpt-4o-mini", "api_key_env": "AZURE_OPENAI_API_KEY_KRC",
+#     "weight": 2, "rpm": 300, "tpm": 150000}, ...]
+# 없으면 AZURE_OPENAI_ENDPOINT / AZURE_OPENAI_DEPLOYMENT / AZURE_OPENAI_API_KEY 하나만 사용
+TARGETS_JSON = os.getenv("AZURE_OPENAI_TARGETS", "")
+# latency: 관측 지연(EWMA) × (진행 중 요청 + 1) / 가중치가 가장 작은 곳
+# least_outstanding: (진행 중 요청 + 1) / 가중치가 가장 작은 곳
+ROUTER_STRATEGY = os.getenv("ROUTER_STRATEGY", "latency")
+# 연속 실패가 이 횟수에 이르면 회로를 열고 이 시간(초) 동안 보내지 않는다 (이후 요청 1건으로 상태 확인)
+CIRCUIT_FAILURES = int(os.getenv("ROUTER_CIRCUIT_FAILURES", "3"))
+CIRCUIT_OPEN_SEC = float(os.getenv("ROUTER_CIRCUIT_OPEN_SEC", "30"))
+# 지연 EWMA 가중치 / 관측 전 기본 지연(초)
+LATENCY_ALPHA = 0.2
+DEFAULT_LATENCY_SEC = 1.0
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class Target:
+    """엔드포인트/배포 하나와 그 상태 (진행 중 요청 수, 지연 EWMA, 회로 상태, 분당 한도 버킷)"""
+
+    def __init__(
+        self,
+        name: str,
+        endpoint: Optional[str],
+        deployment: Optional[str],
+        api_key: Optional[str],
+        weight: float = 1.0,
+        rate_buckets: Optional[RateBuckets] = None,
+    ):
+        self.name = name
+        self.endpoint = endpoint
+        self.deployment = deployment
+        self.api_key = api_key
+        self.weight = max(weight, 0.01)
+        self.buckets = rate_buckets or RateBuckets(0, 0)
+        self.outstanding = 0
+        self.latency: Optional[float] = None
+        self.failures = 0
+        self.state = CLOSED
+        self.open_until = 0.0
+        self.probing = False
+        self.calls = 0
+        self.errors = 0
+
+    def score(self, strategy: str) -> float:
+        load = (self.outstanding + 1) / self.weight
+        if strategy == "least_outstanding":
+            return load
+        return load * (self.latency if self.latency is not None else DEFAULT_LATENCY_SEC)
+
+
+def load_targets(raw: str = TARGETS_JSON) -> List[Target]:
+    """AZURE_OPENAI_TARGETS(JSON) 또는 단일 엔드포인트 환경 변수로 대상 목록을 만든다"""
+    if not raw.strip():
+        return [Target(
+            "default",
+            os.getenv("AZURE_OPENAI_ENDPOINT"),
+            os.getenv("AZURE_OPENAI_DEPLOYMENT"),
+            os.getenv("AZURE_OPENAI_API_KEY"),
+            rate_buckets=buckets,
+        )]
+    targets = []
+    for i, spec in enumerate(json.loads(raw)):
+        api_key = spec.get("api_key") or os.getenv(spec.get("api_key_env", "AZURE_OPENAI_API_KEY"))
+        targets.append(Target(
+            spec.get("name") or f"target{i}",
+            spec["endpoint"],
+            spec.get("deployment") or os.getenv("AZURE_OPENAI_DEPLOYMENT"),
+            api_key,
+            weight=float(spec.get("weight", 1)),
+            rate_buckets=RateBuckets(int(spec.get("rpm", RPM_LIMIT)), int(spec.get("tpm", TPM_LIMIT))),
+        ))
+    if not targets:
+        raise ValueError("AZURE_OPENAI_TARGETS에 대상이 없습니다.")
+    return targets
+
+# -------------------------------
+# 라우터 (대상 선택 / 상태 추적 / 회로 차단)
+# -------------------------------
+class Router:
+    """
+    호출마다 대상 하나를 고르고 결과를 기록한다.
+    회로가 열린 대상과 Retry-After로 멈춘 대상은 다른 대상이 있는 한 건너뛴다.
+    스레드/이벤트 루프에 관계없이 프로세스 전체에서 공유한다.
+    """
+
+    def __init__(self, targets: List[Target], strategy: str = ROUTER_STRATEGY):
+        self.targets = targets
+        self.strategy = strategy
+        self._lock = threading.Lock()
+
+    def _available(self, target: Target, now: float) -> bool:
+        """회로 상태를 갱신하면서 지금 보낼 수 있는지 판단 (락을 잡은 상태에서 호출)"""
+        if target.state == OPEN and now >= target.open_until:
+            target.state = HALF_OPEN
+            target.probing = False
+        if target.state == OPEN:
+            return False
+        if target.state == HALF_OPEN and target.probing:
+            return False
+        return target.buckets.paused_for() <= 0
+
+    def has_alternative(self, exclude: Iterable[str]) -> bool:
+        """exclude 밖에 지금 보낼 수 있는 대상이 있는지"""
+        exclude = set(exclude)
+        with self._lock:
+            now = time.monotonic()
+            return any(t.name not in exclude and self._available(t, now) for t in self.targets)
+
+    def pick(self, exclude: Iterable[str] = ()) -> Target:
+        """
+        보낼 수 있는 대상 중 점수가 가장 낮은 곳 (같으면 무작위)
+        exclude는 이번 요청에서 이미 실패한 대상, 모두 막혀 있으면 가장 빨리 풀리는 대상을 고른다
+        """
+        exclude = set(exclude)
+        with self._lock:
+            now = time.monotonic()
+            ready = [t for t in self.targets if t.name not in exclude and self._available(t, now)]
+            if not ready:
+                ready = [t for t in self.targets if self._available(t, now)]
+            if ready:
+                best = min(t.score(self.strategy) for t in ready)
+                target = random.choice([t for t in ready if t.score(self.strategy) <= best * 1.0001])
+            else:
+                target = min(self.targets, key=lambda t: max(t.open_until - now, t.buckets.paused_for()))
+            if target.state == HALF_OPEN:
+                target.probing = True
+            target.outstanding += 1
+            target.calls += 1
+        return target
+
+    def finish(self, target: Target, elapsed: float, outcome: str) -> None:
+        """
+        호출 결과 기록 (pick으로 고른 대상마다 한 번)
+        outcome: ok / throttled / error(5xx, 타임아웃, 연결 실패) / rejected(요청 자체의 문제, 상태에 반영 안 함)
+        """
+        with self._lock:
+            target.outstanding -= 1
+            target.probing = False
+            if outcome == "ok":
+                target.latency = elapsed if target.latency is None else \
+                    (1 - LATENCY_ALPHA) * target.latency + LATENCY_ALPHA * elapsed
+                target.failures = 0
+                if target.state != CLOSED:
+                    target.state = CLOSED
+                    metrics.log_event("router_circuit", target=target.name, state=CLOSED)
+            elif outcome == "error":
+                target.errors += 1
+                target.failures += 1
+                if target.state == HALF_OPEN or target.failures >= CIRCUIT_FAILURES:
+                    target.state = OPEN
+                    target.open_until = time.monotonic() + CIRCUIT_OPEN_SEC
+                    metrics.log_event("router_circuit", target=target.name, state=OPEN, failures=target.failures)
+        metrics.incr("llm_target_calls_total", target=target.name, result=outcome)
+        if outcome == "ok":
+            metrics.observe("llm_target_latency_seconds", elapsed, target=target.name)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {
+                    "name": t.name,
+                    "deployment": t.deployment,
+                    "weight": t.weight,
+                    "state": t.state,
+                    "outstanding": t.outstanding,
+                    "latency_ms": round(t.latency * 1000, 1) if t.latency is not None else None,
+                    "calls": t.calls,
+                    "errors": t.errors,
+                }
+                for t in self.targets
+            ]
+
+
+# 앱 전체가 공유하는 라우터
+router = Router(load_targets())
@@ -0,0 +1,38 @@
+import os
+import threading
+from typing import TYPE_CHECKING, Dict
+from urllib.parse import urlparse
+
+if TYPE_CHECKING:
+    import requests
+
+# -------------------------------
+# 설정
+# -------------------------------
+HEADERS = {"User-Agent": "Mozilla/5.0"}
+# 호스트 하나에 동시에 열어 둘 최대 연결 수 (썸네일 워커 수와 맞춘다)
+POOL_MAXSIZE = int(os.getenv("THUMB_MAX_WORKERS", "8"))
+
+_lock = threading.Lock()
+_sessions: Dict[str, "requests.Session"] = {}
+
+# -------------------------------
+# 호스트별 keep-alive 세션
+# -------------------------------
+def session_for(url: str) -> "requests.Session":
+    """같은 호스트 요청은 하나의 세션(커넥션 풀)을 공유 (썸네일 조회와 영상 길이 조회가 함께 쓴다)"""
+    host = urlparse(url).netloc.lower()
+    with _lock:
+        session = _sessions.get(host)
+        if session is None:
+            # 첫 화면 렌더링에는 필요 없으므로 처음 조회할 때 불러온다
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            session.headers.update(HEADERS)
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _sessions[host] = session
+        return session
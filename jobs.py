@@ -0,0 +1,289 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import metrics
+from plan_cache import make_key
+from planner import (
+    QUESTION_BANK_MIN,
+    cached_order,
+    fill_question_bank,
+    generate_order,
+    generate_quiz,
+    generate_study_plan,
+)
+from question_bank import question_bank
+from video_urls import video_id
+
+# -------------------------------
+# 설정 (환경 변수로 조정 가능)
+# -------------------------------
+# 프로세스 전체에서 동시에 실행할 생성 작업 수 / 대기열 최대 길이
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "100"))
+# 끝난 작업을 조회용으로 남겨 두는 시간(초) (긴 재사용은 plan_cache가 담당)
+JOB_RESULT_TTL_SEC = float(os.getenv("JOB_RESULT_TTL_SEC", "300"))
+# 화면에서 진행 상황을 확인하는 간격(초)
+JOB_POLL_SEC = float(os.getenv("JOB_POLL_SEC", "0.5"))
+# 퀴즈를 영상별 문제 은행에서 뽑을지 (끄면 요청마다 새로 생성)
+QUESTION_BANK = os.getenv("QUESTION_BANK", "1") == "1"
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class JobQueueFull(RuntimeError):
+    """대기 중인 작업이 JOB_MAX_PENDING을 넘었을 때"""
+
+
+# -------------------------------
+# 작업 (상태 / 중간 결과 / 최종 결과)
+# -------------------------------
+class Job:
+    def __init__(self, key: str, kind: str):
+        self.key = key
+        self.kind = kind
+        self.status = QUEUED
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        # 같은 작업을 기다리는 요청 수 (처음 요청 포함)
+        self.subscribers = 1
+        self._items: List[Any] = []
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    def push(self, item: Any) -> None:
+        """스트리밍 중 완성된 항목 추가 (폴링하는 쪽이 진행 상황을 그릴 수 있도록)"""
+        with self._lock:
+            self._items.append(item)
+
+    def items(self, start: int = 0) -> List[Any]:
+        with self._lock:
+            return self._items[start:]
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> Any:
+        """끝날 때까지 기다렸다가 결과 반환 (실패한 작업이면 RuntimeError)"""
+        self._done.wait(timeout)
+        if self.status == FAILED:
+            raise RuntimeError(self.error)
+        return self.result
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            n_items = len(self._items)
+        return {
+            "key": self.key,
+            "kind": self.kind,
+            "status": self.status,
+            "items": n_items,
+            "subscribers": self.subscribers,
+            "error": self.error,
+            "age_sec": round(time.time() - self.created_at, 1),
+        }
+
+# -------------------------------
+# 작업 서비스 (워커 풀 + single-flight)
+# -------------------------------
+class JobService:
+    """
+    생성 작업을 프로세스 공용 워커 풀에서 실행한다.
+    같은 key의 작업이 대기/실행 중이면 새로 만들지 않고 그 작업을 돌려준다 (single-flight).
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, max_pending: int = JOB_MAX_PENDING,
+                 result_ttl_sec: float = JOB_RESULT_TTL_SEC):
+        self.max_pending = max_pending
+        self.result_ttl_sec = result_ttl_sec
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, key: str, fn: Callable[[Job], Any], reuse_finished: bool = True) -> Job:
+        """
+        fn(job)을 워커 풀에서 실행하는 작업을 등록하고 반환
+        같은 key가 대기/실행 중이면 합류하고, reuse_finished면 최근에 끝난 성공 결과도 재사용한다
+        """
+        with self._lock:
+            self._prune()
+            job = self._jobs.get(key)
+            if job is not None and (not job.done or (reuse_finished and job.status == DONE)):
+                job.subscribers += 1
+                metrics.incr("jobs_total", kind=kind, result="coalesced" if not job.done else "reused")
+                return job
+            pending = sum(1 for j in self._jobs.values() if not j.done)
+            if pending >= self.max_pending:
+                metrics.incr("jobs_total", kind=kind, result="rejected")
+                raise JobQueueFull(f"대기 중인 작업이 너무 많습니다 ({pending}개)")
+            job = Job(key, kind)
+            self._jobs[key] = job
+            metrics.incr("jobs_total", kind=kind, result="submitted")
+        self._pool.submit(self._execute, job, fn)
+        return job
+
+    def get(self, key: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(key)
+
+    def status(self, key: str) -> Optional[Dict[str, Any]]:
+        """작업 상태 요약 (진행 화면 표시용, 없으면 None)"""
+        job = self.get(key)
+        return job.snapshot() if job else None
+
+    def stats(self) -> Dict[str, int]:
+        """상태별 작업 수 (진행 화면의 대기 건수 표시용)"""
+        with self._lock:
+            counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+        return counts
+
+    def _execute(self, job: Job, fn: Callable[[Job], Any]) -> None:
+        job.status = RUNNING
+        metrics.observe("job_queue_seconds", time.time() - job.created_at, kind=job.kind)
+        try:
+            with metrics.span("job_run", kind=job.kind) as info:
+                job.result = fn(job)
+                info["subscribers"] = job.subscribers
+            job.status = DONE
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+            job._done.set()
+
+    def _prune(self) -> None:
+        """조회 보관 시간이 지난 작업 정리 (락을 잡은 상태에서 호출)"""
+        cutoff = time.time() - self.result_ttl_sec
+        for key in [k for k, j in self._jobs.items() if j.done and (j.finished_at or 0) < cutoff]:
+            del self._jobs[key]
+
+
+# 앱 전체(모든 세션)가 공유하는 작업 서비스
+job_service = JobService()
+
+# -------------------------------
+# 생성 작업 (요청을 정규화한 해시를 key로 사용)
+# -------------------------------
+def request_key(kind: str, urls: List[str], regenerate: bool = False, **params: Any) -> str:
+    """
+    URL 순서/추적 파라미터와 무관한 요청 해시
+    (영상 분석 결과를 영상 id 순으로 정렬해 쓰므로 입력 순서는 결과에 영향이 없다)
+    """
+    vids = sorted({video_id(u) for u in urls if u.strip()})
+    durations = params.pop("durations", None) or {}
+    norm_durations = sorted((video_id(u), float(m)) for u, m in durations.items() if u.strip())
+    return make_key("job", kind, vids, norm_durations, bool(regenerate), params)
+
+
+def _order_job(urls: List[str], regenerate: bool) -> Callable[[Job], Any]:
+    def run(job: Job) -> Dict[str, Any]:
+        for item in generate_order(urls, regenerate=regenerate, stream=True):
+            job.push(item)
+        return {"ordered_videos": job.items()}
+    return run
+
+
+def _study_plan_job(urls: List[str], regenerate: bool, durations: Dict[str, float]) -> Callable[[Job], Any]:
+    def run(job: Job) -> Dict[str, Any]:
+        # 순서는 캐시된 결과를 재사용하고, 플랜만 새로 생성
+        ordered = generate_order(urls)
+        for day in generate_study_plan(ordered, regenerate=regenerate, stream=True, durations=durations):
+            job.push(day)
+        return {"ordered_videos": ordered, "study_plan": job.items()}
+    return run
+
+
+def _bank_fill_job(ordered: List[Dict[str, Any]]) -> Callable[[Job], Any]:
+    def run(job: Job) -> Dict[str, Any]:
+        return {"added": fill_question_bank(ordered)}
+    return run
+
+
+def submit_bank_fill(ordered: List[Dict[str, Any]]) -> Optional[Job]:
+    """
+    문항이 QUESTION_BANK_MIN보다 적은 영상이 있으면 문제 은행 채우기를 작업 풀에 맡긴다
+    (key는 영상 id만으로 정하므로 여러 사용자가 같은 영상으로 퀴즈를 풀어도 한 번만 채운다)
+    """
+    vids = sorted({v["video_id"] for v in ordered if v.get("video_id")})
+    counts = question_bank.counts(vids)
+    if not vids or min(counts.values()) >= QUESTION_BANK_MIN:
+        return None
+    try:
+        return job_service.submit("question_bank", make_key("job", "question_bank", vids), _bank_fill_job(ordered))
+    except JobQueueFull:
+        # 은행 채우기는 다음 퀴즈 요청 때 다시 시도하면 되므로 사용자 요청을 막지 않는다
+        metrics.incr("quiz_bank_total", result="fill_skipped")
+        return None
+
+
+def _quiz_job(urls: List[str], num_questions: int, regenerate: bool, user: Optional[str]) -> Callable[[Job], Any]:
+    def run(job: Job) -> Dict[str, Any]:
+        ordered = generate_order(urls)
+        if user is not None and not regenerate:
+            # 은행이 일부만 차 있어도 문항이 충분하면 바로 뽑고, 모자라면 아래에서 새로 생성
+            # 은행 채우기(영상당 여러 번 호출)는 기다리지 않고 백그라운드 작업으로 넘긴다
+            vids = [v["video_id"] for v in ordered]
+            submit_bank_fill(ordered)
+            if sum(question_bank.counts(vids).values()) >= num_questions:
+                quiz = question_bank.sample(user, vids, num_questions)
+                if len(quiz) >= num_questions:
+                    for q in quiz:
+                        job.push(q)
+                    return {"ordered_videos": ordered, "quiz": quiz}
+        for q in generate_quiz(ordered, num_questions=num_questions, regenerate=regenerate, stream=True):
+            job.push(q)
+        return {"ordered_videos": ordered, "quiz": job.items()}
+    return run
+
+
+def submit_order(urls: List[str], regenerate: bool = False) -> Job:
+    key = request_key("order", urls, regenerate)
+    return job_service.submit("order", key, _order_job(urls, regenerate), reuse_finished=not regenerate)
+
+
+def submit_study_plan(urls: List[str], regenerate: bool = False, durations: Optional[Dict[str, float]] = None) -> Job:
+    key = request_key("study_plan", urls, regenerate, durations=durations)
+    return job_service.submit("study_plan", key, _study_plan_job(urls, regenerate, durations or {}),
+                              reuse_finished=not regenerate)
+
+
+def submit_quiz(urls: List[str], num_questions: int, regenerate: bool = False, user: Optional[str] = None) -> Job:
+    """
+    user가 있으면 문제 은행에서 그 사용자에게 안 낸 문항을 뽑는다
+    (뽑은 결과는 사용자마다 다르므로 key에 user를 넣고, 은행 채우기는 submit_bank_fill이 영상 단위로 한 번만 수행)
+    """
+    if not QUESTION_BANK:
+        user = None
+    key = request_key("quiz", urls, regenerate, num_questions=num_questions, user=user)
+    return job_service.submit("quiz", key, _quiz_job(urls, num_questions, regenerate, user),
+                              reuse_finished=not regenerate and user is None)
+
+
+def quiz_from_bank(user: str, urls: List[str], num_questions: int) -> Optional[Dict[str, Any]]:
+    """
+    순서 결과가 캐시에 있고 문제 은행에 문항이 충분하면 API 호출 없이 바로 퀴즈 구성
+    (작업 대기열을 거치지 않으므로 버튼을 누르자마자 결과가 나온다), 아니면 None
+    """
+    if not QUESTION_BANK:
+        return None
+    ordered = cached_order(urls)
+    if not ordered:
+        metrics.incr("quiz_bank_total", result="miss")
+        return None
+    vids = [v["video_id"] for v in ordered]
+    counts = question_bank.counts(vids)
+    # 은행이 덜 찬 영상이 있으면 작업으로 넘긴다 (작업은 바로 생성한 퀴즈를 주고 은행은 백그라운드에서 채움)
+    if sum(counts.values()) < num_questions or min(counts.values()) < QUESTION_BANK_MIN:
+        metrics.incr("quiz_bank_total", result="miss")
+        return None
+    quiz = question_bank.sample(user, vids, num_questions)
+    metrics.incr("quiz_bank_total", result="hit")
+    return {"ordered_videos": ordered, "quiz": quiz}
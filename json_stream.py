@@ -0,0 +1,80 @@
+import json
+from typing import Any, Iterable, List, Optional, Tuple
+
+# -------------------------------
+# 스트리밍 응답용 점진적 JSON 파서
+# -------------------------------
+class IncrementalJSONParser:
+    """
+    {"섹션": [ {...}, {...} ], ...} 형태의 응답을 조각(chunk) 단위로 받아
+    배열 안의 객체가 닫히는 즉시 (섹션 이름, 객체)를 돌려준다.
+    첫 '{' 앞의 코드펜스/설명 텍스트는 무시한다.
+    """
+
+    def __init__(self, sections: Optional[Iterable[str]] = None):
+        self.sections = set(sections) if sections else None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._key_chars: List[str] = []
+        self._last_key: Optional[str] = None
+        self._section: Optional[str] = None
+        self._item_chars: List[str] = []
+        self._collecting = False
+        self.done = False
+
+    def _wanted(self) -> bool:
+        return self._section is not None and (self.sections is None or self._section in self.sections)
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """새 조각을 읽고, 이번 조각에서 완성된 항목 목록을 반환"""
+        out: List[Tuple[str, Any]] = []
+        for ch in chunk:
+            if self.done:
+                break
+            if self._depth == 0 and ch != "{":
+                continue
+            if self._collecting:
+                self._item_chars.append(ch)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        try:
+                            self._last_key = json.loads('"' + "".join(self._key_chars) + '"')
+                        except ValueError:
+                            self._last_key = None
+                    continue
+                if self._depth == 1:
+                    self._key_chars.append(ch)
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._key_chars = []
+            elif ch in "{[":
+                if self._depth == 1 and ch == "[":
+                    self._section = self._last_key
+                if self._depth == 2 and ch == "{" and self._wanted():
+                    self._collecting = True
+                    self._item_chars = [ch]
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 2 and self._collecting and ch == "}":
+                    self._collecting = False
+                    try:
+                        out.append((self._section, json.loads("".join(self._item_chars))))
+                    except ValueError:
+                        pass
+                    self._item_chars = []
+                elif self._depth == 1 and ch == "]":
+                    self._section = None
+                elif self._depth == 0:
+                    self.done = True
+        return out
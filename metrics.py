@@ -0,0 +1,277 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+# -------------------------------
+# 설정
+# -------------------------------
+# METRICS_LOG=1 이면 span/이벤트를 JSON 한 줄 로그로 출력
+METRICS_LOG = os.getenv("METRICS_LOG", "0") == "1"
+# 지정하면 주기적으로 Prometheus 텍스트 형식으로 덮어쓴다
+METRICS_FILE = os.getenv("METRICS_FILE")
+METRICS_FLUSH_SEC = float(os.getenv("METRICS_FLUSH_SEC", "10"))
+# 지정하면 http://0.0.0.0:<포트>/metrics 로 노출
+METRICS_PORT = os.getenv("METRICS_PORT")
+# 시계열별로 보관할 최근 관측값 수 (p50/p95 계산용)
+SAMPLE_WINDOW = int(os.getenv("METRICS_SAMPLE_WINDOW", "2048"))
+
+logger = logging.getLogger("studyplanner.metrics")
+if METRICS_LOG and not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_lock = threading.Lock()
+_counters: Dict[str, Dict[Labels, float]] = defaultdict(lambda: defaultdict(float))
+_samples: Dict[str, Dict[Labels, deque]] = defaultdict(dict)
+_sums: Dict[str, Dict[Labels, list]] = defaultdict(dict)  # [합계, 개수] (전체 누적)
+_gauges: Dict[str, Dict[Labels, float]] = defaultdict(dict)
+_last_flush = 0.0
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def log_event(event: str, **fields: Any) -> None:
+    """구조화 로그 한 줄 (METRICS_LOG=1 일 때만 출력)"""
+    if METRICS_LOG:
+        logger.info(json.dumps({"ts": round(time.time(), 3), "event": event, **fields}, ensure_ascii=False, default=str))
+
+# -------------------------------
+# 카운터 / 게이지 / 관측값
+# -------------------------------
+def incr(name: str, value: float = 1, **labels: Any) -> None:
+    """카운터 증가 (예: 토큰 수, 캐시 적중 횟수)"""
+    with _lock:
+        _counters[name][_labels(labels)] += value
+
+
+def set_gauge(name: str, value: float, **labels: Any) -> None:
+    """현재 값으로 덮어쓰는 게이지 (예: 저장소 메모리 사용량)"""
+    with _lock:
+        _gauges[name][_labels(labels)] = value
+
+
+def observe(name: str, value: float, **labels: Any) -> None:
+    """관측값 기록 (예: 소요 시간 초)"""
+    key = _labels(labels)
+    with _lock:
+        series = _samples[name].get(key)
+        if series is None:
+            series = _samples[name][key] = deque(maxlen=SAMPLE_WINDOW)
+            _sums[name][key] = [0.0, 0]
+        series.append(value)
+        _sums[name][key][0] += value
+        _sums[name][key][1] += 1
+    maybe_flush()
+
+
+@contextmanager
+def span(name: str, **labels: Any) -> Iterator[Dict[str, Any]]:
+    """
+    구간 소요 시간을 <name>_seconds 로 기록하는 컨텍스트 매니저
+    yield된 dict에 값을 넣으면 로그에 함께 남는다 (예: info["cache_hit"] = True)
+    """
+    info: Dict[str, Any] = {}
+    t0 = time.perf_counter()
+    status = "ok"
+    try:
+        yield info
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - t0
+        observe(f"{name}_seconds", elapsed, status=status, **labels)
+        log_event(name, duration_ms=round(elapsed * 1000, 2), status=status, **labels, **info)
+
+
+def _field(obj: Any, name: str) -> Any:
+    return obj.get(name) if isinstance(obj, dict) else getattr(obj, name, None)
+
+
+def record_usage(usage: Any, **labels: Any) -> None:
+    """
+    API 응답의 usage(prompt/completion 토큰)를 카운터에 누적
+    prompt_tokens_details.cached_tokens(프롬프트 캐시로 재사용된 입력 토큰)도 함께 기록한다
+    """
+    if usage is None:
+        return
+    for field in ("prompt_tokens", "completion_tokens"):
+        value = _field(usage, field)
+        if value:
+            incr(f"llm_{field}_total", value, **labels)
+    if _field(usage, "prompt_tokens"):
+        cached = _field(_field(usage, "prompt_tokens_details") or {}, "cached_tokens") or 0
+        incr("llm_prompt_cache_calls_total", hit="yes" if cached else "no", **labels)
+        if cached:
+            incr("llm_cached_tokens_total", cached, **labels)
+
+
+def prompt_cache_report() -> Dict[str, Dict[str, Any]]:
+    """
+    요청 종류(kind)별 프롬프트 캐시 적중률과 입력 토큰 절감 비율
+    {kind: {"calls", "prefix_hits", "hit_rate", "prompt_tokens", "cached_tokens", "saved_ratio"}}
+    """
+    report: Dict[str, Dict[str, Any]] = defaultdict(
+        lambda: {"calls": 0, "prefix_hits": 0, "prompt_tokens": 0, "cached_tokens": 0}
+    )
+    with _lock:
+        for key, value in _counters.get("llm_prompt_cache_calls_total", {}).items():
+            labels = dict(key)
+            row = report[labels.get("kind", "other")]
+            row["calls"] += int(value)
+            if labels.get("hit") == "yes":
+                row["prefix_hits"] += int(value)
+        for name, field in (("llm_prompt_tokens_total", "prompt_tokens"), ("llm_cached_tokens_total", "cached_tokens")):
+            for key, value in _counters.get(name, {}).items():
+                report[dict(key).get("kind", "other")][field] += int(value)
+    for row in report.values():
+        row["hit_rate"] = round(row["prefix_hits"] / row["calls"], 3) if row["calls"] else 0.0
+        row["saved_ratio"] = round(row["cached_tokens"] / row["prompt_tokens"], 3) if row["prompt_tokens"] else 0.0
+    return dict(report)
+
+# -------------------------------
+# 조회 / 내보내기
+# -------------------------------
+def _quantile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
+
+
+def snapshot() -> Dict[str, Any]:
+    """현재 카운터/게이지와 관측값 요약(p50/p95/개수)을 dict로 반환"""
+    with _lock:
+        counters = {
+            name: {",".join(f"{k}={v}" for k, v in key): value for key, value in series.items()}
+            for name, series in _counters.items()
+        }
+        gauges = {
+            name: {",".join(f"{k}={v}" for k, v in key): value for key, value in series.items()}
+            for name, series in _gauges.items()
+        }
+        summaries = {}
+        for name, series in _samples.items():
+            summaries[name] = {}
+            for key, values in series.items():
+                ordered = sorted(values)
+                summaries[name][",".join(f"{k}={v}" for k, v in key)] = {
+                    "p50": _quantile(ordered, 0.5),
+                    "p95": _quantile(ordered, 0.95),
+                    "count": _sums[name][key][1],
+                }
+    return {"counters": counters, "gauges": gauges, "summaries": summaries, "prompt_cache": prompt_cache_report()}
+
+
+def _fmt_labels(key: Labels, extra: Optional[Dict[str, str]] = None) -> str:
+    items = list(key) + list((extra or {}).items())
+    if not items:
+        return ""
+    def esc(v: str) -> str:
+        return v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(str(v))}"' for k, v in items) + "}"
+
+
+def prometheus_text() -> str:
+    """Prometheus 텍스트 노출 형식으로 변환 (요청 종류별 프롬프트 캐시 적중률/절감 비율 게이지 포함)"""
+    lines = []
+    cache = prompt_cache_report()
+    for name, field in (("llm_prompt_cache_hit_rate", "hit_rate"), ("llm_prompt_cache_saved_ratio", "saved_ratio")):
+        if cache:
+            lines.append(f"# TYPE {name} gauge")
+        for kind, row in sorted(cache.items()):
+            lines.append(f"{name}{_fmt_labels((('kind', kind),))} {row[field]:g}")
+    with _lock:
+        for name, series in sorted(_counters.items()):
+            lines.append(f"# TYPE {name} counter")
+            for key, value in series.items():
+                lines.append(f"{name}{_fmt_labels(key)} {value:g}")
+        for name, series in sorted(_gauges.items()):
+            lines.append(f"# TYPE {name} gauge")
+            for key, value in series.items():
+                lines.append(f"{name}{_fmt_labels(key)} {value:g}")
+        for name, series in sorted(_samples.items()):
+            lines.append(f"# TYPE {name} summary")
+            for key, values in series.items():
+                ordered = sorted(values)
+                for q in (0.5, 0.95, 0.99):
+                    lines.append(f"{name}{_fmt_labels(key, {'quantile': str(q)})} {_quantile(ordered, q):.6f}")
+                total, count = _sums[name][key]
+                lines.append(f"{name}_sum{_fmt_labels(key)} {total:.6f}")
+                lines.append(f"{name}_count{_fmt_labels(key)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path: str) -> None:
+    """Prometheus 텍스트를 파일에 원자적으로 덮어쓰기 (node_exporter textfile 수집용)"""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(prometheus_text())
+    os.replace(tmp, path)
+
+
+def maybe_flush() -> None:
+    """METRICS_FILE이 설정되어 있으면 METRICS_FLUSH_SEC마다 파일로 내보낸다"""
+    global _last_flush
+    if not METRICS_FILE:
+        return
+    now = time.monotonic()
+    if now - _last_flush < METRICS_FLUSH_SEC:
+        return
+    _last_flush = now
+    try:
+        write_prometheus(METRICS_FILE)
+    except OSError:
+        pass
+
+# -------------------------------
+# /metrics HTTP 엔드포인트
+# -------------------------------
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+_server: Optional[ThreadingHTTPServer] = None
+
+
+def start_http_server(port: int) -> None:
+    """프로세스당 한 번만 /metrics 서버를 데몬 스레드로 띄운다"""
+    global _server
+    with _lock:
+        if _server is not None:
+            return
+        try:
+            _server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+        except OSError:
+            return
+    threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+
+
+if METRICS_PORT:
+    start_http_server(int(METRICS_PORT))
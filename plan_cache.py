@@ -0,0 +1,151 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from sqlite_store import SQLiteStore
+
+# -------------------------------
+# 캐시 설정 (환경 변수로 조정 가능)
+# -------------------------------
+CACHE_PATH = os.getenv("PLAN_CACHE_PATH", os.path.join(".cache", "plan_cache.sqlite3"))
+CACHE_TTL_SEC = int(os.getenv("PLAN_CACHE_TTL_SEC", str(7 * 24 * 3600)))
+CACHE_MEMORY_ITEMS = int(os.getenv("PLAN_CACHE_MEMORY_ITEMS", "128"))
+CACHE_DISK_ITEMS = int(os.getenv("PLAN_CACHE_DISK_ITEMS", "2000"))
+
+
+# -------------------------------
+# 캐시 키 생성
+# -------------------------------
+def make_key(*parts: Any) -> str:
+    """요청 파라미터를 정규화된 JSON으로 직렬화한 뒤 sha256 해시로 키 생성"""
+    canonical = json.dumps(parts, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+# -------------------------------
+# 2단 캐시 (메모리 LRU + SQLite)
+# -------------------------------
+class PlanCache(SQLiteStore):
+    """메모리 LRU → SQLite 순서로 조회하는 결과 캐시 (TTL/개수 기반 만료)"""
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS plan_cache ("
+        " key TEXT PRIMARY KEY,"
+        " value TEXT NOT NULL,"
+        " created_at REAL NOT NULL,"
+        " accessed_at REAL NOT NULL);"
+        "CREATE INDEX IF NOT EXISTS idx_plan_cache_accessed ON plan_cache(accessed_at);"
+    )
+
+    def __init__(
+        self,
+        path: Optional[str] = CACHE_PATH,
+        ttl_sec: int = CACHE_TTL_SEC,
+        memory_items: int = CACHE_MEMORY_ITEMS,
+        disk_items: int = CACHE_DISK_ITEMS,
+    ):
+        super().__init__(path or "")
+        self.ttl_sec = ttl_sec
+        self.memory_items = memory_items
+        self.disk_items = disk_items
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = {"memory": 0, "disk": 0}
+        self.misses = 0
+
+    def _db(self) -> Optional[sqlite3.Connection]:
+        """SQLite 연결을 처음 쓸 때 연다 (path가 없으면 메모리만 사용)"""
+        if not self.path:
+            return None
+        return super()._db()
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_sec > 0 and now - created_at > self.ttl_sec
+
+    def _remember(self, key: str, value: Any, created_at: float) -> None:
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Any]:
+        """캐시 조회. 없거나 만료되었으면 None"""
+        now = time.time()
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None:
+                value, created_at = item
+                if not self._expired(created_at, now):
+                    self._memory.move_to_end(key)
+                    self.hits["memory"] += 1
+                    return value
+                del self._memory[key]
+
+            try:
+                db = self._db()
+                row = db.execute(
+                    "SELECT value, created_at FROM plan_cache WHERE key = ?", (key,)
+                ).fetchone() if db else None
+                if row and not self._expired(row[1], now):
+                    db.execute("UPDATE plan_cache SET accessed_at = ? WHERE key = ?", (now, key))
+                    db.commit()
+                    value = json.loads(row[0])
+                    self._remember(key, value, row[1])
+                    self.hits["disk"] += 1
+                    return value
+            except sqlite3.Error:
+                pass
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: Any) -> None:
+        """캐시 저장 후 만료/초과 항목 정리"""
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            try:
+                db = self._db()
+                if not db:
+                    return
+                db.execute(
+                    "INSERT OR REPLACE INTO plan_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False), now, now),
+                )
+                if self.ttl_sec > 0:
+                    db.execute("DELETE FROM plan_cache WHERE created_at < ?", (now - self.ttl_sec,))
+                db.execute(
+                    "DELETE FROM plan_cache WHERE key NOT IN ("
+                    " SELECT key FROM plan_cache ORDER BY accessed_at DESC LIMIT ?)",
+                    (self.disk_items,),
+                )
+                db.commit()
+            except sqlite3.Error:
+                pass
+
+    def clear(self) -> None:
+        """메모리/디스크 캐시 전체 삭제"""
+        with self._lock:
+            self._memory.clear()
+            try:
+                db = self._db()
+                if db:
+                    db.execute("DELETE FROM plan_cache")
+                    db.commit()
+            except sqlite3.Error:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        """적중/실패 횟수와 현재 메모리 항목 수"""
+        with self._lock:
+            lookups = self.hits["memory"] + self.hits["disk"] + self.misses
+            return {
+                "memory_hits": self.hits["memory"],
+                "disk_hits": self.hits["disk"],
+                "misses": self.misses,
+                "hit_rate": (lookups - self.misses) / lookups if lookups else 0.0,
+                "memory_items": len(self._memory),
+            }
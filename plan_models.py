@@ -0,0 +1,78 @@
+from typing import Any, Dict, List, Tuple, Type
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, model_validator
+
+# -------------------------------
+# 섹션 항목 타입 (structured 모드 검증용)
+# -------------------------------
+class _Item(BaseModel):
+    # 스키마에 없는 필드가 와도 버리지 않고 그대로 둔다
+    model_config = ConfigDict(extra="allow")
+
+
+class VideoAnalysis(_Item):
+    ref: int
+    title: str
+    summary: str = ""
+    difficulty: int = Field(default=3, ge=1, le=5)
+    prerequisites: List[str] = []
+
+
+class OrderItem(_Item):
+    """ref는 프롬프트에 준 영상 번호 (url/제목은 영상 분석 캐시에서 채운다)"""
+    ref: int
+    reason: str = ""
+
+
+class SessionText(_Item):
+    focus: str
+    tasks: List[str] = Field(min_length=1)
+
+
+class DayText(_Item):
+    """로컬 일정에 채울 문구 (시간/세션 배치는 study_scheduler가 정한다)"""
+    day: int
+    goals: List[str]
+    sessions: List[SessionText] = Field(min_length=1)
+    review: List[str] = []
+
+
+class QuizItem(_Item):
+    type: str = "mc"
+    question: str = Field(min_length=1)
+    choices: List[str] = Field(min_length=2)
+    answer: str
+    explanation: str = ""
+
+    @model_validator(mode="after")
+    def _answer_in_choices(self) -> "QuizItem":
+        """answer가 보기 문자열과 다르면 'A'~'D' 같은 보기 기호인지 보고 맞춰 준다"""
+        if self.answer in self.choices:
+            return self
+        letter = self.answer.strip().rstrip(".)").upper()
+        if len(letter) == 1 and 0 <= ord(letter) - ord("A") < len(self.choices):
+            self.answer = self.choices[ord(letter) - ord("A")]
+            return self
+        raise ValueError("answer가 choices 중 하나가 아닙니다")
+
+
+SECTION_MODELS: Dict[str, Type[_Item]] = {
+    "videos": VideoAnalysis,
+    "ordered_videos": OrderItem,
+    "day_texts": DayText,
+    "quiz": QuizItem,
+}
+
+
+def validate_item(section: str, raw: Any) -> Tuple[Dict[str, Any], str]:
+    """
+    항목 하나를 섹션 모델로 검증
+    성공하면 (정규화된 dict, ""), 실패하면 ({}, 오류 요약)
+    """
+    model = SECTION_MODELS.get(section)
+    if model is None:
+        return (raw, "") if isinstance(raw, dict) else ({}, "객체가 아닙니다")
+    try:
+        return model.model_validate(raw).model_dump(), ""
+    except ValidationError as e:
+        return {}, "; ".join(f"{'.'.join(map(str, err['loc'])) or '항목'}: {err['msg']}" for err in e.errors())
@@ -0,0 +1,197 @@
+import os
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+from plan_cache import make_key
+from sqlite_store import SQLiteStore
+from video_urls import video_id
+
+# -------------------------------
+# 저장소 설정 (환경 변수로 조정 가능)
+# -------------------------------
+STORE_PATH = os.getenv("PLAN_STORE_PATH", os.path.join(".cache", "plan_store.sqlite3"))
+# 이 기간 동안 열어보지 않은 플랜은 삭제 / 이 기간이 지나면 응시 기록을 점수만 남기고 정리 (0이면 끔)
+RETENTION_DAYS = float(os.getenv("PLAN_STORE_RETENTION_DAYS", "90"))
+COMPACT_DAYS = float(os.getenv("PLAN_STORE_COMPACT_DAYS", "14"))
+# 사용자별 보관 플랜 수 / 정리된 플랜에 남길 최근 응시 기록 수
+MAX_PLANS_PER_USER = int(os.getenv("PLAN_STORE_MAX_PER_USER", "50"))
+COMPACT_KEEP_ATTEMPTS = 5
+
+
+def url_set_hash(urls: List[str]) -> str:
+    """순서/중복/추적 파라미터와 무관한 URL 집합 해시 (같은 영상 묶음이면 같은 값)"""
+    return make_key(sorted({video_id(u) for u in urls if u.strip()}))
+
+
+def _title_of(result: Dict[str, Any]) -> str:
+    videos = result.get("ordered_videos") or []
+    if not videos:
+        return "(제목 없음)"
+    first = videos[0].get("title_guess") or videos[0].get("url", "")
+    return f"{first} 외 {len(videos) - 1}개" if len(videos) > 1 else first
+
+
+# -------------------------------
+# 플랜 / 퀴즈 응시 기록 저장소 (SQLite)
+# -------------------------------
+class PlanStore(SQLiteStore):
+    """
+    사용자(세션 토큰)별로 생성 결과와 퀴즈 응시 기록을 저장한다.
+    플랜은 (사용자, 갱신 시각) / URL 집합 해시 / 생성 시각으로 조회할 수 있다.
+    """
+
+    PRAGMAS = ("PRAGMA foreign_keys = ON",)
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS plans ("
+        " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+        " user TEXT NOT NULL,"
+        " url_hash TEXT NOT NULL,"
+        " urls TEXT NOT NULL,"
+        " title TEXT NOT NULL,"
+        " result TEXT NOT NULL,"
+        " created_at REAL NOT NULL,"
+        " updated_at REAL NOT NULL);"
+        "CREATE INDEX IF NOT EXISTS idx_plans_user ON plans(user, updated_at);"
+        "CREATE INDEX IF NOT EXISTS idx_plans_url_hash ON plans(url_hash, created_at);"
+        "CREATE INDEX IF NOT EXISTS idx_plans_created ON plans(created_at);"
+        "CREATE TABLE IF NOT EXISTS quiz_attempts ("
+        " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+        " plan_id INTEGER NOT NULL REFERENCES plans(id) ON DELETE CASCADE,"
+        " score INTEGER NOT NULL,"
+        " total INTEGER NOT NULL,"
+        " answers TEXT,"
+        " created_at REAL NOT NULL);"
+        "CREATE INDEX IF NOT EXISTS idx_attempts_plan ON quiz_attempts(plan_id, created_at);"
+    )
+
+    def __init__(
+        self,
+        path: str = STORE_PATH,
+        retention_days: float = RETENTION_DAYS,
+        compact_days: float = COMPACT_DAYS,
+        max_plans_per_user: int = MAX_PLANS_PER_USER,
+    ):
+        super().__init__(path)
+        self.retention_days = retention_days
+        self.compact_days = compact_days
+        self.max_plans_per_user = max_plans_per_user
+
+    def save_plan(self, user: str, urls: List[str], result: Dict[str, Any], plan_id: Optional[int] = None) -> int:
+        """
+        결과 저장 후 플랜 id 반환
+        plan_id가 같은 사용자/같은 URL 집합의 플랜이면 갱신하고, 아니면 새로 만든다
+        """
+        now = time.time()
+        url_hash = url_set_hash(urls)
+        payload = json.dumps(result, ensure_ascii=False)
+        with self._lock:
+            db = self._db()
+            row = None
+            if plan_id is not None:
+                row = db.execute(
+                    "SELECT id FROM plans WHERE id = ? AND user = ? AND url_hash = ?", (plan_id, user, url_hash)
+                ).fetchone()
+            if row:
+                db.execute(
+                    "UPDATE plans SET result = ?, title = ?, urls = ?, updated_at = ? WHERE id = ?",
+                    (payload, _title_of(result), json.dumps(urls, ensure_ascii=False), now, plan_id),
+                )
+            else:
+                plan_id = db.execute(
+                    "INSERT INTO plans (user, url_hash, urls, title, result, created_at, updated_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (user, url_hash, json.dumps(urls, ensure_ascii=False), _title_of(result), payload, now, now),
+                ).lastrowid
+            db.commit()
+            self._maybe_maintain(now)
+            return plan_id
+
+    def record_attempt(self, plan_id: int, score: int, total: int, answers: Optional[List[Any]] = None) -> None:
+        """퀴즈 응시 결과(점수/답안) 기록"""
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT INTO quiz_attempts (plan_id, score, total, answers, created_at) VALUES (?, ?, ?, ?, ?)",
+                (plan_id, score, total, json.dumps(answers, ensure_ascii=False) if answers is not None else None, now),
+            )
+            db.execute("UPDATE plans SET updated_at = ? WHERE id = ?", (now, plan_id))
+            db.commit()
+
+    def list_plans(self, user: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """최근에 사용한 순서로 플랜 요약 목록 (결과 본문은 읽지 않는다)"""
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT p.id, p.title, p.url_hash, p.created_at, p.updated_at,"
+                " COUNT(a.id), MAX(CAST(a.score AS REAL) / NULLIF(a.total, 0))"
+                " FROM plans p LEFT JOIN quiz_attempts a ON a.plan_id = p.id"
+                " WHERE p.user = ? GROUP BY p.id ORDER BY p.updated_at DESC LIMIT ?",
+                (user, limit),
+            ).fetchall()
+        return [
+            {"id": r[0], "title": r[1], "url_hash": r[2], "created_at": r[3], "updated_at": r[4],
+             "attempts": r[5], "best_ratio": r[6]}
+            for r in rows
+        ]
+
+    def load_plan(self, plan_id: int, user: str) -> Optional[Dict[str, Any]]:
+        """플랜 본문 + 응시 기록 (다른 사용자의 플랜이면 None)"""
+        with self._lock:
+            db = self._db()
+            row = db.execute(
+                "SELECT urls, result, created_at, updated_at FROM plans WHERE id = ? AND user = ?", (plan_id, user)
+            ).fetchone()
+            if not row:
+                return None
+            attempts = db.execute(
+                "SELECT score, total, answers, created_at FROM quiz_attempts WHERE plan_id = ? ORDER BY created_at",
+                (plan_id,),
+            ).fetchall()
+        return {
+            "id": plan_id,
+            "urls": json.loads(row[0]),
+            "result": json.loads(row[1]),
+            "created_at": row[2],
+            "updated_at": row[3],
+            "attempts": [
+                {"score": a[0], "total": a[1], "answers": json.loads(a[2]) if a[2] else None, "created_at": a[3]}
+                for a in attempts
+            ],
+        }
+
+    # -------------------------------
+    # 보관 정책 (만료 / 정리)
+    # -------------------------------
+    def _maintain(self, now: float) -> None:
+        """오래된 플랜 삭제, 사용자별 개수 제한, 오래된 응시 기록은 점수만 남기고 정리 (락을 잡은 상태에서 호출)"""
+        db = self._db()
+        if self.retention_days > 0:
+            db.execute("DELETE FROM plans WHERE updated_at < ?", (now - self.retention_days * 86400,))
+        if self.max_plans_per_user > 0:
+            db.execute(
+                "DELETE FROM plans WHERE id IN ("
+                " SELECT id FROM (SELECT id, ROW_NUMBER() OVER (PARTITION BY user ORDER BY updated_at DESC) AS rn"
+                " FROM plans) WHERE rn > ?)",
+                (self.max_plans_per_user,),
+            )
+        if self.compact_days > 0:
+            cutoff = now - self.compact_days * 86400
+            db.execute("UPDATE quiz_attempts SET answers = NULL WHERE created_at < ? AND answers IS NOT NULL", (cutoff,))
+            db.execute(
+                "DELETE FROM quiz_attempts WHERE created_at < ? AND id IN ("
+                " SELECT id FROM (SELECT id, ROW_NUMBER() OVER (PARTITION BY plan_id ORDER BY created_at DESC) AS rn"
+                " FROM quiz_attempts) WHERE rn > ?)",
+                (cutoff, COMPACT_KEEP_ATTEMPTS),
+            )
+        db.commit()
+
+    def maintain(self) -> None:
+        """보관 정책을 바로 적용"""
+        with self._lock:
+            self._last_maintenance = time.time()
+            self._maintain(self._last_maintenance)
+
+
+# 앱 전체가 공유하는 저장소 (연결은 처음 쓸 때 연다)
+plan_store = PlanStore()
@@ -1,168 +1,1363 @@
 import os
 import re
 import json
-from typing import Any, Dict, List, Optional
+import time
+import asyncio
+import threading
+import weakref
+import concurrent.futures
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple, Union
 from dotenv import load_dotenv
-from openai import AzureOpenAI
+from plan_cache import PlanCache, make_key
+from json_stream import IncrementalJSONParser
+import metrics
+from call_scheduler import AdaptiveLimiter, call_with_retry, estimate_tokens
+from deployment_router import Target, router
+from question_bank import question_bank
+from quiz_analytics import DEFAULT_CUTOFFS, attempt_log, weak_video
+from quiz_dedup import NearDuplicateFilter
+from study_scheduler import build_schedule, describe_schedule, merge_day_text, resolve_durations
+from video_urls import canonical_url, video_id
+
+if TYPE_CHECKING:
+    # openai 패키지는 import만 1초 가까이 걸려 첫 호출 때 불러온다 (콜드 스타트 단축)
+    from openai import AsyncAzureOpenAI
 
 # -------------------------------
 # 환경 변수 로드
 # -------------------------------
 load_dotenv()
 
-client = AzureOpenAI(
-    api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-    api_version="2023-05-15",
-    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+# 캐시 키에 쓰는 모델 이름 (여러 배포로 라우팅해도 같은 모델이면 캐시를 공유한다)
+DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT") or router.targets[0].deployment
+
+# 이벤트 루프당 동시에 진행할 수 있는 최대 API 호출 수 (스로틀 시 자동으로 줄어듦) / 호출 1회 제한 시간
+MAX_CONCURRENCY = int(os.getenv("PLANNER_MAX_CONCURRENCY", "8"))
+REQUEST_TIMEOUT_SEC = float(os.getenv("PLANNER_TIMEOUT_SEC", "90"))
+
+# PLANNER_STRUCTURED_OUTPUT=1 이면 JSON 응답 모드 + 항목별 타입 검증, 깨진 항목만 다시 요청
+# (response_format은 2023-12-01-preview 이후 API 버전에서만 지원)
+STRUCTURED_OUTPUT = os.getenv("PLANNER_STRUCTURED_OUTPUT", "0") == "1"
+API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION", "2024-06-01" if STRUCTURED_OUTPUT else "2023-05-15")
+REPAIR_ROUNDS = int(os.getenv("PLANNER_REPAIR_ROUNDS", "1"))
+# 스트리밍 응답에도 usage(캐시된 입력 토큰 포함)를 받을지 (stream_options는 2024-09-01 이후 API 버전에서 지원)
+STREAM_USAGE = os.getenv("PLANNER_STREAM_USAGE", "1" if API_VERSION >= "2024-09-01" else "0") == "1"
+
+# 앱 시작 시 엔드포인트와 TLS 연결을 백그라운드에서 미리 맺어 둘지 (start_background)
+PREWARM = os.getenv("PLANNER_PREWARM", "1") == "1"
+PREWARM_TIMEOUT_SEC = float(os.getenv("PLANNER_PREWARM_TIMEOUT_SEC", "5"))
+
+# 프롬프트/스키마를 바꾸면 올려서 이전 캐시가 재사용되지 않도록 한다
+PROMPT_VERSION = 4
+
+# 생성 결과 캐시 (메모리 LRU + SQLite)
+plan_cache = PlanCache()
+
+SYSTEM_PROMPT = (
+    "너는 한국어로 답하는 교육 설계 도우미다. "
+    "반드시 JSON만 출력하고, 마크다운/설명/코드펜스를 절대 포함하지 마."
 )
-DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT")
+
+# -------------------------------
+# 프롬프트 고정 앞부분 (import 시 한 번만 만든다)
+# -------------------------------
+# 공급자의 프롬프트 캐시는 앞부분이 글자 단위로 같아야 재사용되므로
+# 규칙/스키마처럼 바뀌지 않는 내용은 system 메시지에 먼저 두고, 영상 목록/개수 같은 값은 user 메시지에 둔다
+PROMPT_PREFIXES: Dict[str, str] = {}
+
+
+def _compile_prefix(kind: str, rules: str, schema: Optional[str] = None) -> str:
+    """버전 태그 + 공통 지시 + 규칙 + 공백 없는 스키마를 이어 붙인 고정 앞부분을 등록하고 반환"""
+    parts = [f"[prompt v{PROMPT_VERSION}/{kind}]", SYSTEM_PROMPT, rules.strip()]
+    if schema:
+        parts.append("JSON 스키마:\n" + json.dumps(json.loads(schema), ensure_ascii=False, separators=(",", ":")))
+    PROMPT_PREFIXES[kind] = "\n\n".join(parts)
+    return PROMPT_PREFIXES[kind]
+
+# -------------------------------
+# 비동기 클라이언트 (이벤트 루프별로 공유)
+# -------------------------------
+# httpx 커넥션은 만든 루프에 묶이므로 루프마다 (대상별 클라이언트, 동시 실행 제한기)를 하나씩 둔다
+_loop_state: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def _async_state() -> Tuple[Dict[str, "AsyncAzureOpenAI"], AdaptiveLimiter]:
+    loop = asyncio.get_running_loop()
+    state = _loop_state.get(loop)
+    if state is None:
+        # 배포를 추가하면 동시에 보낼 수 있는 호출 수도 함께 늘어난다
+        state = ({}, AdaptiveLimiter(MAX_CONCURRENCY * len(router.targets)))
+        _loop_state[loop] = state
+    return state
+
+
+def _client(target: Target) -> "AsyncAzureOpenAI":
+    """현재 루프에서 target(엔드포인트/배포)으로 보내는 클라이언트"""
+    clients, _ = _async_state()
+    client = clients.get(target.name)
+    if client is None:
+        from openai import AsyncAzureOpenAI
+
+        client = AsyncAzureOpenAI(
+            api_key=target.api_key,
+            api_version=API_VERSION,
+            azure_endpoint=target.endpoint,
+            # 재시도/다른 배포로 넘기기는 call_scheduler가 직접 한다
+            max_retries=0,
+        )
+        clients[target.name] = client
+    return client
+
+# -------------------------------
+# 동기 API용 백그라운드 이벤트 루프
+# -------------------------------
+_bg_loop: Optional[asyncio.AbstractEventLoop] = None
+_bg_lock = threading.Lock()
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    """동기 함수들이 공유하는 이벤트 루프 (데몬 스레드에서 계속 실행)"""
+    global _bg_loop
+    with _bg_lock:
+        if _bg_loop is None:
+            _bg_loop = asyncio.new_event_loop()
+            threading.Thread(target=_bg_loop.run_forever, name="planner-loop", daemon=True).start()
+        return _bg_loop
+
+
+def _run(coro) -> Any:
+    """코루틴을 백그라운드 루프에서 실행하고 결과를 기다린다"""
+    return asyncio.run_coroutine_threadsafe(coro, _background_loop()).result()
+
+
+def _iter_sync(agen: AsyncIterator[Any]) -> Iterator[Any]:
+    """비동기 이터레이터를 백그라운드 루프에서 한 항목씩 꺼내는 동기 이터레이터로 변환"""
+    loop = _background_loop()
+    while True:
+        try:
+            item = asyncio.run_coroutine_threadsafe(agen.__anext__(), loop).result()
+        except StopAsyncIteration:
+            return
+        yield item
+
+
+async def _aprewarm_target(target: Target) -> None:
+    client = _client(target)
+    if not PREWARM or not target.endpoint:
+        return
+    with metrics.span("planner_prewarm", target=target.name) as info:
+        try:
+            # 가벼운 GET 한 번이면 httpx 풀에 연결이 남아 첫 생성 요청이 핸드셰이크를 건너뛴다
+            await client.with_options(timeout=PREWARM_TIMEOUT_SEC).models.list()
+            info["result"] = "ok"
+        except Exception as e:
+            info["result"] = type(e).__name__
+
+
+async def _aprewarm() -> None:
+    """대상마다 클라이언트를 만들고 엔드포인트와 TLS 연결을 미리 맺어 둔다 (응답 내용/오류는 무시)"""
+    await asyncio.gather(*(_aprewarm_target(t) for t in router.targets))
+
+
+def start_background() -> asyncio.AbstractEventLoop:
+    """
+    백그라운드 루프를 띄우고, 그 루프에서 openai import/클라이언트 생성/TLS 연결을 미리 시작한다
+    기다리지 않으므로 첫 화면 렌더링을 막지 않는다
+    """
+    loop = _background_loop()
+    asyncio.run_coroutine_threadsafe(_aprewarm(), loop)
+    return loop
 
 # -------------------------------
 # JSON 추출 유틸 함수
 # -------------------------------
 def _extract_json(text: str) -> Optional[Dict[str, Any]]:
-    """GPT 응답에서 JSON만 뽑아내는 함수"""
+    """GPT 응답에서 JSON만 뽑아내는 함수 (어느 경로로 파싱됐는지 json_extract_total에 기록)"""
     if not text:
+        metrics.incr("json_extract_total", path="empty")
         return None
-    cleaned = re.sub(r"```(?:json)?", "", text).strip("` \n\t")
-    start, end = cleaned.find("{"), cleaned.rfind("}")
-    if start != -1 and end != -1:
+    with metrics.span("json_extract"):
+        cleaned = re.sub(r"```(?:json)?", "", text).strip("` \n\t")
+        start, end = cleaned.find("{"), cleaned.rfind("}")
+        if start != -1 and end != -1:
+            try:
+                parsed = json.loads(cleaned[start:end+1])
+                metrics.incr("json_extract_total", path="braces")
+                return parsed
+            except:
+                pass
         try:
-            return json.loads(cleaned[start:end+1])
+            parsed = json.loads(cleaned)
+            metrics.incr("json_extract_total", path="whole")
+            return parsed
         except:
-            pass
+            metrics.incr("json_extract_total", path="failed")
+            return None
+
+# -------------------------------
+# 공통 호출 / 캐시 유틸
+# -------------------------------
+def _messages(system: str, user: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": user},
+    ]
+
+
+def _call_kwargs(temperature: Optional[float], json_mode: bool) -> Dict[str, Any]:
+    kwargs: Dict[str, Any] = {"temperature": temperature} if temperature is not None else {}
+    if json_mode:
+        kwargs["response_format"] = {"type": "json_object"}
+    return kwargs
+
+
+async def _achat(
+    system: str,
+    user: str,
+    temperature: Optional[float] = None,
+    timeout: Optional[float] = None,
+    kind: str = "other",
+    json_mode: bool = False,
+) -> str:
+    """채팅 완성 1회 호출 후 본문 텍스트 반환 (동시 실행 한도/분당 한도/재시도는 call_scheduler가 관리)"""
+    _, limiter = _async_state()
+    kwargs = _call_kwargs(temperature, json_mode)
+    async with limiter.slot():
+        with metrics.span("llm_call", kind=kind, mode="complete") as info:
+            resp = await call_with_retry(
+                limiter,
+                router,
+                lambda target: asyncio.wait_for(
+                    _client(target).chat.completions.create(
+                        model=target.deployment, messages=_messages(system, user), **kwargs
+                    ),
+                    timeout or REQUEST_TIMEOUT_SEC,
+                ),
+                estimate_tokens(system, user),
+                usage_of=lambda r: getattr(getattr(r, "usage", None), "total_tokens", None),
+            )
+            usage = getattr(resp, "usage", None)
+            metrics.record_usage(usage, kind=kind)
+            info["prompt_tokens"] = getattr(usage, "prompt_tokens", None)
+            info["completion_tokens"] = getattr(usage, "completion_tokens", None)
+            info["cached_tokens"] = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None)
+    return resp.choices[0].message.content
+
+
+async def _achat_stream(
+    system: str,
+    user: str,
+    temperature: Optional[float] = None,
+    timeout: Optional[float] = None,
+    kind: str = "other",
+    json_mode: bool = False,
+) -> AsyncIterator[str]:
+    """채팅 완성을 스트리밍으로 호출하고 본문 조각(delta)을 순서대로 반환 (timeout은 조각 간 대기 한도)"""
+    _, limiter = _async_state()
+    kwargs = _call_kwargs(temperature, json_mode)
+    if STREAM_USAGE:
+        kwargs["stream_options"] = {"include_usage": True}
+    limit = timeout or REQUEST_TIMEOUT_SEC
+    async with limiter.slot():
+        with metrics.span("llm_call", kind=kind, mode="stream") as info:
+            t0 = time.perf_counter()
+            # 스트림 연결까지만 재시도하고, 받는 도중 끊기면 그대로 예외를 올린다
+            stream = await call_with_retry(
+                limiter,
+                router,
+                lambda target: asyncio.wait_for(
+                    _client(target).chat.completions.create(
+                        model=target.deployment, messages=_messages(system, user), stream=True, **kwargs
+                    ),
+                    limit,
+                ),
+                estimate_tokens(system, user),
+            )
+            chunks = stream.__aiter__()
+            first = True
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), limit)
+                except StopAsyncIteration:
+                    break
+                # include_usage면 마지막 청크에 usage만 담겨 온다
+                if getattr(chunk, "usage", None):
+                    metrics.record_usage(chunk.usage, kind=kind)
+                    info["prompt_tokens"] = chunk.usage.prompt_tokens
+                    info["cached_tokens"] = getattr(chunk.usage.prompt_tokens_details, "cached_tokens", None)
+                # Azure는 콘텐츠 필터 결과만 담긴 빈 choices 청크를 보내기도 한다
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if first:
+                        first = False
+                        info["ttft_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+                        metrics.observe("llm_time_to_first_token_seconds", time.perf_counter() - t0, kind=kind)
+                    yield chunk.choices[0].delta.content
+
+
+# -------------------------------
+# structured 모드: 항목 검증 / 조각 단위 복구
+# -------------------------------
+def _validate(section: str, raw: Any) -> Tuple[Dict[str, Any], str]:
+    """plan_models(pydantic)는 structured 모드에서만 쓰므로 처음 검증할 때 불러온다"""
+    from plan_models import validate_item
+
+    return validate_item(section, raw)
+
+
+def _raw_items(section: str, text: str) -> List[Any]:
+    """JSON 모드 응답에서 섹션 배열을 꺼낸다 (잘린 응답이면 닫힌 항목까지만 건진다)"""
     try:
-        return json.loads(cleaned)
-    except:
-        return None
+        parsed = json.loads(text)
+    except (TypeError, ValueError):
+        metrics.incr("structured_parse_total", section=section, result="salvaged")
+        return [item for _, item in IncrementalJSONParser(sections=[section]).feed(text or "")]
+    items = parsed.get(section) if isinstance(parsed, dict) else None
+    metrics.incr("structured_parse_total", section=section, result="ok" if isinstance(items, list) else "missing")
+    return items if isinstance(items, list) else []
+
+
+def _check_items(section: str, raws: List[Any]) -> Tuple[List[Optional[Dict[str, Any]]], List[Tuple[int, Any, str]]]:
+    """검증 결과를 (자리별 항목 또는 None, [(자리, 원본, 오류)])로 반환"""
+    slots: List[Optional[Dict[str, Any]]] = []
+    bad: List[Tuple[int, Any, str]] = []
+    for raw in raws:
+        item, err = _validate(section, raw)
+        if err:
+            bad.append((len(slots), raw, err))
+            slots.append(None)
+        else:
+            slots.append(item)
+    metrics.incr("structured_items_total", len(slots) - len(bad), section=section, result="ok")
+    if bad:
+        metrics.incr("structured_items_total", len(bad), section=section, result="invalid")
+    return slots, bad
+
+
+def _item_label(section: str, item: Dict[str, Any]) -> str:
+    """추가 요청 시 '이미 만든 항목'을 짧게 알려 주기 위한 표시"""
+    if section == "day_texts":
+        return f"day {item.get('day')}"
+    if section in ("ordered_videos", "videos"):
+        return f"ref {item.get('ref')}"
+    return str(item.get("question", ""))[:80]
+
+
+def _repair_prompt(section: str, user: str, bad: List[Tuple[int, Any, str]], missing: int, done: List[Dict[str, Any]]) -> str:
+    parts = [user, "", "위 요청의 이전 응답 중 일부만 다시 만들어라. 전체를 다시 만들지 마라."]
+    if bad:
+        parts.append(f"- 아래 {len(bad)}개 항목은 스키마 검증에 실패했다. 오류를 고쳐 같은 순서로 다시 써라:")
+        parts += [f"  {i}. 오류: {err} / 원본: {json.dumps(raw, ensure_ascii=False)}" for i, (_, raw, err) in enumerate(bad, 1)]
+    if missing:
+        labels = ", ".join(_item_label(section, it) for it in done)
+        parts.append(f"- 이미 완성된 항목({labels})과 겹치지 않게 항목 {missing}개를 더 만들어라.")
+    parts.append(f'출력은 {{"{section}": [고친 항목..., 추가 항목...]}} 형태의 JSON만.')
+    return "\n".join(parts)
+
+
+async def _arepair_slots(
+    section: str,
+    user: str,
+    slots: List[Optional[Dict[str, Any]]],
+    bad: List[Tuple[int, Any, str]],
+    expected: Optional[int],
+) -> List[Dict[str, Any]]:
+    """
+    검증에 실패한 항목과 모자란 항목만 다시 요청해 slots를 채운다
+    응답 배열의 앞쪽은 고친 항목(bad 순서), 나머지는 추가 항목으로 본다
+    새로 채워진 항목을 자리 순서대로 반환
+    """
+    filled: List[int] = []
+    for _ in range(REPAIR_ROUNDS):
+        missing = max(0, (expected or 0) - len(slots))
+        if not bad and not missing:
+            break
+        if bad:
+            metrics.incr("structured_repair_total", section=section, reason="invalid")
+        if missing:
+            metrics.incr("structured_repair_total", section=section, reason="missing")
+        prompt = _repair_prompt(section, user, bad, missing, [s for s in slots if s is not None])
+        text = await _achat(PROMPT_PREFIXES[section], prompt, temperature=0.3, kind=f"{section}_repair", json_mode=True)
+        raws = _raw_items(section, text)
+        fixes, extras = raws[:len(bad)], raws[len(bad):]
+
+        next_bad: List[Tuple[int, Any, str]] = []
+        for i, (pos, raw, err) in enumerate(bad):
+            if i < len(fixes):
+                raw = fixes[i]
+                item, err = _validate(section, raw)
+                if not err:
+                    slots[pos] = item
+                    filled.append(pos)
+                    continue
+            next_bad.append((pos, raw, err))
+        for raw in extras[:missing]:
+            item, err = _validate(section, raw)
+            if err:
+                next_bad.append((len(slots), raw, err))
+                slots.append(None)
+            else:
+                filled.append(len(slots))
+                slots.append(item)
+        bad = next_bad
+    return [slots[pos] for pos in sorted(filled)]
+
+
+async def _astream_structured(section: str, user: str, expected: Optional[int]) -> AsyncIterator[Dict[str, Any]]:
+    """JSON 모드 스트리밍: 검증을 통과한 항목은 바로 반환하고, 깨지거나 모자란 항목은 끝난 뒤 복구해서 반환"""
+    parser = IncrementalJSONParser(sections=[section])
+    slots: List[Optional[Dict[str, Any]]] = []
+    bad: List[Tuple[int, Any, str]] = []
+    chunks = []
+    async for delta in _achat_stream(PROMPT_PREFIXES[section], user, temperature=0.6, kind=section, json_mode=True):
+        chunks.append(delta)
+        for _, raw in parser.feed(delta):
+            item, err = _validate(section, raw)
+            metrics.incr("structured_items_total", section=section, result="invalid" if err else "ok")
+            if err:
+                bad.append((len(slots), raw, err))
+            slots.append(item if not err else None)
+            if not err:
+                yield item
+
+    # 점진 파싱이 하나도 못 건졌으면 전체 텍스트로 한 번 더 시도
+    if not slots:
+        slots, bad = _check_items(section, _raw_items(section, "".join(chunks)))
+        for item in slots:
+            if item is not None:
+                yield item
+    for item in await _arepair_slots(section, user, slots, bad, expected):
+        yield item
+
+
+def _cache_lookup(section: str, cache_key: str) -> Optional[List[Dict[str, Any]]]:
+    """캐시 조회 + 적중/미스 카운트"""
+    cached = plan_cache.get(cache_key)
+    metrics.incr("plan_cache_total", section=section, result="hit" if cached is not None else "miss")
+    return cached
+
+
+async def _asection(
+    section: str,
+    cache_key: str,
+    user: str,
+    regenerate: bool,
+    store: bool = True,
+    expected: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    섹션 단위 캐시 조회 → 없으면 생성 후 저장 (빈 결과는 저장하지 않음, store=False면 저장 안 함)
+    structured 모드에서는 expected(기대 항목 수)보다 모자라거나 깨진 항목만 다시 요청한다
+    """
+    if not regenerate:
+        cached = _cache_lookup(section, cache_key)
+        if cached is not None:
+            return cached
+    if STRUCTURED_OUTPUT:
+        text = await _achat(PROMPT_PREFIXES[section], user, temperature=0.6, kind=section, json_mode=True)
+        slots, bad = _check_items(section, _raw_items(section, text))
+        await _arepair_slots(section, user, slots, bad, expected)
+        items = [s for s in slots if s is not None]
+    else:
+        parsed = _extract_json(await _achat(PROMPT_PREFIXES[section], user, temperature=0.6, kind=section)) or {}
+        items = parsed.get(section, [])
+    if items and store:
+        plan_cache.set(cache_key, items)
+    return items
+
+
+async def _astream_section(
+    section: str,
+    cache_key: str,
+    user: str,
+    regenerate: bool,
+    store: bool = True,
+    expected: Optional[int] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """섹션 배열의 항목을 객체가 닫히는 즉시 하나씩 반환 (끝나면 캐시에 저장, store=False면 저장 안 함)"""
+    if not regenerate:
+        cached = _cache_lookup(section, cache_key)
+        if cached is not None:
+            for item in cached:
+                yield item
+            return
+
+    if STRUCTURED_OUTPUT:
+        items = []
+        async for item in _astream_structured(section, user, expected):
+            items.append(item)
+            yield item
+        if items and store:
+            plan_cache.set(cache_key, items)
+        return
+
+    parser = IncrementalJSONParser(sections=[section])
+    items, chunks = [], []
+    async for delta in _achat_stream(PROMPT_PREFIXES[section], user, temperature=0.6, kind=section):
+        chunks.append(delta)
+        for _, item in parser.feed(delta):
+            items.append(item)
+            yield item
+
+    # 점진 파싱이 하나도 못 건졌으면 전체 텍스트로 한 번 더 시도
+    if not items:
+        parsed = _extract_json("".join(chunks)) or {}
+        items = parsed.get(section, [])
+        for item in items:
+            yield item
+    if items and store:
+        plan_cache.set(cache_key, items)
+
+
+async def _amerge_streams(streams: Dict[str, AsyncIterator[Any]]) -> AsyncIterator[Tuple[str, Any]]:
+    """여러 비동기 이터레이터를 동시에 돌리며 도착 순서대로 (이름, 항목) 반환"""
+    out: "asyncio.Queue" = asyncio.Queue()
+    done = object()
+
+    async def pump(name: str, it: AsyncIterator[Any]) -> None:
+        try:
+            async for item in it:
+                await out.put((name, item))
+        finally:
+            await out.put((name, done))
+
+    tasks = [asyncio.create_task(pump(name, it)) for name, it in streams.items()]
+    try:
+        remaining = len(tasks)
+        while remaining:
+            name, item = await out.get()
+            if item is done:
+                remaining -= 1
+            else:
+                yield name, item
+        # 태스크에서 난 예외는 호출한 쪽에서 보이도록 다시 올린다
+        for task in tasks:
+            task.result()
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def _video_brief(ordered_videos: List[Dict[str, Any]]) -> str:
+    """순서 결과를 후속 프롬프트용 짧은 목록으로 변환"""
+    return "\n".join(
+        f"{v.get('index', i)}. {v.get('title_guess', '')} ({v.get('url', '')})"
+        + (f" - {v['summary']}" if v.get("summary") else "")
+        for i, v in enumerate(ordered_videos, 1)
+    )
 
 # -------------------------------
-# 학습 플랜 생성
+# 영상별 분석 (정규화된 영상 ID 단위로 캐시 → 목록이 바뀌어도 새 영상만 분석)
 # -------------------------------
-def generate_plan(video_urls: List[str], days: int = 2, num_questions: int = 4) -> Dict[str, Any]:
-    """동영상 기반 학습 플랜 + 퀴즈 생성"""
+ANALYSIS_SCHEMA = """
+{"videos": [{"ref": 1, "title": "string", "summary": "string (2문장 이내)", "difficulty": 3, "prerequisites": ["string"]}]}
+""".strip()
+
+ANALYSIS_PREFIX = _compile_prefix("videos", """
+사용자가 준 동영상 각각의 제목을 추정하고, 내용을 2문장 이내로 요약한 뒤, 난이도(1~5)와 선수 지식을 적어라.
+- ref는 동영상 목록의 번호를 그대로 써라.
+- 출력은 오직 JSON만.
+""", ANALYSIS_SCHEMA)
+
+# 분석 호출 1번에 넣을 영상 수 (넘으면 나눠서 동시에 요청)
+ANALYSIS_BATCH_SIZE = int(os.getenv("VIDEO_ANALYSIS_BATCH", "8"))
+
+
+def _analysis_key(vid: str) -> str:
+    return make_key("video_analysis", vid, DEPLOYMENT, PROMPT_VERSION)
+
+
+def _analysis_prompt(urls: List[str]) -> str:
+    listing = "\n".join(f"{i}. {u}" for i, u in enumerate(urls, 1))
+    return f"동영상:\n{listing}"
+
+
+def _first_urls(video_urls: List[str]) -> Dict[str, str]:
+    """영상 ID → 처음 나온 URL (추적 파라미터 등만 다른 같은 영상은 하나로 합친다)"""
+    first_url: Dict[str, str] = {}
+    for u in video_urls:
+        first_url.setdefault(video_id(u), u)
+    return first_url
+
+
+async def aanalyze_videos(video_urls: List[str]) -> List[Dict[str, Any]]:
+    """
+    URL 목록을 영상 ID로 정규화/중복 제거하고 영상별 분석(title/summary/difficulty/prerequisites)을 반환
+    캐시에 없는 영상만 모아서 분석하며, 결과는 영상 ID 순으로 정렬 (입력 순서와 무관하게 같은 결과)
+    """
     assert DEPLOYMENT, "환경변수 AZURE_OPENAI_DEPLOYMENT가 설정되지 않았습니다."
+    first_url = _first_urls(video_urls)
 
-    system = (
-        "너는 한국어로 답하는 교육 설계 도우미다. "
-        "반드시 JSON만 출력하고, 마크다운/설명/코드펜스를 절대 포함하지 마."
+    analyses: Dict[str, Dict[str, Any]] = {}
+    todo = []
+    for vid in first_url:
+        cached = _cache_lookup("video_analysis", _analysis_key(vid))
+        if cached is not None:
+            analyses[vid] = cached
+        else:
+            todo.append(vid)
+
+    batches = [todo[i:i + ANALYSIS_BATCH_SIZE] for i in range(0, len(todo), ANALYSIS_BATCH_SIZE)]
+    results = await asyncio.gather(
+        *(_asection("videos", "", _analysis_prompt([canonical_url(first_url[v]) for v in batch]), True, store=False,
+                    expected=len(batch))
+          for batch in batches),
+        return_exceptions=True,
     )
+    for batch, result in zip(batches, results):
+        if isinstance(result, BaseException):
+            metrics.log_event("video_analysis_failed", error=type(result).__name__)
+            continue
+        for item in result:
+            try:
+                vid = batch[int(item["ref"]) - 1]
+            except (KeyError, TypeError, ValueError, IndexError):
+                continue
+            analysis = {
+                "title": item.get("title", ""),
+                "summary": item.get("summary", ""),
+                "difficulty": item.get("difficulty"),
+                "prerequisites": item.get("prerequisites", []),
+            }
+            analyses[vid] = analysis
+            plan_cache.set(_analysis_key(vid), analysis)
+
+    # 분석에 실패한 영상도 URL만으로 순서를 정할 수 있도록 남겨 둔다 (캐시하지 않음)
+    empty = {"title": "", "summary": "", "difficulty": None, "prerequisites": []}
+    return [{"video_id": vid, "url": first_url[vid], **analyses.get(vid, empty)} for vid in sorted(first_url)]
 
-    schema = """
-{
-  "ordered_videos": [
-    {
-      "index": 1,
-      "url": "string",
-      "title_guess": "string",
-      "thumbnail_url": "string (없으면 https://placehold.co/300x200?text=No+Thumbnail)",
-      "reason": "string (논리적으로 최소 4문장)"
-    }
-  ],
-  "study_plan": [
-    {
-      "day": 1,
-      "goals": ["string"],
-      "sessions": [
-        {
-          "time_of_day": "morning",
-          "focus": "string",
-          "tasks": ["string"],
-          "est_time_min": 90
-        },
-        {
-          "time_of_day": "afternoon",
-          "focus": "string",
-          "tasks": ["string"],
-          "est_time_min": 90
-        },
-        {
-          "time_of_day": "evening",
-          "focus": "string",
-          "tasks": ["string"],
-          "est_time_min": 60
+# -------------------------------
+# 학습 순서 추천
+# -------------------------------
+ORDER_SCHEMA = """
+{"ordered_videos": [{"ref": 1, "reason": "string (2문장 이내)"}]}
+""".strip()
+
+ORDER_PREFIX = _compile_prefix("ordered_videos", """
+사용자가 준 동영상들을 학습에 적합한 순서로 정렬하고, 순서의 근거를 2문장 이내로 적어라.
+- 난이도와 선수 지식을 고려하라.
+- ref는 동영상 목록의 번호를 그대로 쓰고, 모든 영상을 한 번씩 포함하라.
+- 출력은 오직 JSON만.
+""", ORDER_SCHEMA)
+
+
+def _order_request(videos: List[Dict[str, Any]]) -> Tuple[str, str]:
+    """(캐시 키, 사용자 프롬프트) - 영상 분석 결과로 순서를 정한다"""
+    assert DEPLOYMENT, "환경변수 AZURE_OPENAI_DEPLOYMENT가 설정되지 않았습니다."
+    listing = "\n".join(
+        f"{i}. {v['title'] or v['url']} | 난이도 {v['difficulty'] or '?'} | "
+        f"선수 지식: {', '.join(v['prerequisites']) or '없음'} | {v['summary']}"
+        for i, v in enumerate(videos, 1)
+    )
+    user = f"동영상 (ref. 제목 | 난이도 | 선수 지식 | 요약):\n{listing}"
+    return make_key("order", [(v["video_id"], v["title"], v["summary"]) for v in videos], DEPLOYMENT, PROMPT_VERSION), user
+
+
+class _OrderBuilder:
+    """ref만 담긴 순서 항목에 URL/제목/요약을 채우고, 빠진 영상은 마지막에 덧붙인다"""
+
+    def __init__(self, videos: List[Dict[str, Any]]):
+        self.videos = videos
+        self.used: set = set()
+
+    def add(self, item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        try:
+            ref = int(item["ref"])
+        except (KeyError, TypeError, ValueError):
+            return None
+        if not 1 <= ref <= len(self.videos) or ref in self.used:
+            return None
+        self.used.add(ref)
+        return self._entry(self.videos[ref - 1], item.get("reason", ""))
+
+    def rest(self) -> List[Dict[str, Any]]:
+        out = []
+        for ref, v in enumerate(self.videos, 1):
+            if ref not in self.used:
+                self.used.add(ref)
+                out.append(self._entry(v, ""))
+        return out
+
+    def _entry(self, v: Dict[str, Any], reason: str) -> Dict[str, Any]:
+        return {
+            "index": len(self.used),
+            "url": v["url"],
+            "title_guess": v["title"] or v["url"],
+            "reason": reason,
+            "video_id": v["video_id"],
+            "summary": v["summary"],
+            "difficulty": v["difficulty"],
+            "prerequisites": v["prerequisites"],
         }
-      ],
-      "review": ["string"]
-    }
-  ],
-  "quiz": [
-    {
-      "type": "mc",
-      "question": "string",
-      "choices": ["A","B","C","D"],
-      "answer": "A",
-      "explanation": "string"
-    }
-  ]
-}
+
+
+async def agenerate_order(video_urls: List[str], regenerate: bool = False) -> List[Dict[str, Any]]:
+    """동영상 목록의 학습 순서 + 간단한 근거 생성 (새로 추가된 영상만 분석)"""
+    videos = await aanalyze_videos(video_urls)
+    key, user = _order_request(videos)
+    builder = _OrderBuilder(videos)
+    items = await _asection("ordered_videos", key, user, regenerate, expected=len(videos))
+    ordered = [entry for entry in map(builder.add, items) if entry]
+    return ordered + builder.rest()
+
+
+async def astream_order(video_urls: List[str], regenerate: bool = False) -> AsyncIterator[Dict[str, Any]]:
+    """학습 순서 항목을 완성되는 대로 반환"""
+    videos = await aanalyze_videos(video_urls)
+    key, user = _order_request(videos)
+    builder = _OrderBuilder(videos)
+    async for item in _astream_section("ordered_videos", key, user, regenerate, expected=len(videos)):
+        entry = builder.add(item)
+        if entry:
+            yield entry
+    for entry in builder.rest():
+        yield entry
+
+# -------------------------------
+# 학습 플랜 생성
+# -------------------------------
+# 일정(날짜/세션/시간)은 study_scheduler가 영상 길이로 정하고, LLM은 문구만 채운다
+PLAN_SCHEMA = """
+{"day_texts": [{"day": 1, "goals": ["string"], "sessions": [{"focus": "string", "tasks": ["string"]}], "review": ["string"]}]}
 """.strip()
 
-    user = f"""
-다음 동영상 목록을 바탕으로:
-1) 학습에 적합한 순서(근거 포함, 최소 4문장 이상)
-2) {days}일 학습 플랜
-3) 객관식 퀴즈 {num_questions}문항
+PLAN_PREFIX = _compile_prefix("day_texts", """
+사용자가 주는 일정은 영상 길이에 맞춰 미리 짜 둔 학습 일정이다. 일정과 시간은 바꾸지 말고 문구만 채워라.
 
-학습 플랜 작성 규칙:
-- 각 day는 morning / afternoon / evening 3개의 세션으로 나눠라.
-- 각 세션에는 time_of_day, focus, tasks, est_time_min을 반드시 포함해야 한다.
+작성 규칙:
+- day마다 goals와 review를, 세션마다 focus와 tasks를 작성하라.
+- sessions는 일정에 적힌 세션 순서와 개수 그대로 작성하라.
 - tasks는 단순히 '영상 보기'가 아니라 '영상 보며 키워드 메모', '핵심 개념 요약', '관련 예제 풀기', '퀴즈 풀기'처럼 구체적이어야 한다.
+- 배정된 영상이 없는 세션은 앞에서 배운 내용을 복습하는 활동으로 채워라.
 - review에는 하루가 끝난 후 수행할 복습 활동(요약, 퀴즈 풀기, 토론, 개념 맵 작성 등)을 반드시 넣어라.
 - 출력은 오직 JSON만.
+""", PLAN_SCHEMA)
+
+# 호출 1번에 문구를 채울 날 수 (넘으면 여러 호출로 나눠 동시에 요청)
+PLAN_DAYS_PER_CALL = int(os.getenv("PLAN_DAYS_PER_CALL", "7"))
+
+
+async def _aschedule(
+    ordered_videos: List[Dict[str, Any]],
+    days: int,
+    durations: Optional[Dict[str, float]],
+) -> List[Dict[str, Any]]:
+    """영상 길이(사용자 입력 우선, 없으면 페이지에서 조회)로 로컬 일정 생성"""
+    urls = [v.get("url", "") for v in ordered_videos]
+    known = await asyncio.to_thread(resolve_durations, urls, durations, plan_cache)
+    return build_schedule(ordered_videos, days, known)
+
+
+def _plan_requests(schedule: List[Dict[str, Any]]) -> List[Tuple[List[Dict[str, Any]], str, str]]:
+    """일정을 PLAN_DAYS_PER_CALL일씩 나눠 [(해당 일정, 캐시 키, 사용자 프롬프트)] 반환"""
+    assert DEPLOYMENT, "환경변수 AZURE_OPENAI_DEPLOYMENT가 설정되지 않았습니다."
+    calls = []
+    for start in range(0, len(schedule), PLAN_DAYS_PER_CALL):
+        chunk = schedule[start:start + PLAN_DAYS_PER_CALL]
+        outline = describe_schedule(chunk)
+        user = f"일정:\n{outline}"
+        calls.append((chunk, make_key("day_texts", outline, DEPLOYMENT, PROMPT_VERSION), user))
+    return calls
+
+
+def _day_number(item: Any) -> Optional[int]:
+    try:
+        return int(item.get("day"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+async def agenerate_study_plan(
+    ordered_videos: List[Dict[str, Any]],
+    days: int = 2,
+    regenerate: bool = False,
+    durations: Optional[Dict[str, float]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    정렬된 영상 목록을 바탕으로 days일 학습 플랜 생성
+    durations: URL별 영상 길이(분), 없는 영상은 페이지에서 조회
+    """
+    schedule = await _aschedule(ordered_videos, days, durations)
+    calls = _plan_requests(schedule)
+    results = await asyncio.gather(
+        *(_asection("day_texts", key, user, regenerate, expected=len(chunk)) for chunk, key, user in calls),
+        return_exceptions=True,
+    )
+    texts: Dict[int, Dict[str, Any]] = {}
+    for r in results:
+        if isinstance(r, BaseException):
+            # 문구를 못 받은 날은 영상 제목으로 만든 기본 문구로 채운다
+            metrics.log_event("plan_text_failed", error=type(r).__name__)
+            continue
+        texts.update({_day_number(t): t for t in r if _day_number(t) is not None})
+    return [merge_day_text(day, texts.get(day["day"])) for day in schedule]
+
+
+async def astream_study_plan(
+    ordered_videos: List[Dict[str, Any]],
+    days: int = 2,
+    regenerate: bool = False,
+    durations: Optional[Dict[str, float]] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """학습 플랜을 day 순서대로, 문구가 도착하는 대로 반환"""
+    schedule = await _aschedule(ordered_videos, days, durations)
+    calls = _plan_requests(schedule)
+    chunk_of = {day["day"]: i for i, (chunk, _, _) in enumerate(calls) for day in chunk}
+    end = object()
 
-동영상 URL 목록: {video_urls}
+    async def texts_of(key: str, user: str, n_days: int) -> AsyncIterator[Any]:
+        # 호출이 끝나면 end를 보내 그 묶음의 빠진 날을 기본 문구로 내보낼 수 있게 한다
+        try:
+            async for item in _astream_section("day_texts", key, user, regenerate, expected=n_days):
+                yield item
+        except Exception as e:
+            metrics.log_event("plan_text_failed", error=type(e).__name__)
+        yield end
+
+    texts: Dict[int, Dict[str, Any]] = {}
+    finished = set()
+    next_i = 0
+    async for name, item in _amerge_streams({
+        str(i): texts_of(key, user, len(chunk)) for i, (chunk, key, user) in enumerate(calls)
+    }):
+        if item is end:
+            finished.add(int(name))
+        elif _day_number(item) is not None:
+            texts[_day_number(item)] = item
+        while next_i < len(schedule) and (
+            schedule[next_i]["day"] in texts or chunk_of[schedule[next_i]["day"]] in finished
+        ):
+            yield merge_day_text(schedule[next_i], texts.get(schedule[next_i]["day"]))
+            next_i += 1
 
-JSON 스키마(참고):
-{schema}
+# -------------------------------
+# 학습 퀴즈 생성
+# -------------------------------
+QUIZ_SCHEMA = """
+{"quiz": [{"ref": 1, "type": "mc", "question": "string", "choices": ["A","B","C","D"], "answer": "A", "explanation": "string"}]}
 """.strip()
 
-    resp = client.chat.completions.create(
-        model=DEPLOYMENT,
-        temperature=0.6,
-        messages=[
-            {"role": "system", "content": system},
-            {"role": "user", "content": user},
-        ],
+
+QUIZ_PREFIX = _compile_prefix("quiz", """
+사용자가 준 동영상 내용을 바탕으로 요청한 수만큼 객관식 퀴즈 문항을 만들어라.
+- choices는 4개, answer는 choices 중 하나와 정확히 같은 문자열이어야 한다.
+- explanation은 1~2문장으로 짧게.
+- ref는 문항이 다루는 동영상의 번호 (목록 앞의 숫자).
+- 출력은 오직 JSON만.
+""", QUIZ_SCHEMA)
+
+# 한 번에 만들 문항 수 (이보다 많으면 여러 호출로 나눠 동시에 생성)
+QUIZ_SHARD_SIZE = int(os.getenv("QUIZ_SHARD_SIZE", "5"))
+# 추정 유사도가 이 값 이상이면 중복 문항으로 보고 제거 / 빈 자리 보충 요청 최대 횟수
+QUIZ_DEDUP_THRESHOLD = float(os.getenv("QUIZ_DEDUP_THRESHOLD", "0.6"))
+QUIZ_TOPUP_ROUNDS = int(os.getenv("QUIZ_TOPUP_ROUNDS", "2"))
+
+# 같은 영상을 맡은 샤드끼리 문항이 겹치지 않도록 샤드마다 출제 관점을 다르게 준다
+QUIZ_ANGLES = ["핵심 개념 이해", "실전 응용/예제", "용어와 정의", "개념 간 비교/차이", "흔한 실수와 오해", "절차와 순서"]
+
+
+def _quiz_prompt(
+    ordered_videos: List[Dict[str, Any]],
+    num_questions: int,
+    angle: Optional[str] = None,
+    avoid: Optional[List[str]] = None,
+) -> str:
+    """
+    퀴즈 프롬프트 (angle: 출제 관점, avoid: 피해야 할 기존 문항)
+    같은 영상 목록을 쓰는 호출끼리 앞부분이 같도록 영상 목록을 먼저, 문항 수/관점은 뒤에 둔다
+    """
+    parts = [f"동영상 (학습 순서):\n{_video_brief(ordered_videos)}", "", f"퀴즈 {num_questions}문항을 만들어라."]
+    if angle:
+        parts.append(f"- 이번 문항은 '{angle}' 관점 위주로 출제하라.")
+    if avoid:
+        parts.append("- 아래 문항과 같거나 비슷한 문항은 만들지 마라:")
+        parts += [f"  * {q}" for q in avoid]
+    return "\n".join(parts)
+
+
+def _quiz_request(ordered_videos: List[Dict[str, Any]], num_questions: int) -> Tuple[str, str]:
+    """(캐시 키, 사용자 프롬프트)"""
+    assert DEPLOYMENT, "환경변수 AZURE_OPENAI_DEPLOYMENT가 설정되지 않았습니다."
+    user = _quiz_prompt(ordered_videos, num_questions)
+    return make_key("quiz", _video_brief(ordered_videos), num_questions, DEPLOYMENT, PROMPT_VERSION), user
+
+
+def _quiz_shard_prompts(
+    ordered_videos: List[Dict[str, Any]],
+    num_questions: int,
+) -> List[Tuple[int, List[Dict[str, Any]], str]]:
+    """
+    문항 수를 QUIZ_SHARD_SIZE 이하 샤드로 고르게 나누고,
+    영상은 샤드마다 번갈아 배정 (영상이 샤드보다 적으면 관점으로 구분)
+    [(샤드 문항 수, 샤드가 맡은 영상, 프롬프트)] 반환
+    """
+    n_shards = -(-num_questions // QUIZ_SHARD_SIZE)
+    base, rest = divmod(num_questions, n_shards)
+    prompts = []
+    for i in range(n_shards):
+        videos = ordered_videos[i::n_shards]
+        if not videos and ordered_videos:
+            videos = [ordered_videos[i % len(ordered_videos)]]
+        count = base + (i < rest)
+        prompts.append((count, videos, _quiz_prompt(videos, count, angle=QUIZ_ANGLES[i % len(QUIZ_ANGLES)])))
+    return prompts
+
+
+def _tag_quiz(quiz: List[Dict[str, Any]], videos: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    문항에 video_id를 붙인다 (오답 영상 분석용, 이미 있으면 그대로)
+    ref(프롬프트의 영상 번호)로 찾고, ref가 없거나 틀리면 videos가 하나일 때만 그 영상으로 본다
+    끝내 모르는 문항은 그대로 두고, 피드백은 점수 구간 기준 복습 위치로 물러선다
+    """
+    refs = {v.get("index", i): v.get("video_id") for i, v in enumerate(videos, 1) if v.get("video_id")}
+    only = next(iter(refs.values())) if len(refs) == 1 else None
+    tagged = []
+    for q in quiz:
+        vid = q.get("video_id") or refs.get(q.get("ref")) or only
+        tagged.append({**q, "video_id": vid} if vid and not q.get("video_id") else q)
+    return tagged
+
+
+def _keep_question(flt: NearDuplicateFilter, q: Any) -> bool:
+    return isinstance(q, dict) and bool(q.get("question")) and flt.add(str(q["question"]))
+
+
+async def _atopup_quiz(
+    ordered_videos: List[Dict[str, Any]],
+    num_questions: int,
+    quiz: List[Dict[str, Any]],
+    flt: NearDuplicateFilter,
+) -> List[Dict[str, Any]]:
+    """중복 제거/실패로 빈 자리만큼 추가 요청 (이미 뽑힌 문항은 피하도록 프롬프트에 넣는다)"""
+    added: List[Dict[str, Any]] = []
+    for _ in range(QUIZ_TOPUP_ROUNDS):
+        missing = num_questions - len(quiz) - len(added)
+        if missing <= 0:
+            break
+        metrics.incr("quiz_topup_total")
+        avoid = [q["question"] for q in quiz + added]
+        extra = await _asection(
+            "quiz", "", _quiz_prompt(ordered_videos, missing, avoid=avoid), True, store=False, expected=missing,
+        )
+        added += [q for q in extra if _keep_question(flt, q)][:missing]
+    return added
+
+
+async def _asharded_quiz(ordered_videos: List[Dict[str, Any]], num_questions: int) -> List[Dict[str, Any]]:
+    """샤드를 동시에 생성 → 유사 문항 제거 → 빈 자리 보충"""
+    prompts = _quiz_shard_prompts(ordered_videos, num_questions)
+    results = await asyncio.gather(
+        *(_asection("quiz", "", p, True, store=False, expected=n) for n, _, p in prompts),
+        return_exceptions=True,
     )
-    content = resp.choices[0].message.content
-    parsed = _extract_json(content)
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if len(errors) == len(results):
+        raise errors[0]
+    for e in errors:
+        metrics.log_event("quiz_shard_failed", error=type(e).__name__)
+
+    flt = NearDuplicateFilter(QUIZ_DEDUP_THRESHOLD)
+    quiz = [
+        q for r, (_, videos, _) in zip(results, prompts) if not isinstance(r, BaseException)
+        for q in _tag_quiz(r, videos) if _keep_question(flt, q)
+    ]
+    quiz = quiz[:num_questions]
+    quiz += _tag_quiz(await _atopup_quiz(ordered_videos, num_questions, quiz, flt), ordered_videos)
+    metrics.incr("quiz_dedup_removed_total", flt.removed)
+    return quiz
+
+
+async def _astream_sharded_quiz(ordered_videos: List[Dict[str, Any]], num_questions: int) -> AsyncIterator[Dict[str, Any]]:
+    """샤드 스트림을 합쳐 중복이 아닌 문항만 도착 순서대로 반환하고, 끝나면 빈 자리를 보충"""
+    errors: List[BaseException] = []
+
+    async def guarded(it: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+        # 샤드 하나가 실패해도 나머지는 계속 받고, 빈 자리는 보충 요청으로 채운다
+        try:
+            async for item in it:
+                yield item
+        except Exception as e:
+            errors.append(e)
+            metrics.log_event("quiz_shard_failed", error=type(e).__name__)
+
+    prompts = _quiz_shard_prompts(ordered_videos, num_questions)
+    flt = NearDuplicateFilter(QUIZ_DEDUP_THRESHOLD)
+    quiz: List[Dict[str, Any]] = []
+    async for name, q in _amerge_streams({
+        f"shard{i}": guarded(_astream_section("quiz", "", p, True, store=False, expected=n))
+        for i, (n, _, p) in enumerate(prompts)
+    }):
+        q = _tag_quiz([q], prompts[int(name[len("shard"):])][1])[0]
+        if len(quiz) < num_questions and _keep_question(flt, q):
+            quiz.append(q)
+            yield q
+    if len(errors) == len(prompts):
+        raise errors[0]
+
+    for q in _tag_quiz(await _atopup_quiz(ordered_videos, num_questions, quiz, flt), ordered_videos):
+        quiz.append(q)
+        yield q
+    metrics.incr("quiz_dedup_removed_total", flt.removed)
+
+
+async def agenerate_quiz(
+    ordered_videos: List[Dict[str, Any]],
+    num_questions: int = 4,
+    regenerate: bool = False,
+) -> List[Dict[str, Any]]:
+    """정렬된 영상 목록을 바탕으로 객관식 퀴즈 생성 (QUIZ_SHARD_SIZE보다 많으면 샤드로 나눠 동시 생성)"""
+    key, user = _quiz_request(ordered_videos, num_questions)
+    if num_questions <= QUIZ_SHARD_SIZE:
+        return _tag_quiz(await _asection("quiz", key, user, regenerate, expected=num_questions), ordered_videos)
+    if not regenerate:
+        cached = _cache_lookup("quiz", key)
+        if cached is not None:
+            return cached
+    quiz = await _asharded_quiz(ordered_videos, num_questions)
+    if quiz:
+        plan_cache.set(key, quiz)
+    return quiz
+
 
-    return parsed if parsed else {}
+async def astream_quiz(
+    ordered_videos: List[Dict[str, Any]],
+    num_questions: int = 4,
+    regenerate: bool = False,
+) -> AsyncIterator[Dict[str, Any]]:
+    """퀴즈를 문항이 완성되는 대로 반환"""
+    key, user = _quiz_request(ordered_videos, num_questions)
+    if num_questions <= QUIZ_SHARD_SIZE:
+        async for q in _astream_section("quiz", key, user, regenerate, expected=num_questions):
+            yield _tag_quiz([q], ordered_videos)[0]
+        return
+    if not regenerate:
+        cached = _cache_lookup("quiz", key)
+        if cached is not None:
+            for q in cached:
+                yield q
+            return
+    quiz = []
+    async for q in _astream_sharded_quiz(ordered_videos, num_questions):
+        quiz.append(q)
+        yield q
+    if quiz:
+        plan_cache.set(key, quiz)
+
+# -------------------------------
+# 영상별 문제 은행 (한 번 만들어 두고 퀴즈는 로컬에서 뽑는다)
+# -------------------------------
+# 영상 하나에 쌓을 문항 수 (QUIZ_ANGLES 관점별로 나눠 동시에 생성) / 이보다 적으면 모자란 만큼 다시 채운다
+QUESTION_BANK_SIZE = int(os.getenv("QUESTION_BANK_SIZE", "24"))
+QUESTION_BANK_MIN = int(os.getenv("QUESTION_BANK_MIN", str(QUESTION_BANK_SIZE // 2)))
+
+# 영상 ID → 채우는 중인 작업 (백그라운드 루프 하나에서만 접근, 여러 세션이 같은 영상을 요청해도 한 번만 생성)
+_bank_inflight: Dict[str, "asyncio.Task"] = {}
+
+
+async def _abuild_bank(video: Dict[str, Any], missing: int) -> int:
+    """영상 하나의 문항을 관점별로 동시에 생성 → 검증/유사 문항 제거 → 은행에 저장"""
+    angles = QUIZ_ANGLES[:max(1, min(len(QUIZ_ANGLES), missing))]
+    per_angle = -(-missing // len(angles))
+    with metrics.span("question_bank_build", video=video["video_id"]) as info:
+        results = await asyncio.gather(
+            *(_asection("quiz", "", _quiz_prompt([video], per_angle, angle=a), True, store=False, expected=per_angle)
+              for a in angles),
+            return_exceptions=True,
+        )
+        # 이미 은행에 있는 문항과 비슷한 문항도 거른다
+        flt = NearDuplicateFilter(QUIZ_DEDUP_THRESHOLD, known=question_bank.signatures(video["video_id"]))
+        added = 0
+        for angle, result in zip(angles, results):
+            if isinstance(result, BaseException):
+                metrics.log_event("question_bank_failed", video=video["video_id"], error=type(result).__name__)
+                continue
+            # 스트리밍/structured 여부와 관계없이 은행에는 스키마를 통과한 문항만 넣는다
+            items = [item for item, err in (_validate("quiz", q) for q in result) if not err]
+            items = [q for q in items if _keep_question(flt, q)]
+            added += question_bank.add(video["video_id"], angle, video.get("difficulty"), items)
+        info["added"] = added
+    return added
+
+
+async def _abank_video(video: Dict[str, Any]) -> int:
+    vid = video["video_id"]
+    task = _bank_inflight.get(vid)
+    if task is None:
+        have = question_bank.counts([vid])[vid]
+        if have >= QUESTION_BANK_MIN:
+            return 0
+        task = asyncio.ensure_future(_abuild_bank(video, QUESTION_BANK_SIZE - have))
+        _bank_inflight[vid] = task
+        task.add_done_callback(lambda _: _bank_inflight.pop(vid, None))
+    return await asyncio.shield(task)
+
+
+async def afill_question_bank(ordered_videos: List[Dict[str, Any]]) -> int:
+    """문항이 QUESTION_BANK_MIN보다 적은 영상만 은행을 채우고 새로 저장한 문항 수 반환"""
+    results = await asyncio.gather(*(_abank_video(v) for v in ordered_videos if v.get("video_id")),
+                                   return_exceptions=True)
+    return sum(r for r in results if isinstance(r, int))
+
+
+def cached_order(video_urls: List[str]) -> Optional[List[Dict[str, Any]]]:
+    """영상 분석과 학습 순서가 모두 캐시에 있으면 API 호출 없이 순서 결과 반환 (하나라도 없으면 None)"""
+    first_url = _first_urls(video_urls)
+    videos = []
+    for vid in sorted(first_url):
+        analysis = plan_cache.get(_analysis_key(vid))
+        if analysis is None:
+            return None
+        videos.append({"video_id": vid, "url": first_url[vid], **analysis})
+    key, _ = _order_request(videos)
+    items = plan_cache.get(key)
+    if items is None:
+        return None
+    builder = _OrderBuilder(videos)
+    return [entry for entry in map(builder.add, items) if entry] + builder.rest()
+
+# -------------------------------
+# 전체 생성 (순서 → 플랜/퀴즈 동시 생성)
+# -------------------------------
+async def agenerate_plan(
+    video_urls: List[str],
+    days: int = 2,
+    num_questions: int = 4,
+    regenerate: bool = False,
+    durations: Optional[Dict[str, float]] = None,
+) -> Dict[str, Any]:
+    """동영상 기반 학습 순서 + 플랜 + 퀴즈 생성 (regenerate=True면 캐시를 무시하고 새로 생성)"""
+    ordered = await agenerate_order(video_urls, regenerate=regenerate)
+    if not ordered:
+        return {}
+
+    # 플랜과 퀴즈는 순서 결과만 공유하므로 동시에 호출
+    study_plan, quiz = await asyncio.gather(
+        agenerate_study_plan(ordered, days, regenerate, durations),
+        agenerate_quiz(ordered, num_questions, regenerate),
+    )
+    return {"ordered_videos": ordered, "study_plan": study_plan, "quiz": quiz}
+
+
+async def astream_plan(
+    video_urls: List[str],
+    days: int = 2,
+    num_questions: int = 4,
+    regenerate: bool = False,
+    durations: Optional[Dict[str, float]] = None,
+) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """순서 항목을 먼저 흘려보낸 뒤 플랜/퀴즈 항목을 도착 순서대로 (섹션 이름, 항목)으로 반환"""
+    ordered = []
+    async for item in astream_order(video_urls, regenerate=regenerate):
+        ordered.append(item)
+        yield "ordered_videos", item
+    if not ordered:
+        return
+    async for pair in _amerge_streams({
+        "study_plan": astream_study_plan(ordered, days, regenerate, durations),
+        "quiz": astream_quiz(ordered, num_questions, regenerate),
+    }):
+        yield pair
+
+# -------------------------------
+# 동기 API (백그라운드 루프 위의 얇은 래퍼)
+# -------------------------------
+def generate_order(
+    video_urls: List[str],
+    regenerate: bool = False,
+    stream: bool = False,
+) -> Union[List[Dict[str, Any]], Iterator[Dict[str, Any]]]:
+    """동영상 목록의 학습 순서 + 간단한 근거 생성 (stream=True면 항목별 이터레이터)"""
+    if stream:
+        return _iter_sync(astream_order(video_urls, regenerate))
+    return _run(agenerate_order(video_urls, regenerate))
+
+
+def generate_study_plan(
+    ordered_videos: List[Dict[str, Any]],
+    days: int = 2,
+    regenerate: bool = False,
+    stream: bool = False,
+    durations: Optional[Dict[str, float]] = None,
+) -> Union[List[Dict[str, Any]], Iterator[Dict[str, Any]]]:
+    """
+    정렬된 영상 목록을 바탕으로 days일 학습 플랜 생성 (stream=True면 day별 이터레이터)
+    durations: URL별 영상 길이(분), 없는 영상은 페이지에서 조회
+    """
+    if stream:
+        return _iter_sync(astream_study_plan(ordered_videos, days, regenerate, durations))
+    return _run(agenerate_study_plan(ordered_videos, days, regenerate, durations))
+
+
+def generate_quiz(
+    ordered_videos: List[Dict[str, Any]],
+    num_questions: int = 4,
+    regenerate: bool = False,
+    stream: bool = False,
+) -> Union[List[Dict[str, Any]], Iterator[Dict[str, Any]]]:
+    """정렬된 영상 목록을 바탕으로 객관식 퀴즈 생성 (stream=True면 문항별 이터레이터)"""
+    if stream:
+        return _iter_sync(astream_quiz(ordered_videos, num_questions, regenerate))
+    return _run(agenerate_quiz(ordered_videos, num_questions, regenerate))
+
+
+def generate_plan(
+    video_urls: List[str],
+    days: int = 2,
+    num_questions: int = 4,
+    regenerate: bool = False,
+    stream: bool = False,
+    durations: Optional[Dict[str, float]] = None,
+) -> Union[Dict[str, Any], Iterator[Tuple[str, Dict[str, Any]]]]:
+    """
+    동영상 기반 학습 순서 + 플랜 + 퀴즈 생성 (regenerate=True면 캐시를 무시하고 새로 생성)
+    stream=True면 (섹션 이름, 항목) 튜플을 완성되는 대로 반환하는 이터레이터
+    """
+    if stream:
+        return _iter_sync(astream_plan(video_urls, days, num_questions, regenerate, durations))
+    return _run(agenerate_plan(video_urls, days, num_questions, regenerate, durations))
+
+
+def fill_question_bank(ordered_videos: List[Dict[str, Any]]) -> int:
+    """문제 은행이 모자란 영상만 채우고 새로 저장한 문항 수 반환"""
+    return _run(afill_question_bank(ordered_videos))
 
 # -------------------------------
 # 점수 기반 피드백 생성
 # -------------------------------
-def get_feedback(score: int, total: int, ordered_videos: list) -> dict:
-    """점수 기반 학습 피드백 + GPT 추천 영상"""
+def _tier(score: int, total: int, cutoffs: Tuple[float, float] = DEFAULT_CUTOFFS) -> int:
+    """점수 비율 구간 (0: 낮음, 1: 보통, 2: 높음), cutoffs는 같은 영상 묶음 응시자들의 점수 분포로 정한다"""
     ratio = score / total if total > 0 else 0
-    feedback = {}
-
-    if ratio < 0.5:
-        feedback["message"] = f"점수가 낮습니다. 👉 {ordered_videos[0]['title_guess']} 부터 다시 복습하세요."
-        restart_index = 0
-    elif ratio < 0.8:
-        feedback["message"] = f"절반 이상은 이해했지만 부족합니다. 👉 {ordered_videos[1]['title_guess']} 부터 다시 보시는 게 좋아요."
-        restart_index = min(1, len(ordered_videos) - 1)
+    if ratio < cutoffs[0]:
+        return 0
+    if ratio < cutoffs[1]:
+        return 1
+    return 2
+
+
+def _restart_index(score: int, total: int, n_videos: int, cutoffs: Tuple[float, float] = DEFAULT_CUTOFFS) -> int:
+    """점수 구간으로 다시 볼 영상 위치 결정 (처음 / 두 번째 / 마지막 중 하나, 문항에 영상 정보가 없을 때)"""
+    tier = _tier(score, total, cutoffs)
+    if tier == 0:
+        return 0
+    if tier == 1:
+        return min(1, n_videos - 1)
+    return n_videos - 1
+
+
+def _feedback_message(tier: int, ordered_videos: list, restart_index: int, missed: int = 0) -> str:
+    title = ordered_videos[restart_index]['title_guess']
+    detail = f" (이 영상에서 {missed}문항을 틀렸어요)" if missed else ""
+    if tier == 0:
+        return f"점수가 낮습니다. 👉 {title} 부터 다시 복습하세요.{detail}"
+    if tier == 1:
+        return f"어느 정도 이해했지만 부족합니다. 👉 {title} 부터 다시 보시는 게 좋아요.{detail}"
+    if restart_index == len(ordered_videos) - 1:
+        return f"잘하고 있습니다! 👉 마지막 영상만 복습해도 충분합니다.{detail}"
+    return f"잘하고 있습니다! 👉 {title} 만 다시 확인해 보세요.{detail}"
+
+
+RECS_PREFIX = _compile_prefix("feedback", """
+사용자가 준 학습 주제와 관련된 온라인 학습 영상 4개를 추천하라.
+반드시 JSON 배열 형식으로만 출력하고, 각 항목은 title과 url을 포함해야 한다.
+""")
+
+
+def _recs_key(topic: str) -> str:
+    return make_key("recommendations", topic, DEPLOYMENT, PROMPT_VERSION)
+
+
+# 진행 중인 추천 생성 (prefetch와 실제 요청이 같은 호출을 공유하도록)
+_recs_inflight: Dict[str, "concurrent.futures.Future"] = {}
+_recs_lock = threading.Lock()
+
+
+async def _arecommend(topic: str) -> List[Dict[str, Any]]:
+    """학습 주제에 대한 추천 영상 목록 (주제+배포별로 캐시)"""
+    key = _recs_key(topic)
+    cached = plan_cache.get(key)
+    metrics.incr("plan_cache_total", section="recommendations", result="hit" if cached is not None else "miss")
+    if cached is not None:
+        return cached
+
+    recs: Any = []
+    # 응답이 깨져 하나도 못 건지면 REPAIR_ROUNDS번까지 다시 요청한다 (빈 결과는 캐시하지 않으므로)
+    for attempt in range(1 + REPAIR_ROUNDS):
+        if attempt:
+            metrics.incr("structured_repair_total", section="recommendations", reason="unparsed")
+        recs = _extract_json(await _achat(RECS_PREFIX, f"학습 주제: {topic}", kind="feedback")) or []
+        # 항목이 1개면 _extract_json이 객체 하나만 돌려주므로 목록으로 맞춘다
+        if isinstance(recs, dict):
+            recs = [recs]
+        if recs:
+            break
+    if recs:
+        plan_cache.set(key, recs)
+    return recs
+
+
+def _submit_recommend(topic: str) -> "concurrent.futures.Future":
+    """백그라운드 루프에 추천 생성을 맡기고 Future 반환 (이미 진행 중이면 그것을 공유)"""
+    key = _recs_key(topic)
+    with _recs_lock:
+        fut = _recs_inflight.get(key)
+        if fut is None:
+            fut = asyncio.run_coroutine_threadsafe(_arecommend(topic), _background_loop())
+            _recs_inflight[key] = fut
+            fut.add_done_callback(lambda _f, k=key: _recs_inflight.pop(k, None))
+        return fut
+
+
+def prefetch_feedback(ordered_videos: list) -> None:
+    """
+    퀴즈를 푸는 동안 모든 영상 주제의 추천과 응답 통계를 미리 준비
+    (틀린 문항에 따라 어느 영상에서든 다시 시작할 수 있으므로) 결과는 캐시에 들어가 제출 시 API 호출 없이 끝난다
+    """
+    attempt_log.refresh_stats_async()
+    for topic in dict.fromkeys(v['title_guess'] for v in ordered_videos):
+        _submit_recommend(topic)
+
+
+async def aget_feedback(
+    score: int,
+    total: int,
+    ordered_videos: list,
+    quiz: Optional[List[Dict[str, Any]]] = None,
+    answers: Optional[List[Optional[str]]] = None,
+) -> dict:
+    """
+    점수 기반 학습 피드백 + GPT 추천 영상
+    quiz/answers(문항별 답안)가 있으면 응답 기록 통계로 점수 구간을 정하고, 실제로 틀린 문항으로 다시 볼 영상을 고른다
+    """
+    # 지난 계산 결과를 바로 쓰고, 오래됐으면 다시 계산은 백그라운드에서
+    stats = attempt_log.stats()
+    cutoffs = stats.score_cutoffs([v["video_id"] for v in ordered_videos if v.get("video_id")])
+    tier = _tier(score, total, cutoffs)
+    weak = weak_video(ordered_videos, quiz or [], answers or [], stats)
+    if weak is not None:
+        restart_index, missed = weak
+        metrics.incr("feedback_restart_total", source="missed")
     else:
-        feedback["message"] = f"잘하고 있습니다! 👉 마지막 영상만 복습해도 충분합니다."
-        restart_index = len(ordered_videos) - 1
-
-    # GPT로 추천 영상 받아오기
-    user_prompt = f"""
-    학습 주제는 {ordered_videos[restart_index]['title_guess']} 입니다.
-    이와 관련된 온라인 학습 영상 4개를 추천해주세요.
-    반드시 JSON 배열 형식으로만, 각 항목은 title과 url을 포함해야 합니다.
-    """
-
-    resp = client.chat.completions.create(
-        model=DEPLOYMENT,
-        messages=[
-            {"role": "system", "content": "JSON 배열만 출력"},
-            {"role": "user", "content": user_prompt},
-        ]
-    )
+        restart_index, missed = _restart_index(score, total, len(ordered_videos), cutoffs), 0
+        metrics.incr("feedback_restart_total", source="score")
+    topic = ordered_videos[restart_index]['title_guess']
+    feedback = {"message": _feedback_message(tier, ordered_videos, restart_index, missed),
+                "restart_index": restart_index, "cutoffs": list(cutoffs)}
 
-    recs = _extract_json(resp.choices[0].message.content) or []
-    feedback["recommendations"] = recs
+    # prefetch가 진행 중이면 같은 결과를 기다리고, 아니면 (캐시 확인 후) 새로 생성
+    with _recs_lock:
+        pending = _recs_inflight.get(_recs_key(topic))
+    if pending is not None:
+        feedback["recommendations"] = await asyncio.wrap_future(pending)
+    else:
+        feedback["recommendations"] = await _arecommend(topic)
     return feedback
+
+
+def get_feedback(
+    score: int,
+    total: int,
+    ordered_videos: list,
+    quiz: Optional[List[Dict[str, Any]]] = None,
+    answers: Optional[List[Optional[str]]] = None,
+) -> dict:
+    """점수 기반 학습 피드백 + GPT 추천 영상 (quiz/answers가 있으면 틀린 문항 기준으로 다시 볼 영상 선택)"""
+    return _run(aget_feedback(score, total, ordered_videos, quiz, answers))
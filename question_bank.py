@@ -0,0 +1,226 @@
+import os
+import sys
+import json
+import time
+import random
+from typing import Any, Dict, List, Optional
+
+import metrics
+from sqlite_store import SQLiteStore
+from quiz_dedup import signature
+
+# -------------------------------
+# 설정 (환경 변수로 조정 가능)
+# -------------------------------
+BANK_PATH = os.getenv("QUESTION_BANK_PATH", os.path.join(".cache", "question_bank.sqlite3"))
+# 사용자별 출제 기록 보관 일수 (지나면 같은 문항이 다시 나올 수 있음, 0이면 계속 보관)
+SERVED_RETENTION_DAYS = float(os.getenv("QUESTION_BANK_SERVED_DAYS", "90"))
+
+
+def _interleave(groups: List[List[Any]]) -> List[Any]:
+    """각 묶음에서 하나씩 번갈아 꺼낸 목록"""
+    out = []
+    for i in range(max((len(g) for g in groups), default=0)):
+        out += [g[i] for g in groups if i < len(g)]
+    return out
+
+
+def _quotas(available: List[int], unseen: List[int], n: int) -> List[int]:
+    """
+    n문항을 영상별 보유 문항 수 안에서 최대한 고르게 나눈다 (모자란 영상 몫은 다른 영상이 채움)
+    나눠떨어지지 않는 몫은 안 푼 문항이 많이 남은 영상부터 준다 (여러 번 풀어도 영상별 노출이 고르게)
+    """
+    quotas = [0] * len(available)
+    order = sorted(range(len(available)), key=lambda i: -unseen[i])
+    while sum(quotas) < n:
+        grew = False
+        for i in order:
+            if sum(quotas) < n and quotas[i] < available[i]:
+                quotas[i] += 1
+                grew = True
+        if not grew:
+            break
+    return quotas
+
+
+# -------------------------------
+# 영상별 문제 은행 (SQLite)
+# -------------------------------
+class QuestionBank(SQLiteStore):
+    """
+    정규화된 영상 ID별로 검증된 객관식 문항을 쌓아 두고, 퀴즈를 로컬에서 뽑는다.
+    문항에는 출제 관점(topic)과 난이도 태그가 붙고, 사용자별로 이미 낸 문항을 기억해 반복을 피한다.
+    """
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS questions ("
+        " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+        " video_id TEXT NOT NULL,"
+        " topic TEXT NOT NULL,"
+        " difficulty INTEGER,"
+        " item TEXT NOT NULL,"
+        " signature TEXT NOT NULL,"
+        " created_at REAL NOT NULL);"
+        "CREATE INDEX IF NOT EXISTS idx_questions_video ON questions(video_id);"
+        "CREATE TABLE IF NOT EXISTS served ("
+        " user TEXT NOT NULL,"
+        " question_id INTEGER NOT NULL,"
+        " served_at REAL NOT NULL,"
+        " PRIMARY KEY (user, question_id));"
+        "CREATE INDEX IF NOT EXISTS idx_served_at ON served(served_at);"
+    )
+
+    def __init__(self, path: str = BANK_PATH, served_retention_days: float = SERVED_RETENTION_DAYS):
+        super().__init__(path)
+        self.served_retention_days = served_retention_days
+
+    def counts(self, video_ids: List[str]) -> Dict[str, int]:
+        """영상별 보유 문항 수 (없는 영상은 0)"""
+        out = {vid: 0 for vid in video_ids}
+        if not video_ids:
+            return out
+        with self._lock:
+            rows = self._db().execute(
+                f"SELECT video_id, COUNT(*) FROM questions WHERE video_id IN ({','.join('?' * len(video_ids))})"
+                " GROUP BY video_id",
+                list(video_ids),
+            ).fetchall()
+        out.update(dict(rows))
+        return out
+
+    def signatures(self, video_id: str) -> List[List[int]]:
+        """이미 쌓인 문항의 MinHash 서명 (새 문항 중복 검사용)"""
+        with self._lock:
+            rows = self._db().execute("SELECT signature FROM questions WHERE video_id = ?", (video_id,)).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def add(self, video_id: str, topic: str, difficulty: Optional[int], items: List[Dict[str, Any]]) -> int:
+        """검증/중복 제거가 끝난 문항 저장 후 저장한 수 반환"""
+        now = time.time()
+        rows = [
+            (video_id, topic, difficulty, json.dumps(q, ensure_ascii=False),
+             json.dumps(signature(q["question"])), now)
+            for q in items
+        ]
+        with self._lock:
+            db = self._db()
+            db.executemany(
+                "INSERT INTO questions (video_id, topic, difficulty, item, signature, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            db.commit()
+        metrics.incr("question_bank_added_total", len(rows))
+        return len(rows)
+
+    def sample(
+        self,
+        user: str,
+        video_ids: List[str],
+        n: int,
+        rng: Optional[random.Random] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        video_ids(학습 순서)에서 n문항을 뽑아 출제 기록에 남긴다
+        - 영상별로 고르게, 영상 안에서는 출제 관점을 번갈아 가며 뽑는다
+        - 이 사용자에게 낸 적 없는 문항을 먼저, 다 냈으면 가장 오래전에 낸 문항부터 다시 쓴다
+        - 은행 전체가 n문항보다 적으면 있는 만큼만 반환
+        """
+        rng = rng or random.Random()
+        if not video_ids or n <= 0:
+            return []
+        with self._lock:
+            db = self._db()
+            rows = db.execute(
+                "SELECT q.id, q.video_id, q.topic, q.difficulty, q.item, s.served_at FROM questions q"
+                " LEFT JOIN served s ON s.question_id = q.id AND s.user = ?"
+                f" WHERE q.video_id IN ({','.join('?' * len(video_ids))})",
+                [user, *video_ids],
+            ).fetchall()
+
+            # 영상별 → 관점별 후보 (안 낸 문항 무작위, 그다음 오래전에 낸 순)
+            per_video: Dict[str, Dict[str, list]] = {vid: {} for vid in video_ids}
+            for row in sorted(rows, key=lambda r: (r[5] is not None, r[5] or 0.0, rng.random())):
+                per_video[row[1]].setdefault(row[2], []).append(row)
+            candidates = []
+            for vid in video_ids:
+                topics = list(per_video[vid].values())
+                rng.shuffle(topics)
+                candidates.append(_interleave(topics))
+
+            unseen = [sum(r[5] is None for r in c) for c in candidates]
+            picked = []
+            for rows_of_video, quota in zip(candidates, _quotas([len(c) for c in candidates], unseen, n)):
+                picked += rows_of_video[:quota]
+
+            now = time.time()
+            db.executemany(
+                "INSERT OR REPLACE INTO served (user, question_id, served_at) VALUES (?, ?, ?)",
+                [(user, r[0], now) for r in picked],
+            )
+            db.commit()
+            self._maybe_maintain(now)
+
+        metrics.incr("question_bank_served_total", len(picked), repeated="yes" if any(r[5] for r in picked) else "no")
+        return [
+            {**json.loads(r[4]), "qid": r[0], "video_id": r[1], "topic": r[2], "difficulty": r[3]}
+            for r in picked
+        ]
+
+    def clear(self, video_id: Optional[str] = None) -> None:
+        """영상 하나(없으면 전체)의 문항과 출제 기록 삭제"""
+        with self._lock:
+            db = self._db()
+            if video_id is None:
+                db.execute("DELETE FROM served")
+                db.execute("DELETE FROM questions")
+            else:
+                db.execute("DELETE FROM served WHERE question_id IN (SELECT id FROM questions WHERE video_id = ?)",
+                           (video_id,))
+                db.execute("DELETE FROM questions WHERE video_id = ?", (video_id,))
+            db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            db = self._db()
+            videos, questions = db.execute("SELECT COUNT(DISTINCT video_id), COUNT(*) FROM questions").fetchone()
+            served = db.execute("SELECT COUNT(*) FROM served").fetchone()[0]
+        return {"videos": videos, "questions": questions, "served": served}
+
+    # -------------------------------
+    # 보관 정책 (오래된 출제 기록 정리)
+    # -------------------------------
+    def _maintain(self, now: float) -> None:
+        """락을 잡은 상태에서 호출"""
+        if self.served_retention_days <= 0:
+            return
+        db = self._db()
+        db.execute("DELETE FROM served WHERE served_at < ?", (now - self.served_retention_days * 86400,))
+        db.commit()
+
+
+# 앱 전체가 공유하는 문제 은행 (연결은 처음 쓸 때 연다)
+question_bank = QuestionBank()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    python question_bank.py URL ...  → 영상별 문제 은행을 미리 채우고 현황(JSON) 출력
+    자주 쓰는 영상 목록을 배포 전에 돌려 두면 첫 사용자도 API 호출 없이 퀴즈를 받는다
+    """
+    from planner import fill_question_bank, generate_order
+
+    urls = sys.argv[1:] if argv is None else argv
+    if not urls:
+        print("사용법: python question_bank.py URL [URL ...]", file=sys.stderr)
+        return 2
+    ordered = generate_order(urls)
+    added = fill_question_bank(ordered)
+    report = {"added": added, "counts": question_bank.counts([v["video_id"] for v in ordered]),
+              **question_bank.stats()}
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
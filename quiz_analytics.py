@@ -0,0 +1,347 @@
+import os
+import glob
+import time
+import atexit
+import hashlib
+import threading
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+import metrics
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# -------------------------------
+# 설정 (환경 변수로 조정 가능)
+# -------------------------------
+# 문항별 응답 기록 폴더 (Parquet 조각 파일을 덧붙이기만 한다)
+ATTEMPTS_PATH = os.getenv("QUIZ_ATTEMPTS_PATH", os.path.join(".cache", "quiz_attempts"))
+# 메모리에 모은 응답을 이 행 수 / 이 간격(초)마다 조각 파일 하나로 기록
+FLUSH_ROWS = int(os.getenv("QUIZ_ATTEMPTS_FLUSH_ROWS", "2000"))
+FLUSH_SEC = float(os.getenv("QUIZ_ATTEMPTS_FLUSH_SEC", "60"))
+# 조각 파일이 이 수를 넘으면 하나로 합친다
+MAX_PARTS = int(os.getenv("QUIZ_ATTEMPTS_MAX_PARTS", "64"))
+# 문항/영상 통계를 다시 계산하는 최소 간격(초) (그 사이에 기록된 응답은 다음 계산에 반영)
+STATS_TTL_SEC = float(os.getenv("QUIZ_STATS_TTL_SEC", "30"))
+# 통계를 믿을 최소 응답 수 (모자라면 전체 평균 쪽으로 당겨서 쓴다) / 점수 기준선을 정할 최소 응시 수
+MIN_RESPONSES = int(os.getenv("QUIZ_STATS_MIN_RESPONSES", "20"))
+MIN_ATTEMPTS = int(os.getenv("QUIZ_STATS_MIN_ATTEMPTS", "30"))
+# 응시 기록이 모자랄 때 쓰는 점수 비율 기준 (낮음 / 높음)
+DEFAULT_CUTOFFS = (0.5, 0.8)
+
+_COLUMNS = ["ts", "user", "attempt", "item", "video_id", "topic", "correct"]
+_DICT_COLUMNS = ["user", "video_id", "topic"]
+
+
+def item_id(q: Dict[str, Any]) -> int:
+    """문제 은행 문항이면 qid, 아니면 문항 텍스트 해시 (양수 int64)"""
+    if isinstance(q.get("qid"), int):
+        return q["qid"]
+    digest = hashlib.blake2b(str(q.get("question", "")).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") >> 1
+
+
+class ItemStats:
+    """
+    한 번 계산한 문항/영상 통계 (배열은 모두 NumPy, 행 순서는 응답 기록 순서)
+    items: 문항 id → (응답 수, 정답률, 변별도) / videos: 영상 id → (응답 수, 오답률)
+    """
+
+    def __init__(self, items: Dict[int, Tuple[int, float, float]], videos: Dict[str, Tuple[int, float]],
+                 error_rate: float, attempt_ratio: "np.ndarray", attempt_of_row: "np.ndarray",
+                 video_codes: "np.ndarray", video_names: List[str], rows: int):
+        self.items = items
+        self.videos = videos
+        self.error_rate = error_rate
+        self.rows = rows
+        self._attempt_ratio = attempt_ratio
+        self._attempt_of_row = attempt_of_row
+        self._video_codes = video_codes
+        self._video_index = {v: i for i, v in enumerate(video_names)}
+
+    def p_value(self, item: int) -> float:
+        """정답률 (응답이 적으면 전체 정답률 쪽으로 당긴 값)"""
+        n, p, _ = self.items.get(item, (0, 0.0, 0.0))
+        prior = 1 - self.error_rate
+        return (p * n + prior * MIN_RESPONSES) / (n + MIN_RESPONSES)
+
+    def discrimination(self, item: int) -> float:
+        """점-이연 상관 (나머지 문항 점수와의 상관, 응답이 모자라면 0)"""
+        n, _, d = self.items.get(item, (0, 0.0, 0.0))
+        return d if n >= MIN_RESPONSES else 0.0
+
+    def video_error_rate(self, video_id: str) -> float:
+        """영상 오답률 (응답이 적으면 전체 오답률 쪽으로 당긴 값)"""
+        n, e = self.videos.get(video_id, (0, 0.0))
+        return (e * n + self.error_rate * MIN_RESPONSES) / (n + MIN_RESPONSES)
+
+    def score_cutoffs(self, video_ids: List[str]) -> Tuple[float, float]:
+        """
+        이 영상들이 포함된 응시의 점수 비율 하위/상위 1/3 지점 (낮음/높음 기준)
+        응시가 MIN_ATTEMPTS보다 적으면 DEFAULT_CUTOFFS
+        """
+        import numpy as np
+
+        codes = [self._video_index[v] for v in video_ids if v in self._video_index]
+        if not codes:
+            return DEFAULT_CUTOFFS
+        attempts = np.unique(self._attempt_of_row[np.isin(self._video_codes, codes)])
+        if len(attempts) < MIN_ATTEMPTS:
+            return DEFAULT_CUTOFFS
+        low, high = np.quantile(self._attempt_ratio[attempts], [1 / 3, 2 / 3])
+        # 모두가 잘 보거나 못 보는 묶음에서도 기준이 극단으로 가지 않게 제한
+        low = float(min(max(low, 0.3), 0.7))
+        return low, float(min(max(high, low + 0.1), 0.9))
+
+
+def empty_stats() -> ItemStats:
+    """응답 기록이 없을 때의 통계 (모든 값이 기본값으로 떨어진다)"""
+    import numpy as np
+
+    empty = np.zeros(0)
+    return ItemStats({}, {}, 0.5, empty, empty.astype(np.int64), empty.astype(np.int64), [], 0)
+
+
+def compute_stats(df: Any) -> ItemStats:
+    """
+    응답 기록(DataFrame, 응시 단위로 연속된 행)에서 문항/영상 통계를 한 번에 계산
+    groupby 대신 정수 코드 + bincount로 모아 수백만 행도 1초 안에 끝낸다
+    """
+    import numpy as np
+    import pandas as pd
+
+    n_rows = len(df)
+    x = df["correct"].to_numpy(dtype=np.float64)
+    attempt = df["attempt"].to_numpy()
+    if n_rows == 0:
+        return empty_stats()
+
+    # 응시별 맞은 수 / 문항 수 (한 응시의 행은 붙어 있으므로 경계만 찾으면 된다)
+    starts = np.flatnonzero(np.r_[True, attempt[1:] != attempt[:-1]])
+    counts = np.diff(np.r_[starts, n_rows])
+    totals = np.add.reduceat(x, starts)
+    attempt_of_row = np.repeat(np.arange(len(starts)), counts)
+    row_count = counts[attempt_of_row]
+    # 나머지 문항 정답률 (문항 하나짜리 응시는 변별도 계산에서 제외)
+    has_rest = row_count > 1
+    rest = np.where(has_rest, (totals[attempt_of_row] - x) / np.maximum(row_count - 1, 1), 0.0)
+
+    codes, uniques = pd.factorize(df["item"].to_numpy())
+    k = len(uniques)
+    n = np.bincount(codes, minlength=k)
+    correct = np.bincount(codes, weights=x, minlength=k)
+    xs, ys = x[has_rest], rest[has_rest]
+    cs = codes[has_rest]
+    m = np.bincount(cs, minlength=k)
+    sx = np.bincount(cs, weights=xs, minlength=k)
+    sy = np.bincount(cs, weights=ys, minlength=k)
+    sxy = np.bincount(cs, weights=xs * ys, minlength=k)
+    syy = np.bincount(cs, weights=ys * ys, minlength=k)
+    # x는 0/1이므로 Σx² = Σx
+    den = np.sqrt(np.maximum(m * sx - sx ** 2, 0) * np.maximum(m * syy - sy ** 2, 0))
+    disc = np.divide(m * sxy - sx * sy, den, out=np.zeros(k), where=den > 0)
+    p = correct / np.maximum(n, 1)
+    items = {int(i): (int(c), float(pv), float(d)) for i, c, pv, d in zip(uniques, n, p, disc)}
+
+    video = pd.Categorical(df["video_id"])
+    video_codes = video.codes.astype(np.int64)
+    kv = len(video.categories)
+    vn = np.bincount(video_codes, minlength=kv)
+    verr = vn - np.bincount(video_codes, weights=x, minlength=kv)
+    videos = {str(v): (int(c), float(e / c) if c else 0.0) for v, c, e in zip(video.categories, vn, verr)}
+
+    return ItemStats(items, videos, float(1 - x.mean()), totals / counts, attempt_of_row, video_codes,
+                     [str(v) for v in video.categories], n_rows)
+
+# -------------------------------
+# 문항별 응답 기록 (Parquet 조각 파일, 덧붙이기 전용)
+# -------------------------------
+class AttemptLog:
+    """
+    퀴즈 응시를 문항 단위 행(user, attempt, item, video_id, topic, correct)으로 기록한다.
+    행은 메모리에 모았다가 조각 파일로 쓰고, 통계는 STATS_TTL_SEC마다 전체 기록으로 다시 계산한다.
+    pyarrow/pandas는 무거운 모듈이라 처음 기록/계산할 때 불러온다.
+    """
+
+    def __init__(self, path: str = ATTEMPTS_PATH, flush_rows: int = FLUSH_ROWS, flush_sec: float = FLUSH_SEC,
+                 max_parts: int = MAX_PARTS, stats_ttl_sec: float = STATS_TTL_SEC):
+        self.path = path
+        self.flush_rows = flush_rows
+        self.flush_sec = flush_sec
+        self.max_parts = max_parts
+        self.stats_ttl_sec = stats_ttl_sec
+        self._buffer: Dict[str, list] = {c: [] for c in _COLUMNS}
+        self._last_flush = time.monotonic()
+        self._last_attempt = 0
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        # 조각 파일 경로 → 읽어 둔 Arrow 테이블 (새로 생긴 파일만 읽는다)
+        self._tables: Dict[str, Any] = {}
+        self._stats: Optional[ItemStats] = None
+        self._stats_at = 0.0
+        self._stats_lock = threading.Lock()
+        self._refreshing = False
+
+    def record(self, user: str, quiz: List[Dict[str, Any]], answers: List[Optional[str]]) -> int:
+        """응시 1회의 문항별 정오답 기록 후 응시 id 반환"""
+        now = time.time()
+        with self._lock:
+            # 응시 id는 프로세스 안에서 증가만 한다 (한 응시의 행은 항상 붙어서 기록됨)
+            attempt = self._last_attempt = max(self._last_attempt + 1, time.time_ns())
+            for q, answer in zip(quiz, answers):
+                self._buffer["ts"].append(now)
+                self._buffer["user"].append(user)
+                self._buffer["attempt"].append(attempt)
+                self._buffer["item"].append(item_id(q))
+                self._buffer["video_id"].append(q.get("video_id") or "")
+                self._buffer["topic"].append(q.get("topic") or "")
+                self._buffer["correct"].append(answer == q.get("answer"))
+            due = (len(self._buffer["ts"]) >= self.flush_rows
+                   or time.monotonic() - self._last_flush >= self.flush_sec)
+        metrics.incr("quiz_attempt_rows_total", len(quiz))
+        if due:
+            # 파일 쓰기(첫 호출이면 pyarrow import 포함)로 채점 응답이 늦어지지 않게 별도 스레드에서
+            threading.Thread(target=self.flush, name="attempt-flush", daemon=True).start()
+        return attempt
+
+    def flush(self) -> Optional[str]:
+        """메모리에 모인 응답을 조각 파일 하나로 기록 (없으면 None)"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        with self._lock:
+            rows, self._buffer = self._buffer, {c: [] for c in _COLUMNS}
+            self._last_flush = time.monotonic()
+        if not rows["ts"]:
+            return None
+        table = pa.table({
+            "ts": pa.array(rows["ts"], pa.float64()),
+            **{c: pa.array(rows[c], pa.string()).dictionary_encode() for c in _DICT_COLUMNS},
+            "attempt": pa.array(rows["attempt"], pa.int64()),
+            "item": pa.array(rows["item"], pa.int64()),
+            "correct": pa.array(rows["correct"], pa.bool_()),
+        }).select(_COLUMNS)
+        with self._io_lock:
+            os.makedirs(self.path, exist_ok=True)
+            name = os.path.join(self.path, f"part-{time.time_ns()}-{os.getpid()}.parquet")
+            # 쓰는 도중의 파일은 읽히지 않도록 점(.)으로 시작하는 임시 이름으로 쓴 뒤 바꾼다
+            tmp = os.path.join(self.path, "." + os.path.basename(name))
+            pq.write_table(table, tmp)
+            os.replace(tmp, name)
+            if len(self._part_files()) > self.max_parts:
+                self._compact()
+        metrics.incr("quiz_attempt_flush_total")
+        return name
+
+    def _part_files(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.path, "part-*.parquet")))
+
+    def _compact(self) -> None:
+        """조각 파일을 기록 순서대로 하나로 합친다 (_io_lock을 잡은 상태에서 호출)"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        parts = self._part_files()
+        merged = pa.concat_tables([pq.read_table(p) for p in parts], promote_options="permissive")
+        # 합친 파일이 가장 앞에 오도록 첫 조각의 이름을 이어받는다
+        tmp = os.path.join(self.path, "." + os.path.basename(parts[0]))
+        pq.write_table(merged, tmp)
+        os.replace(tmp, parts[0])
+        for p in parts[1:]:
+            os.remove(p)
+        self._tables.clear()
+        metrics.log_event("quiz_attempts_compacted", parts=len(parts), rows=merged.num_rows)
+
+    def frame(self) -> Any:
+        """기록된(파일로 쓴) 모든 응답을 pandas DataFrame으로 (새 조각 파일만 추가로 읽는다)"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        with self._io_lock:
+            parts = self._part_files()
+            for p in set(self._tables) - set(parts):
+                del self._tables[p]
+            for p in parts:
+                if p not in self._tables:
+                    self._tables[p] = pq.read_table(p, columns=["attempt", "item", "video_id", "correct"])
+            tables = [self._tables[p] for p in parts]
+        if not tables:
+            return pa.table({"attempt": pa.array([], pa.int64()), "item": pa.array([], pa.int64()),
+                             "video_id": pa.array([], pa.string()), "correct": pa.array([], pa.bool_())}).to_pandas()
+        return pa.concat_tables(tables, promote_options="permissive").to_pandas()
+
+    def _refresh_stats(self) -> ItemStats:
+        with self._stats_lock:
+            with metrics.span("quiz_stats") as info:
+                self._stats = compute_stats(self.frame())
+                info["rows"] = self._stats.rows
+            self._stats_at = time.monotonic()
+            return self._stats
+
+    def _background_refresh(self) -> None:
+        try:
+            self._refresh_stats()
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def refresh_stats_async(self) -> None:
+        """통계가 없거나 STATS_TTL_SEC보다 오래됐으면 별도 스레드에서 다시 계산 (이미 계산 중이면 무시)"""
+        with self._lock:
+            fresh = self._stats is not None and time.monotonic() - self._stats_at < self.stats_ttl_sec
+            if fresh or self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh, name="quiz-stats", daemon=True).start()
+
+    def stats(self, refresh: bool = False) -> ItemStats:
+        """
+        문항/영상 통계 (지난 계산 결과를 바로 반환하고, 오래됐으면 백그라운드에서 다시 계산)
+        아직 한 번도 계산하지 않았으면 빈 통계(기본값), refresh=True면 그 자리에서 다시 계산
+        """
+        if refresh:
+            return self._refresh_stats()
+        self.refresh_stats_async()
+        return self._stats if self._stats is not None else empty_stats()
+
+
+# 앱 전체가 공유하는 응답 기록 (종료할 때 남은 응답을 파일로 쓴다)
+attempt_log = AttemptLog()
+atexit.register(attempt_log.flush)
+
+# -------------------------------
+# 틀린 문항으로 다시 볼 영상 고르기
+# -------------------------------
+def weak_video(
+    ordered_videos: List[Dict[str, Any]],
+    quiz: List[Dict[str, Any]],
+    answers: List[Optional[str]],
+    stats: ItemStats,
+) -> Optional[Tuple[int, int]]:
+    """
+    학습 순서에서 가장 앞의 '약한' 영상 (위치, 그 영상에서 틀린 문항 수)
+    - 틀린 문항은 많은 사람이 맞히는(쉬운) 문항일수록, 변별도가 높을수록 무겁게 센다
+    - 영상의 가중 오답률이 그 영상의 전체 오답률보다 높으면 약한 영상
+    - 약한 영상이 없으면 틀린 문항이 있는 첫 영상, 문항에 영상 정보가 없으면 None
+    """
+    position = {v.get("video_id"): i for i, v in enumerate(ordered_videos) if v.get("video_id")}
+    asked: Dict[int, float] = {}
+    missed: Dict[int, float] = {}
+    miss_count: Dict[int, int] = {}
+    for q, answer in zip(quiz, answers):
+        idx = position.get(q.get("video_id"))
+        if idx is None:
+            continue
+        item = item_id(q)
+        weight = stats.p_value(item) * (1 + max(stats.discrimination(item), 0.0))
+        asked[idx] = asked.get(idx, 0.0) + weight
+        if answer != q.get("answer"):
+            missed[idx] = missed.get(idx, 0.0) + weight
+            miss_count[idx] = miss_count.get(idx, 0) + 1
+    if not asked or not missed:
+        return None
+    for idx in sorted(missed):
+        if missed[idx] / asked[idx] > stats.video_error_rate(ordered_videos[idx]["video_id"]):
+            return idx, miss_count[idx]
+    first = min(missed)
+    return first, miss_count[first]
@@ -0,0 +1,56 @@
+import re
+import random
+import hashlib
+from typing import Iterable, List, Sequence, Tuple
+
+# -------------------------------
+# MinHash 기반 유사 문항 제거
+# -------------------------------
+NUM_PERM = 64
+NGRAM = 3
+_PRIME = (1 << 61) - 1
+
+# 프로세스가 달라도 같은 서명이 나오도록 고정 시드 사용
+_rng = random.Random(20250930)
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+
+def _shingles(text: str, n: int = NGRAM) -> set:
+    """공백/문장부호를 지운 뒤 글자 n-gram 집합 (한국어 문항에도 잘 맞는다)"""
+    norm = re.sub(r"[\W_]+", "", text.lower())
+    if len(norm) <= n:
+        return {norm}
+    return {norm[i:i + n] for i in range(len(norm) - n + 1)}
+
+
+def signature(text: str) -> Tuple[int, ...]:
+    """문장의 MinHash 서명"""
+    hashes = [
+        int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+        for s in _shingles(text)
+    ]
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMS)
+
+
+def similarity(sig_a: Tuple[int, ...], sig_b: Tuple[int, ...]) -> float:
+    """두 서명의 추정 자카드 유사도 (0~1)"""
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / len(sig_a)
+
+
+class NearDuplicateFilter:
+    """이미 받은 문항과 threshold 이상 비슷한 문항을 걸러낸다 (스트리밍 중에도 한 개씩 사용 가능)"""
+
+    def __init__(self, threshold: float = 0.6, known: Iterable[Sequence[int]] = ()):
+        """known: 이미 받은 문항의 서명 (이것과 비슷한 문항도 중복으로 본다)"""
+        self.threshold = threshold
+        self._sigs: List[Tuple[int, ...]] = [tuple(sig) for sig in known]
+        self.removed = 0
+
+    def add(self, text: str) -> bool:
+        """새 문항이면 기억하고 True, 중복이면 False"""
+        sig = signature(text)
+        if any(similarity(sig, seen) >= self.threshold for seen in self._sigs):
+            self.removed += 1
+            return False
+        self._sigs.append(sig)
+        return True
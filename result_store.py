@@ -0,0 +1,115 @@
+import os
+import json
+import zlib
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import metrics
+
+# -------------------------------
+# 설정 (환경 변수로 조정 가능)
+# -------------------------------
+# 공유 결과 저장소가 쓸 최대 메모리 (압축된 크기 기준, MB)
+RESULT_STORE_MAX_MB = float(os.getenv("RESULT_STORE_MAX_MB", "64"))
+# zlib 압축 수준 (1: 빠름 ~ 9: 작음)
+RESULT_STORE_COMPRESS_LEVEL = int(os.getenv("RESULT_STORE_COMPRESS_LEVEL", "6"))
+# 항목마다 더하는 관리 비용 추정치 (키 문자열, dict 슬롯 등)
+ENTRY_OVERHEAD_BYTES = 200
+
+
+def _encode(value: Any, level: int) -> Tuple[str, bytes]:
+    """정규화된 JSON의 sha256 키와 압축된 본문 (같은 내용이면 같은 키)"""
+    canonical = json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(canonical).hexdigest(), zlib.compress(canonical, level)
+
+
+# -------------------------------
+# 공유 결과 저장소 (내용 해시 키 + 압축 + LRU)
+# -------------------------------
+class ResultStore:
+    """
+    생성 결과를 내용 해시로 한 번만 저장하고, 세션은 키만 들고 있게 한다.
+    값은 압축된 JSON으로 두고 꺼낼 때마다 풀며, 전체 크기가 max_bytes를 넘으면 오래 안 쓴 것부터 지운다.
+    지워진 키를 조회하면 None (호출하는 쪽이 플랜 저장소에서 다시 불러와 넣는다).
+    """
+
+    def __init__(self, max_bytes: int = int(RESULT_STORE_MAX_MB * 1024 * 1024),
+                 level: int = RESULT_STORE_COMPRESS_LEVEL):
+        self.max_bytes = max_bytes
+        self.level = level
+        self._items: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.dedup = 0
+        self.evictions = 0
+
+    def put(self, value: Any) -> str:
+        """값을 저장하고 키 반환 (같은 내용이 이미 있으면 새로 저장하지 않는다)"""
+        key, blob = _encode(value, self.level)
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.dedup += 1
+                return key
+            self._items[key] = blob
+            self._bytes += len(blob) + ENTRY_OVERHEAD_BYTES
+            # 방금 넣은 항목은 남긴다 (혼자서 한도를 넘는 큰 결과도 적어도 한 번은 꺼낼 수 있게)
+            while self._bytes > self.max_bytes and len(self._items) > 1:
+                _, old = self._items.popitem(last=False)
+                self._bytes -= len(old) + ENTRY_OVERHEAD_BYTES
+                self.evictions += 1
+            self._report()
+        return key
+
+    def get(self, key: Optional[str]) -> Optional[Any]:
+        if key is None:
+            return None
+        with self._lock:
+            blob = self._items.get(key)
+            if blob is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+        return json.loads(zlib.decompress(blob))
+
+    def put_sections(self, result: Dict[str, Any]) -> Dict[str, str]:
+        """결과 dict를 섹션(순서/플랜/퀴즈)별로 저장 → {섹션: 키} (다른 세션과 같은 섹션은 한 번만 저장)"""
+        return {section: self.put(value) for section, value in result.items()}
+
+    def get_sections(self, keys: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        """{섹션: 키}로 결과 dict 복원 (하나라도 지워졌으면 None)"""
+        result = {}
+        for section, key in keys.items():
+            value = self.get(key)
+            if value is None:
+                return None
+            result[section] = value
+        return result
+
+    def _report(self) -> None:
+        """메모리 사용량 게이지 갱신 (락을 잡은 상태에서 호출)"""
+        metrics.set_gauge("result_store_bytes", self._bytes)
+        metrics.set_gauge("result_store_items", len(self._items))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "items": len(self._items),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "dedup": self.dedup,
+                "evictions": self.evictions,
+            }
+
+
+# 앱 전체(모든 세션)가 공유하는 결과 저장소
+result_store = ResultStore()
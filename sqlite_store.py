@@ -0,0 +1,53 @@
+import os
+import sqlite3
+import threading
+from typing import Optional, Tuple
+
+# -------------------------------
+# SQLite 공통 (지연 연결 + 주기적 정리)
+# -------------------------------
+def connect(path: str, schema: str, pragmas: Tuple[str, ...] = ()) -> sqlite3.Connection:
+    """폴더를 만들고 SQLite 연결을 열어 스키마(CREATE ... IF NOT EXISTS)를 적용"""
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+    for pragma in pragmas:
+        conn.execute(pragma)
+    conn.executescript(schema)
+    conn.commit()
+    return conn
+
+
+class SQLiteStore:
+    """
+    처음 쓸 때 SQLite 연결을 여는 저장소의 공통 부분 (결과 캐시, 플랜 저장소, 문제 은행, 썸네일 색인).
+    하위 클래스는 SCHEMA/PRAGMAS를 정하고, self._lock을 잡은 상태에서 _db()를 쓴다.
+    정리 작업이 있으면 _maintain(now)을 구현하고 쓰기 경로에서 _maybe_maintain(now)을 부른다.
+    """
+
+    SCHEMA = ""
+    PRAGMAS: Tuple[str, ...] = ()
+    # 정리 작업은 이 간격(초)마다 한 번만 수행
+    MAINTENANCE_INTERVAL_SEC = 3600
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._last_maintenance = 0.0
+
+    def _db(self) -> sqlite3.Connection:
+        """SQLite 연결을 처음 쓸 때 열고 테이블/인덱스를 만든다"""
+        if self._conn is None:
+            self._conn = connect(self.path, self.SCHEMA, self.PRAGMAS)
+        return self._conn
+
+    def _maybe_maintain(self, now: float) -> None:
+        """락을 잡은 상태에서 호출, MAINTENANCE_INTERVAL_SEC마다 한 번만 _maintain 실행"""
+        if now - self._last_maintenance >= self.MAINTENANCE_INTERVAL_SEC:
+            self._last_maintenance = now
+            self._maintain(now)
+
+    def _maintain(self, now: float) -> None:
+        pass
@@ -0,0 +1,97 @@
+import os
+import re
+import sys
+import json
+import time
+import subprocess
+from typing import Any, Dict, List, Optional
+
+import metrics
+
+# -------------------------------
+# 설정
+# -------------------------------
+# 앱 모듈 import ~ 첫 화면 렌더링까지의 목표 시간(초), 넘으면 경고 이벤트를 남긴다
+STARTUP_BUDGET_SEC = float(os.getenv("STARTUP_BUDGET_SEC", "3"))
+# import 시간 보고서에서 보여줄 상위 모듈 수
+REPORT_TOP_N = 15
+# 앱이 처음에 불러오는 모듈 (보고서 측정 대상)
+APP_MODULES = ["streamlit", "metrics", "plan_store", "quiz_analytics", "result_store", "thumbnails", "planner", "jobs"]
+
+# 이 모듈이 처음 import된 시각 (app.py 맨 위에서 import하므로 앱 시작 시각으로 본다)
+_T0 = time.perf_counter()
+_marks: Dict[str, float] = {}
+_reported = False
+
+
+def mark(name: str) -> float:
+    """시작 후 경과 시간(초)을 name으로 한 번만 기록"""
+    return _marks.setdefault(name, time.perf_counter() - _T0)
+
+
+def report_first_render() -> Optional[Dict[str, Any]]:
+    """
+    프로세스의 첫 렌더링이 끝났을 때 한 번만 시작 시간 보고 (이후 호출은 None)
+    app_startup_seconds{phase=...} 로 기록하고, 예산을 넘으면 startup_over_budget 이벤트를 남긴다
+    """
+    global _reported
+    if _reported:
+        return None
+    _reported = True
+    mark("first_render")
+    for phase, sec in _marks.items():
+        metrics.observe("app_startup_seconds", sec, phase=phase)
+    report = {k: round(v, 3) for k, v in _marks.items()}
+    metrics.log_event("startup", budget_sec=STARTUP_BUDGET_SEC, **report)
+    if _marks["first_render"] > STARTUP_BUDGET_SEC:
+        metrics.log_event("startup_over_budget", budget_sec=STARTUP_BUDGET_SEC, **report)
+    return report
+
+# -------------------------------
+# 모듈별 import 시간 보고서 (새 인터프리터에서 -X importtime으로 측정)
+# -------------------------------
+_IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def import_times(modules: List[str] = APP_MODULES, top: int = REPORT_TOP_N) -> Dict[str, Any]:
+    """
+    modules를 차례로 import할 때 걸리는 시간
+    {"total_sec", "modules": {이름: 누적 초}, "slowest": {가장 느린 (하위)모듈: 누적 초}}
+    """
+    code = "; ".join(f"import {m}" for m in modules)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import 실패")
+    rows = []
+    for line in proc.stderr.splitlines():
+        m = _IMPORTTIME_RE.match(line)
+        if m:
+            rows.append((m.group(4), int(m.group(2)) / 1e6, len(m.group(3))))
+    # 들여쓰기가 가장 얕은 줄이 최상위 import (하위 모듈 시간이 누적값에 포함됨)
+    depth = min((d for _, _, d in rows), default=0)
+    top_level = {name: sec for name, sec, d in rows if d == depth}
+    return {
+        "total_sec": round(sum(top_level.values()), 3),
+        "modules": {m: round(top_level.get(m, 0.0), 3) for m in modules},
+        "slowest": {name: round(sec, 3) for name, sec, _ in sorted(rows, key=lambda r: -r[1])[:top]},
+    }
+
+
+def main() -> int:
+    """
+    python startup.py  → 앱 모듈 import 시간 보고서(JSON), 예산을 넘으면 종료 코드 1
+    배포 전 CI에서 돌려 콜드 스타트가 느려지는 변경을 잡는다
+    """
+    report = import_times()
+    report["budget_sec"] = STARTUP_BUDGET_SEC
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 1 if report["total_sec"] > STARTUP_BUDGET_SEC else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
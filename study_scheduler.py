@@ -0,0 +1,271 @@
+import os
+import re
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import metrics
+from http_sessions import session_for
+from plan_cache import PlanCache, make_key
+from video_urls import video_id
+
+# -------------------------------
+# 설정
+# -------------------------------
+# 한 세션의 목표 학습 시간(분) / 길이를 모를 때 가정할 영상 길이(분)
+SESSION_BUDGET_MIN = int(os.getenv("STUDY_SESSION_BUDGET_MIN", "90"))
+DEFAULT_VIDEO_MIN = float(os.getenv("STUDY_DEFAULT_VIDEO_MIN", "20"))
+# 영상 1분당 실제 학습 시간 (시청 + 메모/정리)
+STUDY_MULTIPLIER = float(os.getenv("STUDY_TIME_MULTIPLIER", "1.5"))
+# 배정할 영상이 없는 날의 복습 세션 길이(분)
+REVIEW_SESSION_MIN = 30
+DURATION_FETCH_TIMEOUT_SEC = float(os.getenv("STUDY_DURATION_TIMEOUT_SEC", "8"))
+# 영상 페이지에서 길이 정보를 찾을 때 읽을 최대 바이트
+DURATION_BYTE_CAP = 2 * 1024 * 1024
+SESSION_NAMES = ("morning", "afternoon", "evening")
+
+# -------------------------------
+# 영상 길이 조회 (페이지 메타데이터)
+# -------------------------------
+_DURATION_PATTERNS = [
+    (re.compile(rb'"lengthSeconds"\s*:\s*"(\d+)"'), "seconds"),
+    (re.compile(rb'itemprop="duration"\s+content="(PT[0-9HMS.]+)"', re.IGNORECASE), "iso"),
+    (re.compile(rb'property="(?:og:)?video:duration"\s+content="(\d+)"', re.IGNORECASE), "seconds"),
+    (re.compile(rb'"duration"\s*:\s*"(PT[0-9HMS.]+)"'), "iso"),
+]
+_ISO_RE = re.compile(r"PT(?:(\d+)H)?(?:(\d+)M)?(?:([\d.]+)S)?")
+
+
+def parse_iso_duration(value: str) -> Optional[float]:
+    """'PT1H2M3S' → 초"""
+    m = _ISO_RE.fullmatch(value)
+    if not m or not any(m.groups()):
+        return None
+    h, mi, s = m.groups()
+    return int(h or 0) * 3600 + int(mi or 0) * 60 + float(s or 0)
+
+
+def _fetch_duration_sec(url: str) -> Optional[float]:
+    """영상 페이지를 스트리밍으로 읽으며 길이 메타데이터를 찾는다 (못 찾으면 None)"""
+    try:
+        with session_for(url).get(url, timeout=DURATION_FETCH_TIMEOUT_SEC, stream=True) as res:
+            buf = b""
+            for chunk in res.iter_content(chunk_size=64 * 1024):
+                buf += chunk
+                for pattern, kind in _DURATION_PATTERNS:
+                    m = pattern.search(buf)
+                    if m:
+                        raw = m.group(1).decode("ascii")
+                        return float(raw) if kind == "seconds" else parse_iso_duration(raw)
+                if len(buf) >= DURATION_BYTE_CAP:
+                    break
+    except Exception:
+        return None
+    return None
+
+
+def _cached_duration_min(url: str, cache: Optional[PlanCache]) -> Optional[float]:
+    """영상 길이(분), cache가 있으면 조회 결과를 저장 (못 찾은 경우도 -1로 저장해 다시 요청하지 않음)"""
+    key = make_key("video_duration", video_id(url))
+    cached = cache.get(key) if cache is not None else None
+    if cached is not None:
+        metrics.incr("video_duration_total", result="cached")
+        return cached if cached >= 0 else None
+    with metrics.span("video_duration_fetch"):
+        seconds = _fetch_duration_sec(url)
+    metrics.incr("video_duration_total", result="found" if seconds else "missing")
+    minutes = round(seconds / 60, 1) if seconds else None
+    if cache is not None:
+        cache.set(key, minutes if minutes is not None else -1)
+    return minutes
+
+
+def resolve_durations(
+    urls: List[str],
+    overrides: Optional[Dict[str, float]] = None,
+    cache: Optional[PlanCache] = None,
+) -> Dict[str, float]:
+    """
+    URL별 영상 길이(분)
+    overrides(사용자 입력)가 우선이고 (0이면 이미 본 영상처럼 시간을 배정하지 않음),
+    나머지는 페이지에서 동시에 조회(cache가 있으면 재사용), 끝내 모르면 DEFAULT_VIDEO_MIN
+    """
+    overrides = overrides or {}
+    for u, minutes in overrides.items():
+        if not math.isfinite(minutes) or minutes < 0:
+            raise ValueError(f"영상 길이는 0분 이상이어야 합니다: {u} ({minutes})")
+    todo = [u for u in dict.fromkeys(urls) if u and u not in overrides]
+    found: Dict[str, Optional[float]] = {}
+    if todo:
+        with ThreadPoolExecutor(max_workers=min(8, len(todo)), thread_name_prefix="duration") as pool:
+            found = dict(zip(todo, pool.map(lambda u: _cached_duration_min(u, cache), todo)))
+    return {u: float(overrides[u] if u in overrides else found.get(u) or DEFAULT_VIDEO_MIN) for u in urls}
+
+# -------------------------------
+# 순서를 지키는 분할 (최대 구간 합 최소화)
+# -------------------------------
+def _greedy_groups(loads: List[float], k: int, cap: float) -> Optional[List[List[int]]]:
+    """
+    앞에서부터 cap을 넘기 전까지 묶되, 남은 항목 수가 남은 구간 수와 같아지면 끊어서
+    정확히 min(k, n)개의 비지 않은 구간을 만든다 (cap으로 불가능하면 None)
+    """
+    n = len(loads)
+    groups: List[List[int]] = []
+    cur: List[int] = []
+    total = 0.0
+    for i, load in enumerate(loads):
+        if load > cap:
+            return None
+        groups_left = min(k, n) - len(groups)
+        if cur and (total + load > cap or n - i < groups_left):
+            groups.append(cur)
+            cur, total = [], 0.0
+        cur.append(i)
+        total += load
+    if cur:
+        groups.append(cur)
+    return groups if len(groups) <= k else None
+
+
+def partition_in_order(loads: List[float], k: int) -> List[List[int]]:
+    """loads를 순서대로 최대 k개 구간으로 나눠 가장 무거운 구간의 합을 최소화 (이분 탐색 + 탐욕)"""
+    if not loads or k <= 0:
+        return []
+    lo, hi = max(loads), sum(loads)
+    best = _greedy_groups(loads, k, hi)
+    # 분 단위라 0.5분 정밀도면 충분
+    while hi - lo > 0.5:
+        mid = (lo + hi) / 2
+        groups = _greedy_groups(loads, k, mid)
+        if groups is not None:
+            best, hi = groups, mid
+        else:
+            lo = mid
+    return best or [[i] for i in range(len(loads))]
+
+# -------------------------------
+# 일정 생성
+# -------------------------------
+def _study_units(ordered_videos: List[Dict[str, Any]], durations: Dict[str, float]) -> List[Dict[str, Any]]:
+    """
+    영상별 학습 시간을 계산하고, 한 세션보다 긴 영상은 여러 부분으로 나눈다
+    0분인 영상(이미 본 영상 등)은 시간을 배정하지 않으므로 빼고 나눈다
+    """
+    units = []
+    for i, v in enumerate(ordered_videos, 1):
+        minutes = durations.get(v.get("url", ""), DEFAULT_VIDEO_MIN) * STUDY_MULTIPLIER
+        if minutes <= 0:
+            continue
+        parts = max(1, math.ceil(minutes / SESSION_BUDGET_MIN))
+        for p in range(1, parts + 1):
+            units.append({
+                "index": v.get("index", i),
+                "url": v.get("url", ""),
+                "title": v.get("title_guess", ""),
+                "part_no": p,
+                "parts": parts,
+                "minutes": minutes / parts,
+            })
+    return units
+
+
+def _session_videos(units: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """한 세션 안에서 같은 영상의 연속된 부분은 하나로 합친다 ('2~3/5', 전부 들어가면 part 없음)"""
+    merged: List[Dict[str, Any]] = []
+    for u in units:
+        prev = merged[-1] if merged else None
+        if prev and prev["url"] == u["url"] and prev["index"] == u["index"] and prev["last"] + 1 == u["part_no"]:
+            prev["last"] = u["part_no"]
+            prev["minutes"] += u["minutes"]
+        else:
+            merged.append({**u, "first": u["part_no"], "last": u["part_no"]})
+    videos = []
+    for m in merged:
+        if m["first"] == 1 and m["last"] == m["parts"]:
+            part = None
+        elif m["first"] == m["last"]:
+            part = f"{m['first']}/{m['parts']}"
+        else:
+            part = f"{m['first']}~{m['last']}/{m['parts']}"
+        videos.append({"index": m["index"], "url": m["url"], "title": m["title"], "part": part,
+                       "minutes": round(m["minutes"])})
+    return videos
+
+
+def build_schedule(
+    ordered_videos: List[Dict[str, Any]],
+    days: int,
+    durations: Dict[str, float],
+) -> List[Dict[str, Any]]:
+    """
+    정렬된 영상을 순서대로 days일에 나눠 담고, 하루 안에서는 최대 3개 세션으로 나눈다
+    각 day: {"day", "sessions": [{"time_of_day", "est_time_min", "videos": [...]}]}
+    영상보다 날이 많으면 남는 날은 복습 세션 하나로 채운다 (0분 영상은 일정에 넣지 않는다)
+    """
+    units = _study_units(ordered_videos, durations)
+    day_groups = partition_in_order([u["minutes"] for u in units], days)
+    schedule = []
+    for d in range(1, days + 1):
+        day_units = [units[i] for i in day_groups[d - 1]] if d <= len(day_groups) else []
+        if not day_units:
+            schedule.append({"day": d, "sessions": [
+                {"time_of_day": SESSION_NAMES[0], "est_time_min": REVIEW_SESSION_MIN, "videos": []},
+            ]})
+            continue
+        load = sum(u["minutes"] for u in day_units)
+        n_sessions = min(len(SESSION_NAMES), len(day_units), max(1, math.ceil(load / SESSION_BUDGET_MIN)))
+        sessions = []
+        for name, group in zip(SESSION_NAMES, partition_in_order([u["minutes"] for u in day_units], n_sessions)):
+            group_units = [day_units[i] for i in group]
+            sessions.append({
+                "time_of_day": name,
+                "est_time_min": max(5, int(round(sum(u["minutes"] for u in group_units) / 5) * 5)),
+                "videos": _session_videos(group_units),
+            })
+        schedule.append({"day": d, "sessions": sessions})
+    return schedule
+
+
+def describe_schedule(schedule: List[Dict[str, Any]]) -> str:
+    """LLM 프롬프트용 일정 요약"""
+    lines = []
+    for day in schedule:
+        lines.append(f"Day {day['day']}")
+        for s in day["sessions"]:
+            videos = ", ".join(
+                f"{v['index']}. {v['title']}" + (f" ({v['part']}부)" if v["part"] else "") for v in s["videos"]
+            ) or "배정된 영상 없음 (복습)"
+            lines.append(f"  - {s['time_of_day']} ({s['est_time_min']}분): {videos}")
+    return "\n".join(lines)
+
+
+def merge_day_text(day: Dict[str, Any], text: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    로컬 일정(day)에 LLM이 채운 goals/focus/tasks/review를 합친다
+    text가 없거나 세션 수가 모자라면 영상 제목으로 기본 문구를 만든다
+    """
+    text = text or {}
+    text_sessions = text.get("sessions") if isinstance(text.get("sessions"), list) else []
+    sessions = []
+    for i, s in enumerate(day["sessions"]):
+        t = text_sessions[i] if i < len(text_sessions) and isinstance(text_sessions[i], dict) else {}
+        titles = [v["title"] for v in s["videos"]]
+        if titles:
+            default_focus = ", ".join(titles)
+            default_tasks = [f"'{t_}' 시청하며 키워드 메모" for t_ in titles] + ["핵심 개념 요약"]
+        else:
+            default_focus = "지금까지 배운 내용 복습"
+            default_tasks = ["이전 영상 메모 다시 보기", "퀴즈 풀기"]
+        sessions.append({
+            "time_of_day": s["time_of_day"],
+            "focus": t.get("focus") or default_focus,
+            "tasks": t.get("tasks") or default_tasks,
+            "est_time_min": s["est_time_min"],
+            "videos": s["videos"],
+        })
+    return {
+        "day": day["day"],
+        "goals": text.get("goals") or [sessions[0]["focus"]],
+        "sessions": sessions,
+        "review": text.get("review") or ["오늘 학습한 내용 한 문단으로 요약"],
+    }
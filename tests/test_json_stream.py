@@ -0,0 +1,46 @@
+import json
+
+from json_stream import IncrementalJSONParser
+
+PAYLOAD = {
+    "ordered_videos": [{"ref": 2, "reason": "기초 {먼저}"}, {"ref": 1, "reason": "따옴표 \"심화\""}],
+    "quiz": [{"question": "배열 [0]의 값은?", "choices": ["a", "b"], "answer": "a"}],
+}
+
+
+def _feed_all(parser: IncrementalJSONParser, text: str, size: int):
+    out = []
+    for i in range(0, len(text), size):
+        out += parser.feed(text[i:i + size])
+    return out
+
+
+def test_items_are_emitted_as_soon_as_each_object_closes():
+    text = json.dumps(PAYLOAD, ensure_ascii=False)
+    parser = IncrementalJSONParser()
+    first = json.dumps(PAYLOAD["ordered_videos"][0], ensure_ascii=False)
+    first_close = text.index(first) + len(first)
+    assert parser.feed(text[:first_close - 1]) == []
+    assert parser.feed(text[first_close - 1:first_close]) == [("ordered_videos", PAYLOAD["ordered_videos"][0])]
+
+
+def test_any_chunking_gives_the_same_items():
+    text = json.dumps(PAYLOAD, ensure_ascii=False)
+    expected = [("ordered_videos", v) for v in PAYLOAD["ordered_videos"]] + [("quiz", q) for q in PAYLOAD["quiz"]]
+    for size in (1, 3, 7, len(text)):
+        parser = IncrementalJSONParser()
+        assert _feed_all(parser, text, size) == expected
+        assert parser.done
+
+
+def test_code_fence_and_sections_filter():
+    text = "물론이죠!\n```json\n" + json.dumps(PAYLOAD, ensure_ascii=False) + "\n```"
+    parser = IncrementalJSONParser(sections=["quiz"])
+    assert _feed_all(parser, text, 5) == [("quiz", PAYLOAD["quiz"][0])]
+
+
+def test_truncated_response_keeps_closed_items_only():
+    text = json.dumps(PAYLOAD, ensure_ascii=False)
+    cut = text.index('"quiz"') + 20
+    items = IncrementalJSONParser().feed(text[:cut])
+    assert [section for section, _ in items] == ["ordered_videos", "ordered_videos"]
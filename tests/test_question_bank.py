@@ -0,0 +1,50 @@
+import random
+
+import pytest
+
+from question_bank import QuestionBank, _quotas
+
+
+def test_quotas_split_evenly_and_give_remainder_to_most_unseen():
+    assert _quotas([10, 10, 10], [3, 9, 5], 4) == [1, 2, 1]
+
+
+def test_quotas_shift_shortfall_to_other_videos():
+    assert _quotas([1, 10], [1, 10], 6) == [1, 5]
+    assert _quotas([2, 1], [2, 1], 10) == [2, 1]
+
+
+@pytest.fixture
+def bank(tmp_path):
+    bank = QuestionBank(path=str(tmp_path / "bank.sqlite3"))
+    for vid in ("v1", "v2"):
+        for topic in ("개념", "응용"):
+            bank.add(vid, topic, 2, [
+                {"question": f"{vid} {topic} 문항 {i}", "choices": ["a", "b"], "answer": "a"} for i in range(3)
+            ])
+    return bank
+
+
+def test_sample_is_even_per_video_and_tags_items(bank):
+    quiz = bank.sample("u1", ["v1", "v2"], 4, rng=random.Random(0))
+    assert sorted(q["video_id"] for q in quiz) == ["v1", "v1", "v2", "v2"]
+    # 영상 안에서는 출제 관점을 번갈아 뽑는다
+    assert {q["topic"] for q in quiz if q["video_id"] == "v1"} == {"개념", "응용"}
+    assert all(isinstance(q["qid"], int) for q in quiz)
+
+
+def test_sample_does_not_repeat_until_bank_is_exhausted(bank):
+    rng = random.Random(1)
+    seen = []
+    for _ in range(3):
+        seen += [q["qid"] for q in bank.sample("u1", ["v1", "v2"], 4, rng=rng)]
+    assert len(seen) == len(set(seen)) == 12
+    # 다 낸 뒤에는 다시 쓰고, 다른 사용자는 따로 센다
+    assert len(bank.sample("u1", ["v1", "v2"], 4, rng=rng)) == 4
+    assert len({q["qid"] for q in bank.sample("u2", ["v1", "v2"], 12, rng=rng)}) == 12
+
+
+def test_sample_returns_what_exists(bank):
+    assert len(bank.sample("u1", ["v1", "missing"], 20)) == 6
+    assert bank.sample("u1", [], 4) == []
+    assert bank.counts(["v1", "missing"]) == {"v1": 6, "missing": 0}
@@ -0,0 +1,63 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from quiz_analytics import DEFAULT_CUTOFFS, compute_stats, empty_stats, weak_video  # noqa: E402
+
+
+def _attempts(n: int = 40) -> "pd.DataFrame":
+    """응시 n회 x 3문항: 1번은 잘하는 응시자만 맞히고(변별도 높음), 2번은 실력과 무관, 3번은 1번과 같다"""
+    rows = []
+    for attempt in range(n):
+        strong = attempt < n // 2
+        for item, video, correct in ((1, "a", strong), (2, "b", attempt % 2 == 0), (3, "b", strong)):
+            rows.append({"ts": 0.0, "user": f"u{attempt}", "attempt": attempt, "item": item,
+                         "video_id": video, "topic": "", "correct": correct})
+    return pd.DataFrame(rows)
+
+
+def test_compute_stats_item_and_video_rates():
+    stats = compute_stats(_attempts())
+    assert stats.rows == 120
+    assert stats.error_rate == pytest.approx(0.5)
+    n, p, disc = stats.items[1]
+    assert (n, p) == (40, pytest.approx(0.5)) and disc > 0.5
+    assert stats.items[2][2] == pytest.approx(0.0, abs=1e-9)
+    assert stats.videos == {"a": (40, pytest.approx(0.5)), "b": (80, pytest.approx(0.5))}
+
+
+def test_cutoffs_need_enough_attempts_and_stay_in_range():
+    stats = compute_stats(_attempts())
+    low, high = stats.score_cutoffs(["a"])
+    assert 0.3 <= low < high <= 0.9
+    assert stats.score_cutoffs(["unknown"]) == DEFAULT_CUTOFFS
+    assert compute_stats(_attempts(10)).score_cutoffs(["a"]) == DEFAULT_CUTOFFS
+
+
+def test_empty_frame_gives_defaults():
+    stats = compute_stats(_attempts().iloc[:0])
+    assert stats.rows == 0 and stats.p_value(1) == pytest.approx(0.5)
+    assert stats.score_cutoffs(["a"]) == DEFAULT_CUTOFFS
+
+
+VIDEOS = [{"video_id": "a"}, {"video_id": "b"}]
+QUIZ = [
+    {"question": "q1", "answer": "x", "video_id": "a"},
+    {"question": "q2", "answer": "x", "video_id": "a"},
+    {"question": "q3", "answer": "x", "video_id": "b"},
+    {"question": "q4", "answer": "x", "video_id": "b"},
+]
+
+
+def test_weak_video_picks_first_video_missed_more_than_usual():
+    assert weak_video(VIDEOS, QUIZ, ["x", "y", "y", "y"], empty_stats()) == (1, 2)
+
+
+def test_weak_video_falls_back_to_first_missed_video():
+    assert weak_video(VIDEOS, QUIZ, ["x", "y", "x", "y"], empty_stats()) == (0, 1)
+
+
+def test_weak_video_needs_misses_and_video_ids():
+    assert weak_video(VIDEOS, QUIZ, ["x"] * 4, empty_stats()) is None
+    untagged = [{k: v for k, v in q.items() if k != "video_id"} for q in QUIZ]
+    assert weak_video(VIDEOS, untagged, ["y"] * 4, empty_stats()) is None
@@ -0,0 +1,29 @@
+from quiz_dedup import NearDuplicateFilter, signature, similarity
+
+
+def test_signature_is_stable_and_ignores_punctuation():
+    assert signature("파이썬의 리스트란 무엇인가?") == signature("파이썬의 리스트란, 무엇인가")
+    assert len(signature("짧은 문장")) == 64
+
+
+def test_similarity_orders_near_and_far_questions():
+    base = signature("다음 중 파이썬 리스트의 특징으로 옳은 것은?")
+    near = signature("다음 중 파이썬 리스트의 특징으로 올바른 것은?")
+    far = signature("HTTP 상태 코드 404가 뜻하는 것은?")
+    assert similarity(base, base) == 1.0
+    assert similarity(base, near) > 0.5 > similarity(base, far)
+
+
+def test_filter_drops_near_duplicates_and_counts_them():
+    flt = NearDuplicateFilter(threshold=0.6)
+    assert flt.add("다음 중 파이썬 리스트의 특징으로 옳은 것은?")
+    assert not flt.add("다음 중 파이썬 리스트의 특징으로 옳은 것은 무엇인가?")
+    assert flt.add("HTTP 상태 코드 404가 뜻하는 것은?")
+    assert flt.removed == 1
+
+
+def test_filter_treats_known_signatures_as_seen():
+    known = [signature("TCP와 UDP의 차이로 옳은 것은?")]
+    flt = NearDuplicateFilter(threshold=0.6, known=known)
+    assert not flt.add("TCP와 UDP의 차이로 옳은 것은?")
+    assert flt.add("DNS가 하는 일로 옳은 것은?")
@@ -0,0 +1,62 @@
+import pytest
+
+from study_scheduler import (
+    SESSION_BUDGET_MIN, STUDY_MULTIPLIER, build_schedule, parse_iso_duration, partition_in_order, resolve_durations,
+)
+
+
+def _videos(*titles):
+    return [{"index": i, "url": f"https://example.com/{t}", "title_guess": t} for i, t in enumerate(titles, 1)]
+
+
+def _minutes(*values):
+    return {f"https://example.com/T{i}": v for i, v in enumerate(values, 1)}
+
+
+def test_partition_keeps_order_and_minimises_the_heaviest_group():
+    loads = [30, 10, 10, 40, 20, 10]
+    groups = partition_in_order(loads, 3)
+    assert [i for g in groups for i in g] == list(range(len(loads)))
+    assert max(sum(loads[i] for i in g) for g in groups) == 50
+
+
+def test_partition_edge_cases():
+    assert partition_in_order([], 3) == []
+    assert partition_in_order([5, 5], 0) == []
+    assert partition_in_order([5, 5], 4) == [[0], [1]]
+
+
+def test_parse_iso_duration():
+    assert parse_iso_duration("PT1H2M3S") == 3723
+    assert parse_iso_duration("PT45S") == 45
+    assert parse_iso_duration("PT") is None
+
+
+def test_resolve_durations_prefers_overrides_and_rejects_negatives():
+    urls = ["https://example.com/T1", "https://example.com/T2"]
+    assert resolve_durations(urls, {urls[0]: 0, urls[1]: 12.5}) == {urls[0]: 0.0, urls[1]: 12.5}
+    with pytest.raises(ValueError):
+        resolve_durations(urls, {urls[0]: -1})
+
+
+def test_zero_minute_videos_get_no_time():
+    schedule = build_schedule(_videos("T1", "T2"), 1, _minutes(0, 20))
+    titles = [v["title"] for s in schedule[0]["sessions"] for v in s["videos"]]
+    assert titles == ["T2"]
+
+
+def test_long_video_parts_in_one_session_are_merged():
+    minutes = 300
+    parts = -(-int(minutes * STUDY_MULTIPLIER) // SESSION_BUDGET_MIN)
+    schedule = build_schedule(_videos("T1"), 1, _minutes(minutes))
+    labels = [v["part"] for s in schedule[0]["sessions"] for v in s["videos"]]
+    assert len(labels) == len(schedule[0]["sessions"]) <= 3
+    assert labels[0].startswith("1") and labels[-1].endswith(f"{parts}/{parts}")
+    assert sum(v["minutes"] for s in schedule[0]["sessions"] for v in s["videos"]) == round(minutes * STUDY_MULTIPLIER)
+
+
+def test_extra_days_become_review_sessions():
+    schedule = build_schedule(_videos("T1"), 3, _minutes(10))
+    assert [d["day"] for d in schedule] == [1, 2, 3]
+    assert schedule[0]["sessions"][0]["videos"][0]["part"] is None
+    assert all(s["videos"] == [] for d in schedule[1:] for s in d["sessions"])
@@ -0,0 +1,51 @@
+import pytest
+
+from video_urls import canonical_url, get_youtube_id, video_id
+
+YT = "dQw4w9WgXcQ"
+
+
+@pytest.mark.parametrize("url", [
+    f"https://youtu.be/{YT}?t=42",
+    f"https://m.youtube.com/watch?v={YT}&list=PL123&index=3",
+    f"https://www.youtube.com/shorts/{YT}",
+    f"https://www.youtube-nocookie.com/embed/{YT}?si=abc",
+])
+def test_youtube_forms_share_one_key(url):
+    assert get_youtube_id(url) == YT
+    assert canonical_url(url) == f"https://www.youtube.com/watch?v={YT}"
+    assert video_id(url) == f"youtube:{YT}"
+
+
+def test_youtube_playlist_keeps_list():
+    assert canonical_url("https://www.youtube.com/playlist?list=PL123&utm_source=x") == \
+        "https://youtube.com/playlist?list=PL123"
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("http://m.vimeo.com/76979871?utm_campaign=a", "vimeo:76979871"),
+    ("https://vimeo.com/channels/staff/76979871", "vimeo:76979871"),
+    ("https://www.coursera.org/learn/ml/lecture/abc12/intro", "coursera:ml/abc12"),
+    ("https://www.udemy.com/course/python/learn/lecture/123456#overview", "udemy:python/123456"),
+    ("https://www.inflearn.com/course/spring-basic?inst=1", "inflearn:spring-basic"),
+])
+def test_known_hosts_map_to_video_ids(url, expected):
+    assert video_id(url) == expected
+
+
+def test_tracking_params_dropped_but_content_params_kept_elsewhere():
+    url = "https://example.com/lecture?t=10&list=2&fbclid=x&utm_medium=y&gclid=z"
+    assert canonical_url(url) == "https://example.com/lecture?list=2&t=10"
+
+
+def test_unknown_hosts_keep_port_and_subdomain():
+    a = canonical_url("http://Example.com:8001/v")
+    b = canonical_url("http://example.com:8002/v")
+    assert a == "http://example.com:8001/v" and a != b
+    assert canonical_url("https://www.example.com/a/") == "https://www.example.com/a"
+    assert canonical_url("https://m.example.com/a") != canonical_url("https://example.com/a")
+
+
+def test_inflearn_lecture_pages_fall_back_to_url_with_query():
+    url = "https://www.inflearn.com/course/lecture?courseSlug=spring&unitId=7"
+    assert video_id(url) == canonical_url(url) == "https://inflearn.com/course/lecture?courseSlug=spring&unitId=7"
@@ -0,0 +1,227 @@
+import io
+import os
+import time
+import hashlib
+import sqlite3
+import threading
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+import metrics
+from sqlite_store import SQLiteStore
+
+if TYPE_CHECKING:
+    import requests
+
+# -------------------------------
+# 설정 (환경 변수로 조정 가능)
+# -------------------------------
+# THUMB_PROXY=0 이면 원본 이미지 URL을 그대로 쓴다
+THUMB_PROXY = os.getenv("THUMB_PROXY", "1") == "1"
+# Streamlit 정적 파일 폴더 (app.py 옆 static/, .streamlit/config.toml의 enableStaticServing 필요)
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+THUMB_DIR = os.path.join(STATIC_DIR, "thumbs")
+# 브라우저에서 static/ 폴더를 가리키는 경로 (페이지 기준 상대 경로)
+STATIC_URL = "app/static"
+THUMB_INDEX_PATH = os.getenv("THUMB_INDEX_PATH", os.path.join(".cache", "thumbs.sqlite3"))
+# 화면 표시 너비(px)에 맞춰 줄인다 (고해상도 화면까지 선명하게 하려면 600)
+THUMB_WIDTH = int(os.getenv("THUMB_WIDTH", "300"))
+# 세로로 긴 이미지는 너비의 이 배수에서 자른다 (비율 유지 축소)
+MAX_ASPECT = 2
+# WebP 품질 (0~100, 썸네일 크기에서는 70 전후면 차이가 거의 안 보인다)
+THUMB_QUALITY = int(os.getenv("THUMB_QUALITY", "70"))
+# 디스크 캐시 최대 크기(MB), 넘으면 오래 안 쓴 이미지부터 지운다
+THUMB_CACHE_MAX_MB = float(os.getenv("THUMB_CACHE_MAX_MB", "200"))
+# 원본이 이보다 크면 받지 않는다 (MB)
+THUMB_MAX_SOURCE_MB = float(os.getenv("THUMB_MAX_SOURCE_MB", "15"))
+FETCH_TIMEOUT_SEC = float(os.getenv("THUMB_FETCH_TIMEOUT_SEC", "8"))
+CHUNK_SIZE = 64 * 1024
+# 같은 이미지 사용 시각은 이 간격(초)보다 자주 갱신하지 않는다
+TOUCH_INTERVAL_SEC = 3600
+
+
+def _encode_thumbnail(raw: bytes, width: int, quality: int) -> Tuple[bytes, str]:
+    """원본 이미지를 width에 맞춰 줄이고 WebP(안 되면 JPEG)로 다시 인코딩 → (본문, 확장자)"""
+    from PIL import Image, ImageOps, features  # 썸네일을 새로 만들 때만 불러온다
+
+    with Image.open(io.BytesIO(raw)) as img:
+        # JPEG는 디코딩 단계에서 1/2~1/8로 줄여 읽어 큰 원본도 빠르게 처리
+        img.draft("RGB", (width, width * MAX_ASPECT))
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((width, width * MAX_ASPECT), Image.Resampling.LANCZOS)
+        alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+        out = io.BytesIO()
+        if features.check("webp"):
+            img.convert("RGBA" if alpha else "RGB").save(out, "WEBP", quality=quality, method=4)
+            return out.getvalue(), ".webp"
+        img = img.convert("RGBA" if alpha else "RGB")
+        if alpha:
+            # JPEG는 투명도가 없으므로 흰 배경에 합성
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            background.paste(img, mask=img.getchannel("A"))
+            img = background
+        img.save(out, "JPEG", quality=quality, optimize=True, progressive=True)
+        return out.getvalue(), ".jpg"
+
+
+# -------------------------------
+# 썸네일 디스크 캐시 (내용 해시 파일명 + LRU)
+# -------------------------------
+class ThumbnailStore(SQLiteStore):
+    """
+    원본 이미지 URL을 한 번만 받아 표시 크기로 줄인 썸네일을 static/thumbs/에 저장하고 로컬 URL을 돌려준다.
+    파일 이름은 결과 이미지의 sha256이라 같은 그림(여러 페이지가 쓰는 기본 og:image 등)은 한 파일만 남고,
+    브라우저도 오래 캐시할 수 있다. 전체 크기가 max_bytes를 넘으면 오래 안 쓴 파일부터 지운다.
+    원본 URL → 파일 이름 색인은 SQLite에 둔다.
+    """
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS thumbs ("
+        " source TEXT NOT NULL,"
+        " width INTEGER NOT NULL,"
+        " name TEXT NOT NULL,"
+        " bytes INTEGER NOT NULL,"
+        " accessed_at REAL NOT NULL,"
+        " PRIMARY KEY (source, width));"
+        "CREATE INDEX IF NOT EXISTS idx_thumbs_name ON thumbs(name);"
+    )
+
+    def __init__(self, folder: str = THUMB_DIR, index_path: str = THUMB_INDEX_PATH,
+                 max_bytes: int = int(THUMB_CACHE_MAX_MB * 1024 * 1024),
+                 width: int = THUMB_WIDTH, quality: int = THUMB_QUALITY):
+        super().__init__(index_path)
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.width = width
+        self.quality = quality
+
+    def _db(self) -> sqlite3.Connection:
+        """색인 연결을 처음 쓸 때 썸네일 폴더도 만든다"""
+        if self._conn is None:
+            os.makedirs(self.folder, exist_ok=True)
+        return super()._db()
+
+    def url_for(self, name: str) -> str:
+        """static/ 폴더 기준 URL (v 인자가 있으면 Tornado가 오래 캐시하도록 헤더를 붙인다)"""
+        rel = os.path.relpath(os.path.join(self.folder, name), STATIC_DIR).replace(os.sep, "/")
+        return f"{STATIC_URL}/{rel}?v={name[:8]}"
+
+    def exists(self, local_url: str) -> bool:
+        """url_for로 만든 URL의 파일이 아직 남아 있는지 (지워졌으면 다시 만들어야 함)"""
+        rel = local_url[len(STATIC_URL) + 1:].split("?", 1)[0]
+        return os.path.isfile(os.path.join(STATIC_DIR, rel))
+
+    def lookup(self, source: str) -> Optional[str]:
+        """이미 만든 썸네일이 있으면 로컬 URL"""
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            row = db.execute("SELECT name, accessed_at FROM thumbs WHERE source = ? AND width = ?",
+                             (source, self.width)).fetchone()
+            if row is None:
+                return None
+            name, accessed_at = row
+            if not os.path.isfile(os.path.join(self.folder, name)):
+                db.execute("DELETE FROM thumbs WHERE name = ?", (name,))
+                db.commit()
+                return None
+            if now - accessed_at > TOUCH_INTERVAL_SEC:
+                db.execute("UPDATE thumbs SET accessed_at = ? WHERE name = ?", (now, name))
+                db.commit()
+        return self.url_for(name)
+
+    def _download(self, source: str, session: Optional["requests.Session"]) -> Optional[bytes]:
+        """원본 이미지를 받되 THUMB_MAX_SOURCE_MB를 넘으면 중단"""
+        import requests
+
+        cap = int(THUMB_MAX_SOURCE_MB * 1024 * 1024)
+        with (session or requests).get(source, timeout=FETCH_TIMEOUT_SEC, stream=True) as r:
+            if r.status_code >= 400:
+                return None
+            if int(r.headers.get("Content-Length") or 0) > cap:
+                return None
+            buf = bytearray()
+            for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                buf += chunk
+                if len(buf) > cap:
+                    return None
+        return bytes(buf)
+
+    def store(self, source: str, raw: bytes) -> str:
+        """원본 바이트를 썸네일로 만들어 저장하고 로컬 URL 반환 (이미지가 아니면 예외)"""
+        data, ext = _encode_thumbnail(raw, self.width, self.quality)
+        name = hashlib.sha256(data).hexdigest()[:32] + ext
+        path = os.path.join(self.folder, name)
+        with self._lock:
+            db = self._db()
+            if not os.path.isfile(path):
+                tmp = f"{path}.{threading.get_ident()}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+            db.execute("INSERT OR REPLACE INTO thumbs (source, width, name, bytes, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                       (source, self.width, name, len(data), time.time()))
+            db.commit()
+            self._evict(keep=name)
+        metrics.incr("thumbnail_proxy_bytes_total", len(raw), kind="source")
+        metrics.incr("thumbnail_proxy_bytes_total", len(data), kind="stored")
+        return self.url_for(name)
+
+    def proxy(self, source: str, session: Optional["requests.Session"] = None) -> Optional[str]:
+        """
+        원본 이미지 URL → 로컬 썸네일 URL (캐시 → 다운로드/축소 순)
+        받기/디코딩에 실패하면 None (호출하는 쪽이 원본 URL을 그대로 쓴다)
+        """
+        try:
+            local = self.lookup(source)
+            if local is not None:
+                metrics.incr("thumbnail_proxy_total", result="hit")
+                return local
+            with metrics.span("thumbnail_proxy"):
+                raw = self._download(source, session)
+                local = self.store(source, raw) if raw else None
+        except Exception as e:
+            # 색인(SQLite)/다운로드/디코딩 어디서 실패해도 원본 URL로 물러선다
+            metrics.log_event("thumbnail_proxy_error", source=source, error=type(e).__name__)
+            local = None
+        metrics.incr("thumbnail_proxy_total", result="stored" if local else "failed")
+        return local
+
+    # -------------------------------
+    # 보관 정책 (크기 한도 LRU)
+    # -------------------------------
+    def _evict(self, keep: str) -> None:
+        """락을 잡은 상태에서 호출, 파일 단위로 마지막 사용 시각이 오래된 것부터 지운다"""
+        db = self._db()
+        rows = db.execute(
+            "SELECT name, MAX(bytes), MAX(accessed_at) AS last FROM thumbs GROUP BY name ORDER BY last"
+        ).fetchall()
+        total = sum(r[1] for r in rows)
+        evicted = 0
+        for name, size, _ in rows:
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            db.execute("DELETE FROM thumbs WHERE name = ?", (name,))
+            try:
+                os.remove(os.path.join(self.folder, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+            evicted += 1
+        if evicted:
+            db.commit()
+            metrics.incr("thumbnail_proxy_evictions_total", evicted)
+        metrics.set_gauge("thumbnail_store_bytes", total)
+        metrics.set_gauge("thumbnail_store_files", len(rows) - evicted)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            files, total = self._db().execute(
+                "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM (SELECT name, MAX(bytes) AS bytes FROM thumbs GROUP BY name)"
+            ).fetchone()
+        return {"files": files, "bytes": total, "max_bytes": self.max_bytes, "width": self.width}
+
+
+# 앱 전체가 공유하는 썸네일 저장소 (연결/폴더는 처음 쓸 때 만든다)
+thumb_store = ThumbnailStore()
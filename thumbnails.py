@@ -0,0 +1,207 @@
+import os
+import re
+import html
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urljoin
+
+import metrics
+from http_sessions import session_for
+from thumb_proxy import STATIC_URL, THUMB_PROXY, thumb_store
+from video_urls import get_youtube_id
+
+# -------------------------------
+# 설정
+# -------------------------------
+PLACEHOLDER = "https://placehold.co/300x200?text=No+Thumbnail"
+FETCH_TIMEOUT_SEC = float(os.getenv("THUMB_FETCH_TIMEOUT_SEC", "8"))
+MAX_WORKERS = int(os.getenv("THUMB_MAX_WORKERS", "8"))
+HIT_TTL_SEC = int(os.getenv("THUMB_HIT_TTL_SEC", str(24 * 3600)))
+# 실패/플레이스홀더는 짧게 캐시해서 잠깐 죽은 사이트도 나중에 다시 시도
+MISS_TTL_SEC = int(os.getenv("THUMB_MISS_TTL_SEC", "600"))
+# </head>를 못 찾더라도 이만큼만 읽고 멈춘다
+HEAD_BYTE_CAP = int(os.getenv("THUMB_HEAD_BYTE_CAP", str(256 * 1024)))
+CHUNK_SIZE = 8192
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="thumb")
+_lock = threading.Lock()
+_cache: Dict[str, Tuple[str, float]] = {}
+_inflight: Dict[str, Future] = {}
+
+# -------------------------------
+# <head> 스트리밍 스캔 (빠른 경로)
+# -------------------------------
+_HEAD_END_RE = re.compile(rb"</head\s*>|<body[\s>]", re.IGNORECASE)
+_TAG_RE = re.compile(r"<(meta|link)\b([^>]*)>", re.IGNORECASE)
+_ATTR_RE = re.compile(r"""([a-zA-Z_:][-a-zA-Z0-9_:.]*)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'=<>`]+))""")
+_META_KEYS = ("og:image", "twitter:image")
+
+
+def read_head(chunks: Iterable[bytes], byte_cap: int = HEAD_BYTE_CAP) -> bytes:
+    """청크를 이어 붙이다가 </head>(또는 <body>)를 만나거나 byte_cap에 닿으면 멈춘다"""
+    buf = bytearray()
+    for chunk in chunks:
+        if not chunk:
+            continue
+        # 태그가 청크 경계에 걸쳐도 찾을 수 있도록 직전 몇 바이트부터 다시 검색
+        search_from = max(0, len(buf) - 16)
+        buf += chunk
+        m = _HEAD_END_RE.search(buf, search_from)
+        if m:
+            return bytes(buf[:m.end()])
+        if len(buf) >= byte_cap:
+            return bytes(buf[:byte_cap])
+    return bytes(buf)
+
+
+def _attrs(raw: str) -> Dict[str, str]:
+    out = {}
+    for m in _ATTR_RE.finditer(raw):
+        value = next(v for v in m.group(2, 3, 4) if v is not None)
+        out[m.group(1).lower()] = html.unescape(value).strip()
+    return out
+
+
+def scan_image_meta(doc: str) -> Optional[str]:
+    """meta/link 태그만 훑어서 og:image → twitter:image → link rel=image_src 순으로 찾기"""
+    found: Dict[str, str] = {}
+    for m in _TAG_RE.finditer(doc):
+        attrs = _attrs(m.group(2))
+        if m.group(1).lower() == "meta":
+            key = (attrs.get("property") or attrs.get("name") or "").lower()
+            if key in _META_KEYS and attrs.get("content"):
+                found.setdefault(key, attrs["content"])
+                if key == "og:image":
+                    break
+        elif "image_src" in attrs.get("rel", "").lower().split() and attrs.get("href"):
+            found.setdefault("image_src", attrs["href"])
+    for key in (*_META_KEYS, "image_src"):
+        if key in found:
+            return found[key]
+    return None
+
+
+def soup_image_meta(doc: str) -> Optional[str]:
+    """BeautifulSoup 기반 추출 (빠른 경로가 실패했을 때만 사용)"""
+    from bs4 import BeautifulSoup  # 대부분 빠른 경로로 끝나므로 필요할 때만 불러온다
+
+    soup = BeautifulSoup(doc, "html.parser")
+    for key in [
+        {"property": "og:image"},
+        {"name": "og:image"},
+        {"name": "twitter:image"},
+        {"property": "twitter:image"},
+    ]:
+        tag = soup.find("meta", key)
+        if tag and tag.get("content"):
+            return tag["content"]
+    link_tag = soup.find("link", rel="image_src")
+    if link_tag and link_tag.get("href"):
+        return link_tag["href"]
+    return None
+
+# -------------------------------
+# 단일 URL 조회 (네트워크)
+# -------------------------------
+def _fetch_thumbnail(url: str) -> str:
+    """페이지 <head>만 받아 og:image / twitter:image / image_src 를 찾아 반환 (없으면 플레이스홀더)"""
+    vid = get_youtube_id(url)
+    if vid:
+        return f"https://img.youtube.com/vi/{vid}/0.jpg"
+    try:
+        with session_for(url).get(url, timeout=FETCH_TIMEOUT_SEC, stream=True) as r:
+            if r.status_code >= 400:
+                return PLACEHOLDER
+            head = read_head(r.iter_content(chunk_size=CHUNK_SIZE))
+            # charset이 명시되지 않으면 requests가 ISO-8859-1로 추정하므로 utf-8로 읽는다
+            charset_given = "charset" in r.headers.get("Content-Type", "").lower()
+            doc = head.decode(r.encoding if charset_given and r.encoding else "utf-8", errors="replace")
+            image = scan_image_meta(doc)
+            if image is None:
+                image = soup_image_meta(doc)
+                metrics.incr("thumbnail_parse_total", path="soup" if image else "none")
+            else:
+                metrics.incr("thumbnail_parse_total", path="fast")
+            if image:
+                return urljoin(r.url, image)
+    except Exception:
+        return PLACEHOLDER
+    return PLACEHOLDER
+
+# -------------------------------
+# TTL 캐시 (실패도 짧게 캐시)
+# -------------------------------
+def _cached(url: str) -> Optional[str]:
+    item = _cache.get(url)
+    if item and item[1] > time.time():
+        # 디스크 캐시 한도로 지워진 로컬 썸네일은 다시 만든다
+        if item[0].startswith(STATIC_URL) and not thumb_store.exists(item[0]):
+            return None
+        return item[0]
+    return None
+
+
+def _resolve_and_store(url: str) -> str:
+    thumb, ok = PLACEHOLDER, False
+    try:
+        with metrics.span("thumbnail_fetch") as info:
+            thumb = _fetch_thumbnail(url)
+            info["placeholder"] = thumb == PLACEHOLDER
+            if THUMB_PROXY and thumb != PLACEHOLDER:
+                # 원본(수 MB짜리 대표 이미지 등)은 서버가 한 번만 받고, 화면에는 줄인 로컬 사본을 보낸다
+                local = thumb_store.proxy(thumb, session_for(thumb))
+                info["proxied"] = local is not None
+                thumb = local or thumb
+        ok = True
+    finally:
+        # 예외가 나도 진행 중 표시는 지우고 짧게 캐시해서, 나중에 다시 시도할 수 있게 한다
+        ttl = HIT_TTL_SEC if ok and thumb != PLACEHOLDER else MISS_TTL_SEC
+        with _lock:
+            _cache[url] = (thumb, time.time() + ttl)
+            _inflight.pop(url, None)
+    return thumb
+
+
+def _submit(url: str) -> Optional[Future]:
+    """캐시에 없으면 워커 풀에 조회를 맡긴다 (이미 진행 중이면 같은 Future 공유)"""
+    with _lock:
+        if _cached(url) is not None:
+            return None
+        future = _inflight.get(url)
+        if future is None:
+            future = _executor.submit(_resolve_and_store, url)
+            _inflight[url] = future
+        return future
+
+# -------------------------------
+# 공개 API
+# -------------------------------
+def prefetch_thumbnails(urls: List[str]) -> None:
+    """썸네일 조회를 백그라운드로 미리 시작 (결과는 기다리지 않음)"""
+    for url in dict.fromkeys(urls):
+        _submit(url)
+
+
+def resolve_thumbnail(url: str) -> str:
+    """썸네일 URL 1개 조회 (캐시 → 진행 중인 조회 → 새 조회 순, THUMB_PROXY면 로컬 static 경로)"""
+    with _lock:
+        thumb = _cached(url)
+    metrics.incr("thumbnail_cache_total", result="hit" if thumb is not None else "miss")
+    if thumb is not None:
+        return thumb
+    future = _submit(url)
+    if future is None:
+        with _lock:
+            return _cached(url) or PLACEHOLDER
+    try:
+        return future.result()
+    except Exception:
+        return PLACEHOLDER
+
+
+def resolve_thumbnails(urls: List[str]) -> Dict[str, str]:
+    """여러 URL을 워커 풀에서 동시에 조회하고 {url: 썸네일 URL} 반환"""
+    prefetch_thumbnails(urls)
+    return {url: resolve_thumbnail(url) for url in dict.fromkeys(urls)}
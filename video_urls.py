@@ -0,0 +1,120 @@
+import re
+from typing import Iterable
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+# -------------------------------
+# 같은 영상인지 판단할 때 무시할 파라미터
+# -------------------------------
+# 어느 사이트에서든 내용과 무관한 추적 파라미터 (utm_* 는 접두어로 따로 거른다)
+_TRACKING_PARAMS = {"fbclid", "gclid", "igshid", "mc_cid", "mc_eid"}
+# 유튜브에서만 재생 위치/재생목록/공유 경로를 뜻하는 파라미터 (다른 사이트에서는 다른 강의를 가리킬 수 있다)
+_YOUTUBE_PARAMS = {
+    "t", "start", "end", "time_continue", "si", "feature", "list", "index", "pp", "ab_channel",
+    "app", "ref", "ref_src", "source", "share", "spm",
+}
+_YOUTUBE_HOSTS = ("youtube.com", "youtube-nocookie.com", "youtu.be")
+_YT_ID = r"([A-Za-z0-9_-]{11})"
+
+# -------------------------------
+# 유틸 - 유튜브 ID
+# -------------------------------
+def get_youtube_id(url: str) -> str | None:
+    """youtu.be/ID, watch?v=ID, /shorts/ID, /embed/ID, /live/ID 등에서 11자리 영상 ID 추출"""
+    m = re.search(r"youtu\.be/" + _YT_ID, url)
+    if m: return m.group(1)
+    m = re.search(r"[?&]v=" + _YT_ID, url)
+    if m: return m.group(1)
+    m = re.search(r"youtube(?:-nocookie)?\.com/(?:shorts|embed|live|v)/" + _YT_ID, url)
+    if m: return m.group(1)
+    return None
+
+# -------------------------------
+# 호스트별 영상 ID 규칙
+# -------------------------------
+_HOST_RULES = [
+    # (호스트 끝부분, 경로 정규식, 키 접두어)
+    ("vimeo.com", re.compile(r"^/(?:video/|channels/[^/]+/|groups/[^/]+/videos/)?(\d+)"), "vimeo"),
+    ("coursera.org", re.compile(r"^/learn/([^/]+)/lecture/([^/]+)"), "coursera"),
+    ("udemy.com", re.compile(r"^/course/([^/]+)/learn/lecture/(\d+)"), "udemy"),
+    ("inflearn.com", re.compile(r"^/course/lecture\b.*"), None),  # 쿼리(courseSlug, unitId)로 구분
+    ("inflearn.com", re.compile(r"^/course/([^/?#]+)"), "inflearn"),
+    ("khanacademy.org", re.compile(r"^/(.+?/v/[^/]+)"), "khan"),
+    ("ted.com", re.compile(r"^/talks/([^/?#]+)"), "ted"),
+    ("dailymotion.com", re.compile(r"^/video/([A-Za-z0-9]+)"), "dailymotion"),
+    ("dai.ly", re.compile(r"^/([A-Za-z0-9]+)"), "dailymotion"),
+    ("tv.naver.com", re.compile(r"^/v/(\d+)"), "navertv"),
+]
+
+
+def _host(netloc: str) -> str:
+    """규칙 비교용 호스트 이름 (계정/포트와 www./m. 접두어 제거)"""
+    host = netloc.lower().split("@")[-1].split(":")[0]
+    for prefix in ("www.", "m."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    return host
+
+
+def _netloc(netloc: str) -> str:
+    """규칙을 모르는 호스트는 포트/서브도메인을 그대로 두고 호스트 부분만 소문자로 (다른 서버끼리 겹치지 않게)"""
+    userinfo, at, hostport = netloc.rpartition("@")
+    return userinfo + at + hostport.lower()
+
+
+def _matches(host: str, suffixes: Iterable[str]) -> bool:
+    return any(host == s or host.endswith("." + s) for s in suffixes)
+
+
+def _drop_param(key: str, youtube: bool, path: str) -> bool:
+    key = key.lower()
+    if key in _TRACKING_PARAMS or key.startswith(("utm_", "mc_")):
+        return True
+    # 재생목록 페이지는 list 자체가 내용이다
+    return youtube and key in _YOUTUBE_PARAMS and not (key == "list" and path == "/playlist")
+
+
+def canonical_url(url: str) -> str:
+    """
+    같은 영상이면 같은 문자열이 되도록 정규화
+    (유튜브는 https://www.youtube.com/watch?v=ID, 나머지는 소문자 호스트 + 추적 파라미터/프래그먼트 제거)
+    재생 위치/재생목록 파라미터는 유튜브에서만 지우고, https 강제와 포트/www./m. 제거는 규칙을 아는 호스트에만 한다
+    """
+    url = url.strip()
+    yt = get_youtube_id(url)
+    if yt:
+        return f"https://www.youtube.com/watch?v={yt}"
+    parsed = urlparse(url if "://" in url else f"https://{url}")
+    host = _host(parsed.netloc)
+    youtube = _matches(host, _YOUTUBE_HOSTS)
+    known = youtube or _matches(host, [suffix for suffix, _, _ in _HOST_RULES])
+    path = re.sub(r"/{2,}", "/", parsed.path).rstrip("/") or "/"
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+        if not _drop_param(k, youtube, path)
+    )
+    scheme = "https" if known else (parsed.scheme.lower() or "https")
+    return urlunparse((scheme, host if known else _netloc(parsed.netloc), path, "", urlencode(query), ""))
+
+
+def video_id(url: str) -> str:
+    """
+    캐시 키로 쓸 영상 식별자 (예: 'youtube:dQw4w9WgXcQ', 'vimeo:76979871')
+    규칙이 없는 호스트는 정규화된 URL 자체를 쓴다
+    """
+    yt = get_youtube_id(url)
+    if yt:
+        return f"youtube:{yt}"
+    canon = canonical_url(url)
+    parsed = urlparse(canon)
+    host = parsed.netloc
+    for suffix, pattern, prefix in _HOST_RULES:
+        if host != suffix and not host.endswith("." + suffix):
+            continue
+        m = pattern.match(parsed.path)
+        if not m:
+            continue
+        if prefix is None:
+            break
+        return f"{prefix}:{'/'.join(m.groups())}"
+    return canon
+